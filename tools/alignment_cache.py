@@ -0,0 +1,129 @@
+"""音素列ペアのアライメント結果を保持するLRUキャッシュ"""
+
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from pydantic import BaseModel
+
+from utility.logger_utility import get_logger
+from utility.sqlite_cache_utility import CacheStats, SqliteLruCache
+
+logger = get_logger(Path(__file__))
+
+AlignmentKey = tuple[tuple[str, ...], tuple[str, ...]]
+
+
+class AlignmentSuccess(BaseModel, frozen=True):
+    """アライメントに成功した音素列ペアのインデックスペア"""
+
+    pairs: tuple[tuple[int, int], ...]
+
+
+class AlignmentFailure(BaseModel, frozen=True):
+    """アライメントに失敗した音素列ペアのエラーメッセージ"""
+
+    message: str
+
+
+AlignmentResult = AlignmentSuccess | AlignmentFailure
+
+
+class AlignmentCache:
+    """音素列ペアとマッピングの指紋をキーに、成功・失敗どちらのアライメント結果も保持するメモリ上のLRUキャッシュ。パスを指定するとSQLiteにも保存する"""
+
+    def __init__(
+        self, max_entries: int, persist_path: Path | None, fingerprint: str
+    ) -> None:
+        if max_entries < 1:
+            raise ValueError(f"max_entriesは1以上である必要があります: {max_entries}")
+        self.max_entries = max_entries
+        self.fingerprint = fingerprint
+        self.entries: OrderedDict[AlignmentKey, AlignmentResult] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.store = (
+            None if persist_path is None else SqliteLruCache(persist_path, max_entries)
+        )
+
+    def get_many(self, keys: list[AlignmentKey]) -> dict[AlignmentKey, AlignmentResult]:
+        """キャッシュ済みの音素列ペアのアライメント結果を返す。未キャッシュのペアは結果に含めない"""
+        found: dict[AlignmentKey, AlignmentResult] = {}
+        with self.lock:
+            for key in keys:
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    found[key] = self.entries[key]
+        missing = [key for key in keys if key not in found]
+        if missing and self.store is not None:
+            store_keys = {
+                build_store_key(self.fingerprint, key): key for key in missing
+            }
+            stored = {
+                store_keys[store_key]: decode_result(value)
+                for store_key, value in self.store.get_many(list(store_keys)).items()
+            }
+            with self.lock:
+                self.put_entries(stored)
+            found.update(stored)
+        with self.lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: dict[AlignmentKey, AlignmentResult]) -> None:
+        """アライメント結果を保存する"""
+        with self.lock:
+            self.put_entries(items)
+        if self.store is not None:
+            self.store.put_many(
+                {
+                    build_store_key(self.fingerprint, key): encode_result(result)
+                    for key, result in items.items()
+                }
+            )
+
+    def put_entries(self, items: dict[AlignmentKey, AlignmentResult]) -> None:
+        """メモリ上のキャッシュに保存し、上限件数を超えた分を最終参照の古いものから削除する。ロックを取得して呼ぶ"""
+        for key, result in items.items():
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> CacheStats:
+        """ヒット・ミス回数とメモリ上の保存件数を返す"""
+        with self.lock:
+            return CacheStats(
+                hits=self.hits, misses=self.misses, entries=len(self.entries)
+            )
+
+    def close(self) -> None:
+        """SQLiteに保存していれば接続を閉じる"""
+        if self.store is not None:
+            self.store.close()
+
+
+def build_store_key(fingerprint: str, key: AlignmentKey) -> str:
+    """SQLiteに保存するキーを生成する"""
+    festival_phonemes, phonemizer_phonemes = key
+    return json.dumps(
+        [fingerprint, festival_phonemes, phonemizer_phonemes], ensure_ascii=False
+    )
+
+
+def encode_result(result: AlignmentResult) -> str:
+    """アライメント結果をSQLiteに保存する値に変換する"""
+    if isinstance(result, AlignmentSuccess):
+        return json.dumps({"pairs": result.pairs})
+    return json.dumps({"error": result.message}, ensure_ascii=False)
+
+
+def decode_result(value: str) -> AlignmentResult:
+    """SQLiteに保存した値をアライメント結果に変換する"""
+    data = json.loads(value)
+    if "pairs" in data:
+        return AlignmentSuccess(pairs=tuple(tuple(pair) for pair in data["pairs"]))
+    return AlignmentFailure(message=data["error"])
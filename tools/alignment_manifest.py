@@ -0,0 +1,124 @@
+"""テキスト・音声ファイルの内容ごとにMFAのアライメント結果のTextGridを保存するマニフェスト"""
+
+import hashlib
+from pathlib import Path
+
+from pydantic import BaseModel
+
+from utility.logger_utility import get_logger
+from utility.sqlite_cache_utility import CacheStats, SqliteLruCache
+
+logger = get_logger(Path(__file__))
+
+
+class AlignmentPair(BaseModel, frozen=True):
+    """MFAに渡すテキスト・音声ファイルの組と話者ID"""
+
+    text_path: Path
+    wav_path: Path
+    speaker_id: str
+
+
+class AlignmentManifest:
+    """ファイル内容のハッシュ・前処理・話者とMFAの指紋をキーにTextGridを保存するキャッシュ。ファイルのハッシュはパス・サイズ・更新時刻ごとに別のファイルへ別の上限件数で保存する"""
+
+    def __init__(
+        self, path: Path, max_entries: int, hash_max_entries: int, fingerprint: str
+    ) -> None:
+        self.store = SqliteLruCache(path, max_entries)
+        self.hash_store = SqliteLruCache(build_hash_store_path(path), hash_max_entries)
+        self.fingerprint = fingerprint
+
+    def build_keys(
+        self,
+        pairs: list[AlignmentPair],
+        multi_speaker: bool,
+        remove_problematic_chars: bool,
+    ) -> dict[AlignmentPair, str]:
+        """ファイル内容のハッシュからペアごとのキーを生成する"""
+        hashes = self.hash_files(
+            [pair.text_path for pair in pairs] + [pair.wav_path for pair in pairs]
+        )
+        return {
+            pair: build_pair_key(
+                self.fingerprint,
+                hashes[pair.text_path],
+                hashes[pair.wav_path],
+                pair.speaker_id,
+                multi_speaker,
+                remove_problematic_chars,
+            )
+            for pair in pairs
+        }
+
+    def hash_files(self, paths: list[Path]) -> dict[Path, str]:
+        """ファイル内容のハッシュを返す。パス・サイズ・更新時刻が変わっていなければ保存済みのハッシュを使う"""
+        stat_keys = {path: build_stat_key(path) for path in paths}
+        found = self.hash_store.get_many(list(stat_keys.values()))
+        hashes: dict[Path, str] = {}
+        computed: dict[str, str] = {}
+        for path, stat_key in stat_keys.items():
+            if stat_key in found:
+                hashes[path] = found[stat_key]
+            else:
+                hashes[path] = hash_file(path)
+                computed[stat_key] = hashes[path]
+        logger.debug(f"ハッシュを計算したファイル数: {len(computed)}/{len(paths)}")
+        self.hash_store.put_many(computed)
+        return hashes
+
+    def get_many(self, keys: list[str]) -> dict[str, str]:
+        """保存済みのTextGridを返す。未保存のキーは結果に含めない"""
+        return self.store.get_many(keys)
+
+    def put_many(self, items: dict[str, str]) -> None:
+        """TextGridを保存する"""
+        self.store.put_many(items)
+
+    def stats(self) -> CacheStats:
+        """TextGridのヒット・ミス回数と保存件数を返す"""
+        return self.store.stats()
+
+    def close(self) -> None:
+        """マニフェストを閉じる"""
+        self.store.close()
+        self.hash_store.close()
+
+
+def build_hash_store_path(path: Path) -> Path:
+    """マニフェストのパスから、ファイルのハッシュを保存するファイルのパスを作る"""
+    return path.with_name(f"{path.stem}.hashes{path.suffix}")
+
+
+def build_pair_key(
+    fingerprint: str,
+    text_hash: str,
+    wav_hash: str,
+    speaker_id: str,
+    multi_speaker: bool,
+    remove_problematic_chars: bool,
+) -> str:
+    """TextGridを保存するキーを生成する"""
+    return "\t".join(
+        [
+            "textgrid",
+            fingerprint,
+            text_hash,
+            wav_hash,
+            speaker_id,
+            str(multi_speaker),
+            str(remove_problematic_chars),
+        ]
+    )
+
+
+def build_stat_key(path: Path) -> str:
+    """ファイルのハッシュを保存するキーを生成する"""
+    stat = path.stat()
+    return f"{path.resolve()}\t{stat.st_size}\t{stat.st_mtime_ns}"
+
+
+def hash_file(path: Path) -> str:
+    """ファイル内容のSHA-256を返す"""
+    with path.open("rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
@@ -4,17 +4,29 @@
 Usage:
     PYTHONPATH=. uv run python tools/extract_feature.py --text-glob "tools/data/*.txt" --wav-glob "tools/data/*.wav" --output-dir ./hiho_aligned_output
     PYTHONPATH=. uv run python tools/extract_feature.py --text-glob "tools/data/*.txt" --wav-glob "tools/data/*.wav" --output-dir ./hiho_aligned_output --verbose
+    PYTHONPATH=. uv run python tools/extract_feature.py --text-glob "tools/data/*.txt" --wav-glob "tools/data/*.wav" --output-dir ./hiho_aligned_output --manifest-path ./hiho_aligned_output/manifest.sqlite3
 """
 
 from pathlib import Path
 from typing import Annotated
 
+import numpy as np
 import typer
+from numpy.typing import NDArray
 from pydantic import BaseModel
 
 from tools.feature_extractor_utils import add_silence_phonemes
-from tools.process_alignment import LabEntry, alignment
-from tools.process_syllable import UnifiedPhonemeInfo, process_syllables
+from tools.process_alignment import (
+    LabEntry,
+    alignment,
+    configure_process_alignment,
+    default_process_alignment_setting,
+)
+from tools.process_syllable import (
+    ProcessSyllableFailure,
+    UnifiedPhonemeTable,
+    process_syllables_batch,
+)
 from utility.file_utility import expand_glob_pattern
 from utility.json_utility import write_json_list
 from utility.logger_utility import get_logger, logging_setting
@@ -35,6 +47,50 @@ class AlignedPhonemeInfo(BaseModel):
     end: float
 
 
+class AlignedPhonemeTable:
+    """UnifiedPhonemeTableの各列にlabの開始・終了時間の配列を加えた音素情報"""
+
+    def __init__(
+        self,
+        table: UnifiedPhonemeTable,
+        starts: NDArray[np.float64],
+        ends: NDArray[np.float64],
+    ) -> None:
+        if not len(table) == len(starts) == len(ends):
+            raise ValueError(
+                f"列の長さが一致しません: {len(table)}, {len(starts)}, {len(ends)}"
+            )
+        self.table = table
+        self.starts = starts
+        self.ends = ends
+
+    def to_infos(self) -> list[AlignedPhonemeInfo]:
+        """AlignedPhonemeInfoのリストに変換する"""
+        return [
+            AlignedPhonemeInfo(
+                word=word,
+                word_index=word_index,
+                syllable_index=syllable_index,
+                phoneme=phoneme,
+                phoneme_index=phoneme_index,
+                stress=stress,
+                start=start,
+                end=end,
+            )
+            for word, phoneme, word_index, syllable_index, phoneme_index, stress, start, end in zip(
+                self.table.words,
+                self.table.phonemes,
+                self.table.word_indexes.tolist(),
+                self.table.syllable_indexes.tolist(),
+                self.table.phoneme_indexes.tolist(),
+                self.table.stresses.tolist(),
+                self.starts.tolist(),
+                self.ends.tolist(),
+                strict=True,
+            )
+        ]
+
+
 def main(
     text_glob: Annotated[
         str,
@@ -56,12 +112,39 @@ def main(
             help="TextGridファイルの出力先ディレクトリ。指定しない場合は出力しない。"
         ),
     ] = None,
+    manifest_path: Annotated[
+        Path | None,
+        typer.Option(
+            help="アライメント結果を保存するマニフェストのパス。指定すると内容の変わっていないファイルはMFAを実行しない。"
+        ),
+    ] = None,
+    pronunciation_dictionary_path: Annotated[
+        Path | None,
+        typer.Option(
+            help="mfa g2pの結果を保存する発音辞書のパス。指定すると辞書にない単語だけmfa g2pにかける。"
+        ),
+    ] = None,
+    workspace_root: Annotated[
+        Path | None,
+        typer.Option(
+            help="MFAの作業ディレクトリを置くディレクトリ。指定するとコーパスと辞書が前回と同じ場合にMFAの特徴量などを再利用する。"
+        ),
+    ] = None,
     verbose: Annotated[
         bool, typer.Option(help="詳細なデバッグ出力をstderrに出す")
     ] = False,
 ) -> None:
     """コマンドライン引数から実行するエントリポイント"""
     logging_setting(verbose)
+    configure_process_alignment(
+        default_process_alignment_setting().model_copy(
+            update={
+                "manifest_path": manifest_path,
+                "pronunciation_dictionary_path": pronunciation_dictionary_path,
+                "workspace_root": workspace_root,
+            }
+        )
+    )
     phoneme_dict = extract_aligned_feature(text_glob, wav_glob, output_textgrid_dir)
     for stem, infos in phoneme_dict.items():
         json_path = Path(output_dir) / f"{stem}.json"
@@ -85,55 +168,67 @@ def extract_aligned_feature(
             f"テキストファイルと音声ファイルの数が一致しません: text_paths={len(text_paths)}, wav_paths={len(wav_paths)}"
         )
 
-    lab_dict = alignment(text_glob, wav_glob, output_textgrid_dir)
+    lab_dict = alignment(
+        text_glob,
+        wav_glob,
+        multi_speaker=False,
+        output_textgrid_dir=output_textgrid_dir,
+        remove_problematic_chars=False,
+    )
     phoneme_dict: dict[str, list[AlignedPhonemeInfo]] = {}
 
-    for text_path in text_paths:
+    texts = [text_path.read_text(encoding="utf-8").strip() for text_path in text_paths]
+    syllable_results = process_syllables_batch(texts)
+    for text_path, syllable_result in zip(text_paths, syllable_results, strict=True):
         stem = text_path.stem
-        txt = text_path.read_text(encoding="utf-8").strip()
-        unified_infos = process_syllables(txt)
+        if isinstance(syllable_result, ProcessSyllableFailure):
+            raise ValueError(
+                f"音素情報の抽出に失敗しました: {stem}: {syllable_result.message}"
+            )
         lab_entries = lab_dict.get(stem)
         if lab_entries is None:
             raise ValueError(f"lab情報が見つかりません: {stem}")
-        phoneme_dict[stem] = combine_phoneme_with_lab(unified_infos, lab_entries, stem)
+        phoneme_dict[stem] = combine_phoneme_with_lab(
+            syllable_result.table, lab_entries, stem
+        ).to_infos()
     return phoneme_dict
 
 
 def combine_phoneme_with_lab(
-    unified_infos: list[UnifiedPhonemeInfo], lab_entries: list[LabEntry], stem: str
-) -> list[AlignedPhonemeInfo]:
+    table: UnifiedPhonemeTable, lab_entries: list[LabEntry], stem: str
+) -> AlignedPhonemeTable:
     """音素情報とlabアライメント情報を結合する
 
     NOTE: extract_feature.pyのみ例外的に、音素不一致はエラーにせず警告として処理し続行する。
     """
-    unified_infos = add_silence_phonemes(unified_infos)
+    table = add_silence_phonemes(table)
 
-    result = []
-    n = min(len(unified_infos), len(lab_entries))
-    if len(unified_infos) != len(lab_entries):
+    n = min(len(table), len(lab_entries))
+    if len(table) != len(lab_entries):
         logger.warning(
-            f"音素数不一致: {stem}, lab_entries数={len(lab_entries)}, unified_infos数={len(unified_infos)}"
+            f"音素数不一致: {stem}, lab_entries数={len(lab_entries)}, unified_infos数={len(table)}"
         )
-    for i in range(n):
-        info = unified_infos[i]
-        lab = lab_entries[i]
-        if info.phoneme != lab.phoneme:
-            logger.warning(
-                f"音素不一致: {stem}, phoneme_index={info.phoneme_index}, info={info.phoneme}, lab={lab.phoneme}"
-            )
-        result.append(
-            AlignedPhonemeInfo(
-                word=info.word,
-                word_index=info.word_index,
-                syllable_index=info.syllable_index,
-                phoneme=lab.phoneme,
-                phoneme_index=info.phoneme_index,
-                stress=info.stress,
-                start=lab.start,
-                end=lab.end,
-            )
+    lab_phonemes = [lab.phoneme for lab in lab_entries[:n]]
+    mismatches = np.flatnonzero(
+        np.array(table.phonemes[:n], dtype=object)
+        != np.array(lab_phonemes, dtype=object)
+    )
+    for i in mismatches.tolist():
+        logger.warning(
+            f"音素不一致: {stem}, phoneme_index={table.phoneme_indexes[i]}, info={table.phonemes[i]}, lab={lab_phonemes[i]}"
         )
-    return result
+    return AlignedPhonemeTable(
+        table=UnifiedPhonemeTable(
+            words=table.words[:n],
+            phonemes=lab_phonemes,
+            word_indexes=table.word_indexes[:n],
+            syllable_indexes=table.syllable_indexes[:n],
+            phoneme_indexes=table.phoneme_indexes[:n],
+            stresses=table.stresses[:n],
+        ),
+        starts=np.array([lab.start for lab in lab_entries[:n]], dtype=np.float64),
+        ends=np.array([lab.end for lab in lab_entries[:n]], dtype=np.float64),
+    )
 
 
 if __name__ == "__main__":
@@ -2,49 +2,28 @@
 
 from pathlib import Path
 
-from tools.process_syllable import UnifiedPhonemeInfo
+import numpy as np
+from numpy.typing import NDArray
+
+from tools.process_syllable import UnifiedPhonemeTable
 from utility.logger_utility import get_logger
 
 logger = get_logger(Path(__file__))
 
 
-def add_silence_phonemes(
-    unified_infos: list[UnifiedPhonemeInfo],
-) -> list[UnifiedPhonemeInfo]:
-    """unified_infosの先頭・末尾に無音要素を追加する"""
-    result = []
-
-    result.append(
-        UnifiedPhonemeInfo(
-            word="",
-            word_index=0,
-            syllable_index=0,
-            phoneme="",
-            phoneme_index=0,
-            stress=0,
-        )
+def add_silence_phonemes(table: UnifiedPhonemeTable) -> UnifiedPhonemeTable:
+    """音素情報の先頭・末尾に無音要素を追加する"""
+    return UnifiedPhonemeTable(
+        words=["", *table.words, ""],
+        phonemes=["", *table.phonemes, ""],
+        word_indexes=pad_indexes(table.word_indexes),
+        syllable_indexes=pad_indexes(table.syllable_indexes),
+        phoneme_indexes=pad_indexes(table.phoneme_indexes),
+        stresses=np.concatenate([[0], table.stresses, [0]]).astype(np.int64),
     )
 
-    for info in unified_infos:
-        result.append(
-            UnifiedPhonemeInfo(
-                word=info.word,
-                word_index=info.word_index + 1,
-                syllable_index=info.syllable_index + 1,
-                phoneme=info.phoneme,
-                phoneme_index=info.phoneme_index + 1,
-                stress=info.stress,
-            )
-        )
-
-    result.append(
-        UnifiedPhonemeInfo(
-            word="",
-            word_index=result[-1].word_index + 1,
-            syllable_index=result[-1].syllable_index + 1,
-            phoneme="",
-            phoneme_index=result[-1].phoneme_index + 1,
-            stress=0,
-        )
-    )
-    return result
+
+def pad_indexes(indexes: NDArray[np.int64]) -> NDArray[np.int64]:
+    """インデックスを1つずらして先頭に0を追加し、末尾にその直前の次のインデックスを追加する"""
+    shifted = np.concatenate([[0], indexes + 1]).astype(np.int64)
+    return np.append(shifted, shifted[-1] + 1)
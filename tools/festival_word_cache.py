@@ -0,0 +1,86 @@
+"""Festivalが単語ごとに出力したシラブル・音素・ストレスを永続化するキャッシュ"""
+
+import json
+from pathlib import Path
+
+from pydantic import BaseModel
+
+from utility.logger_utility import get_logger
+from utility.sqlite_cache_utility import CacheStats, SqliteLruCache
+
+logger = get_logger(Path(__file__))
+
+CONTEXT_DEPENDENT_WORD_PREFIX = "'"
+
+
+class TaggedWord(BaseModel, frozen=True):
+    """Festivalの単語と品詞"""
+
+    word: str
+    pos: str
+
+
+class CachedSyllable(BaseModel):
+    """キャッシュするシラブルのストレスと音素列"""
+
+    stress: int
+    phonemes: list[str]
+
+
+class FestivalWordCache:
+    """単語・品詞・Festivalの指紋をキーにシラブル列を保存するキャッシュ"""
+
+    def __init__(self, path: Path, max_entries: int, fingerprint: str) -> None:
+        self.store = SqliteLruCache(path, max_entries)
+        self.fingerprint = fingerprint
+
+    def get_many(
+        self, words: list[TaggedWord]
+    ) -> dict[TaggedWord, list[CachedSyllable]]:
+        """キャッシュ済みの単語のシラブル列を返す。未キャッシュの単語は結果に含めない"""
+        keys = {build_cache_key(self.fingerprint, word): word for word in words}
+        found = self.store.get_many(list(keys))
+        return {keys[key]: decode_syllables(value) for key, value in found.items()}
+
+    def put_many(self, items: dict[TaggedWord, list[CachedSyllable]]) -> None:
+        """単語のシラブル列を保存する"""
+        self.store.put_many(
+            {
+                build_cache_key(self.fingerprint, word): encode_syllables(syllables)
+                for word, syllables in items.items()
+            }
+        )
+
+    def stats(self) -> CacheStats:
+        """ヒット・ミス回数と保存件数を返す"""
+        return self.store.stats()
+
+    def close(self) -> None:
+        """キャッシュを閉じる"""
+        self.store.close()
+
+
+def is_cacheable_word(word: TaggedWord) -> bool:
+    """前後の単語で発音が変わらずキャッシュできる単語か判定する。postlex_apos_s_checkが前の音素を見るアポストロフィ始まりの単語は除く"""
+    return not word.word.startswith(CONTEXT_DEPENDENT_WORD_PREFIX)
+
+
+def build_cache_key(fingerprint: str, word: TaggedWord) -> str:
+    """キャッシュのキーを生成する"""
+    return f"{fingerprint}\t{word.pos}\t{word.word}"
+
+
+def encode_syllables(syllables: list[CachedSyllable]) -> str:
+    """シラブル列をキャッシュの値に変換する"""
+    return json.dumps(
+        [[syllable.stress, syllable.phonemes] for syllable in syllables],
+        ensure_ascii=False,
+    )
+
+
+def decode_syllables(value: str) -> list[CachedSyllable]:
+    """キャッシュの値をシラブル列に変換する"""
+    return [
+        CachedSyllable(stress=stress, phonemes=phonemes)
+        for stress, phonemes in json.loads(value)
+    ]
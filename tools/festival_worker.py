@@ -0,0 +1,260 @@
+"""常駐Festivalインタプリタのワーカーとワーカープール"""
+
+import codecs
+import os
+import platform
+import selectors
+import subprocess
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from utility.logger_utility import get_logger
+
+logger = get_logger(Path(__file__))
+
+
+class FestivalWorker:
+    """セットアップ済みのFestivalインタプリタ1プロセスを保持するワーカー"""
+
+    def __init__(self, setup_script: str, response_timeout: float) -> None:
+        self.setup_script = setup_script
+        self.response_timeout = response_timeout
+        self.restart_count = 0
+        self.process, self.reader = start_festival_process(
+            setup_script, response_timeout
+        )
+
+    def run(self, script: str) -> str:
+        """スクリプトを送信し、終端マーカーまでの出力を返す。プロセスが落ちているか応答がなければ再起動して1度だけ再送し、再送も失敗したらFestivalCrashErrorを投げる"""
+        try:
+            return send_script(self.process, self.reader, script, self.response_timeout)
+        except FestivalCrashError as e:
+            logger.warning(f"festivalプロセスを再起動します: {e}")
+            self.restart()
+        return send_script(self.process, self.reader, script, self.response_timeout)
+
+    def restart(self) -> None:
+        """プロセスを強制終了し、セットアップからやり直す"""
+        self.kill()
+        self.restart_count += 1
+        self.process, self.reader = start_festival_process(
+            self.setup_script, self.response_timeout
+        )
+
+    def kill(self) -> None:
+        """応答しないプロセスを待たずに強制終了する"""
+        self.reader.close()
+        self.process.kill()
+        self.process.wait()
+
+    def close(self) -> None:
+        """プロセスを終了する"""
+        self.reader.close()
+        if self.process.stdin is not None:
+            try:
+                self.process.stdin.close()
+            except OSError:
+                logger.debug("festivalプロセスのstdinは既に閉じています")
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+class FestivalWorkerPool:
+    """FestivalWorkerを最大pool_size個まで遅延起動して使い回すプール"""
+
+    def __init__(
+        self, setup_script: str, pool_size: int, response_timeout: float
+    ) -> None:
+        if pool_size < 1:
+            raise ValueError(f"pool_sizeは1以上である必要があります: {pool_size}")
+        self.setup_script = setup_script
+        self.pool_size = pool_size
+        self.response_timeout = response_timeout
+        self.idle_workers: list[FestivalWorker] = []
+        self.started_count = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def run(self, script: str) -> str:
+        """空いているワーカーでスクリプトを実行し出力を返す"""
+        with self.session() as worker:
+            return worker.run(script)
+
+    @contextmanager
+    def session(self) -> Iterator[FestivalWorker]:
+        """空いているワーカーを1つ占有する。インタプリタの状態を引き継いで複数のスクリプトを送るときに使う"""
+        worker = self.acquire()
+        try:
+            yield worker
+        finally:
+            self.release(worker)
+
+    def acquire(self) -> FestivalWorker:
+        """空いているワーカーを取得する。上限未満なら新しく起動し、上限なら空くまで待つ"""
+        with self.condition:
+            while True:
+                if self.closed:
+                    raise RuntimeError("FestivalWorkerPoolは既に閉じられています")
+                if self.idle_workers:
+                    return self.idle_workers.pop()
+                if self.started_count < self.pool_size:
+                    self.started_count += 1
+                    break
+                self.condition.wait()
+        try:
+            logger.debug(
+                f"festivalワーカーを起動: {self.started_count}/{self.pool_size}"
+            )
+            return FestivalWorker(self.setup_script, self.response_timeout)
+        except Exception:
+            with self.condition:
+                self.started_count -= 1
+                self.condition.notify()
+            raise
+
+    def release(self, worker: FestivalWorker) -> None:
+        """ワーカーをプールに返却する"""
+        with self.condition:
+            if self.closed:
+                worker.close()
+                return
+            self.idle_workers.append(worker)
+            self.condition.notify()
+
+    def close(self) -> None:
+        """待機中のワーカーをすべて終了する"""
+        with self.condition:
+            self.closed = True
+            workers = self.idle_workers
+            self.idle_workers = []
+            self.condition.notify_all()
+        for worker in workers:
+            worker.close()
+
+
+class FestivalOutputReader:
+    """Festivalプロセスの標準出力を期限付きで1行ずつ読むリーダー"""
+
+    def __init__(self, process: subprocess.Popen[str]) -> None:
+        if process.stdout is None:
+            raise RuntimeError("festivalプロセスの標準出力が開かれていません")
+        self.fd = process.stdout.fileno()
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.eof = False
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.fd, selectors.EVENT_READ)
+
+    def readline(self, deadline: float) -> str:
+        """改行までの1行を返す。終了済みなら残りを返し、何も残っていなければ空文字列を返す。期限を過ぎたら例外を投げる"""
+        while "\n" not in self.buffer and not self.eof:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise FestivalCrashError("festivalの応答がタイムアウトしました")
+            if not self.selector.select(remaining):
+                continue
+            data = os.read(self.fd, 65536)
+            if data:
+                self.buffer += self.decoder.decode(data)
+            else:
+                self.buffer += self.decoder.decode(b"", final=True)
+                self.eof = True
+        line, newline, rest = self.buffer.partition("\n")
+        self.buffer = rest
+        return line + newline
+
+    def close(self) -> None:
+        """セレクタを閉じる"""
+        self.selector.close()
+
+
+class FestivalCrashError(Exception):
+    """Festivalプロセスが応答の途中で終了したか、期限内に応答しなかったことを表す例外"""
+
+
+class FestivalStartupError(Exception):
+    """Festivalプロセスを起動できないか、セットアップスクリプトの評価に失敗したことを表す例外"""
+
+
+def start_festival_process(
+    setup_script: str, response_timeout: float
+) -> tuple[subprocess.Popen[str], FestivalOutputReader]:
+    """Festivalプロセスを起動し、セットアップスクリプトの評価完了まで待つ"""
+    cmd = get_festival_command()
+    logger.debug(f"festivalプロセスを起動: {' '.join(cmd)}")
+    try:
+        process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+        )
+    except OSError as e:
+        raise FestivalStartupError("festival起動エラー") from e
+    reader = FestivalOutputReader(process)
+    try:
+        output = send_script(process, reader, setup_script, response_timeout)
+    except FestivalCrashError as e:
+        reader.close()
+        process.kill()
+        process.wait()
+        raise FestivalStartupError("festivalのセットアップに失敗") from e
+    logger.debug("=== festivalセットアップ出力 ===\n" + output)
+    return process, reader
+
+
+def send_script(
+    process: subprocess.Popen[str],
+    reader: FestivalOutputReader,
+    script: str,
+    response_timeout: float,
+) -> str:
+    """スクリプトと終端マーカーを送信し、マーカーが出力されるまでの出力を返す。response_timeout秒以内に終わらなければ例外を投げる"""
+    if process.stdin is None:
+        raise RuntimeError("festivalプロセスの標準入出力が開かれていません")
+    marker = f"__festival_response_end_{uuid.uuid4().hex}__"
+    try:
+        process.stdin.write(build_response_end_script(script, marker))
+        process.stdin.flush()
+    except (BrokenPipeError, OSError) as e:
+        raise FestivalCrashError("festivalへの書き込みに失敗") from e
+
+    deadline = time.monotonic() + response_timeout
+    lines: list[str] = []
+    while True:
+        line = reader.readline(deadline)
+        if line == "":
+            raise FestivalCrashError(
+                f"festivalプロセスが終了しました: returncode={process.poll()}"
+            )
+        if marker in line:
+            return "".join(lines)
+        lines.append(line)
+
+
+def build_response_end_script(script: str, marker: str) -> str:
+    """スクリプトの末尾に終端マーカーの出力と標準出力のフラッシュを付け足す"""
+    return f"""{script}
+(format t "\\n%s\\n" "{marker}")
+(fflush nil)
+"""
+
+
+def get_festival_command() -> list[str]:
+    """OSに応じた対話モードのFestival起動コマンドを返す"""
+    system = platform.system()
+    if system == "Darwin":
+        return ["./festival/bin/festival", "-i", "--pipe"]
+    elif system == "Linux":
+        return ["festival", "-i", "--pipe"]
+    else:
+        raise RuntimeError(f"未対応OS: {system}")
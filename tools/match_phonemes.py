@@ -2,23 +2,118 @@
 2種類の音素列を受け取り、それらの対応関係を示すインデックスペアのリストを返すモジュール。
 """
 
+import atexit
+import threading
 from pathlib import Path
 
-from tools.phoneme_matcher import align_phonemes, verify_complete_alignment
-from tools.symbol_loader import load_symbol_mapping
+from pydantic import BaseModel
+
+from tools.alignment_cache import (
+    AlignmentCache,
+    AlignmentFailure,
+    AlignmentResult,
+    AlignmentSuccess,
+)
+from tools.phoneme_matcher import align_phonemes_batch, verify_complete_alignment
+from tools.symbol_loader import get_compiled_symbol_mapping
 from utility.logger_utility import get_logger
 
 logger = get_logger(Path(__file__))
 
 
+class MatchPhonemesSetting(BaseModel):
+    """音素列アライメントのキャッシュ設定"""
+
+    cache_max_entries: int
+    cache_path: Path | None
+
+
 def match_phonemes(
     festival_phonemes: list[str], phonemizer_phonemes: list[str]
 ) -> list[tuple[int, int]]:
-    """2種類の音素列を受け取り、それらの対応関係を示すインデックスペアのリストを返す"""
-    if not festival_phonemes or not phonemizer_phonemes:
-        return []
-
-    mapping_dict = load_symbol_mapping()
-    alignment = align_phonemes(festival_phonemes, phonemizer_phonemes, mapping_dict)
-    verify_complete_alignment(alignment, festival_phonemes, phonemizer_phonemes)
-    return alignment
+    """2種類の音素列を受け取り、それらの対応関係を示すインデックスペアのリストを返す。失敗した結果もキャッシュする"""
+    result = match_phonemes_batch([(festival_phonemes, phonemizer_phonemes)])[0]
+    if isinstance(result, AlignmentFailure):
+        raise ValueError(result.message)
+    return list(result.pairs)
+
+
+def match_phonemes_batch(
+    pairs: list[tuple[list[str], list[str]]],
+) -> list[AlignmentResult]:
+    """複数の音素列ペアをまとめてアライメントし、ペアごとの成功・失敗の結果を返す。キャッシュ済みのペアは計算しない"""
+    cache = get_alignment_cache()
+    keys = [(tuple(festival), tuple(phonemizer)) for festival, phonemizer in pairs]
+    targets = [key for key in dict.fromkeys(keys) if key[0] and key[1]]
+    found = cache.get_many(targets)
+    misses = [key for key in targets if key not in found]
+    if misses:
+        new_items = dict(
+            zip(
+                misses,
+                compute_alignments([(list(f), list(p)) for f, p in misses]),
+                strict=True,
+            )
+        )
+        cache.put_many(new_items)
+        found.update(new_items)
+    return [
+        found[key] if key[0] and key[1] else AlignmentSuccess(pairs=()) for key in keys
+    ]
+
+
+def compute_alignments(
+    pairs: list[tuple[list[str], list[str]]],
+) -> list[AlignmentResult]:
+    """アライメントを計算し、両方の音素列を完全にカバーしているかまで検証した結果を返す"""
+    results = align_phonemes_batch(pairs, get_compiled_symbol_mapping())
+    verified: list[AlignmentResult] = []
+    for (festival, phonemizer), result in zip(pairs, results, strict=True):
+        if isinstance(result, AlignmentSuccess):
+            try:
+                verify_complete_alignment(list(result.pairs), festival, phonemizer)
+            except ValueError as e:
+                result = AlignmentFailure(message=str(e))
+        verified.append(result)
+    return verified
+
+
+def configure_match_phonemes(setting: MatchPhonemesSetting) -> None:
+    """音素列アライメントのキャッシュ設定を変更する。作成済みのキャッシュは閉じる"""
+    global match_phonemes_setting
+    close_alignment_cache()
+    with alignment_cache_lock:
+        match_phonemes_setting = setting
+
+
+def get_alignment_cache() -> AlignmentCache:
+    """現在の設定に対応するアライメントキャッシュを返す。未作成なら作成する"""
+    global alignment_cache
+    with alignment_cache_lock:
+        if alignment_cache is None:
+            alignment_cache = AlignmentCache(
+                match_phonemes_setting.cache_max_entries,
+                match_phonemes_setting.cache_path,
+                get_compiled_symbol_mapping().source_hash[:16],
+            )
+        return alignment_cache
+
+
+def close_alignment_cache() -> None:
+    """アライメントキャッシュを閉じる"""
+    global alignment_cache
+    with alignment_cache_lock:
+        if alignment_cache is not None:
+            alignment_cache.close()
+        alignment_cache = None
+
+
+def default_match_phonemes_setting() -> MatchPhonemesSetting:
+    """メモリ上だけにキャッシュするデフォルト設定を返す"""
+    return MatchPhonemesSetting(cache_max_entries=100_000, cache_path=None)
+
+
+match_phonemes_setting = default_match_phonemes_setting()
+alignment_cache: AlignmentCache | None = None
+alignment_cache_lock = threading.Lock()
+atexit.register(close_alignment_cache)
@@ -0,0 +1,249 @@
+"""conda runを介さずにmfa環境のmfaコマンドを直接実行するランチャー"""
+
+import atexit
+import json
+import os
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+
+from pydantic import BaseModel
+
+from utility.logger_utility import get_logger
+from utility.sqlite_cache_utility import SqliteLruCache
+
+logger = get_logger(Path(__file__))
+
+MFA_PACKAGE_NAME = "montreal-forced-aligner"
+MFA_ROOT_DIR_ENV = "MFA_ROOT_DIR"
+
+
+class MfaEnvironment(BaseModel, frozen=True):
+    """mfa環境のパス・mfaコマンドのパス・MFAのバージョン"""
+
+    name: str
+    prefix: Path
+    executable: Path
+    version: str
+
+
+class MfaLauncherSetting(BaseModel):
+    """mfaランチャーの設定"""
+
+    env_name: str
+    cache_path: Path
+    cache_max_entries: int
+
+
+def run_mfa(args: list[str]) -> str:
+    """mfaコマンドを直接実行し、標準出力を返す"""
+    environment = get_mfa_environment()
+    cmd = [str(environment.executable), *args]
+    logger.debug(f"実行コマンド: {' '.join(cmd)}")
+    return subprocess.check_output(
+        cmd, text=True, env=build_mfa_environ(environment, dict(os.environ))
+    )
+
+
+def call_mfa(args: list[str]) -> None:
+    """mfaコマンドを直接実行し、出力はそのまま端末に流す"""
+    environment = get_mfa_environment()
+    cmd = [str(environment.executable), *args]
+    logger.debug(f"実行コマンド: {' '.join(cmd)}")
+    subprocess.check_call(cmd, env=build_mfa_environ(environment, dict(os.environ)))
+
+
+def ensure_model_exists(model_type: str, model_name: str) -> None:
+    """モデル・辞書が存在しなければダウンロードする。確認済みの結果は環境パスとMFAのバージョンごとにディスクへ保存する"""
+    environment = get_mfa_environment()
+    cache = get_mfa_launcher_cache()
+    key = build_model_cache_key(environment, model_type, model_name)
+    if cache.get_many([key]):
+        logger.debug(f"{model_type}モデル {model_name} は確認済みです")
+        return
+
+    result = run_mfa(["model", "list", model_type])
+    logger.debug(f"{model_type}モデル一覧: {result}")
+
+    if model_name not in result:
+        logger.info(f"{model_type}モデル {model_name} をダウンロードします")
+        try:
+            call_mfa(["model", "download", model_type, model_name])
+        except Exception as e:
+            raise RuntimeError(
+                f"{model_type}モデル {model_name} のダウンロードに失敗"
+            ) from e
+    else:
+        logger.debug(f"{model_type}モデル {model_name} は既に存在します")
+    cache.put_many({key: "1"})
+
+
+def get_mfa_model_path(model_type: str, model_name: str) -> Path:
+    """ダウンロード済みのMFAの事前学習モデルのパスを返す"""
+    if MFA_ROOT_DIR_ENV in os.environ:
+        root_dir = Path(os.environ[MFA_ROOT_DIR_ENV])
+    else:
+        root_dir = Path.home() / "Documents" / "MFA"
+    model_path = root_dir / "pretrained_models" / model_type / f"{model_name}.zip"
+    if not model_path.is_file():
+        raise FileNotFoundError(
+            f"{model_type}モデル {model_name} が見つかりません: {model_path}"
+        )
+    return model_path
+
+
+def get_mfa_environment() -> MfaEnvironment:
+    """プロセスごとに1度だけmfa環境を解決して返す"""
+    global mfa_environment
+    with mfa_launcher_lock:
+        if mfa_environment is None:
+            mfa_environment = resolve_mfa_environment(
+                mfa_launcher_setting.env_name, get_mfa_launcher_cache_unlocked()
+            )
+        return mfa_environment
+
+
+def resolve_mfa_environment(env_name: str, cache: SqliteLruCache) -> MfaEnvironment:
+    """ディスクキャッシュにある環境パスを優先し、なければcondaに問い合わせてmfa環境を解決する"""
+    key = build_prefix_cache_key(env_name)
+    cached = cache.get_many([key])
+    if key in cached and (Path(cached[key]) / "conda-meta").is_dir():
+        prefix = Path(cached[key])
+        logger.debug(f"キャッシュ済みのmfa環境を使用: {prefix}")
+    else:
+        prefix = find_conda_env_prefix(env_name)
+        cache.put_many({key: str(prefix)})
+
+    executable = prefix / "bin" / "mfa"
+    if not executable.is_file():
+        raise RuntimeError(
+            f"mfa環境にmfaコマンドがインストールされていません: {executable}。詳細はdocs/mfa.mdを参照してください。"
+        )
+
+    activate_dir = prefix / "etc" / "conda" / "activate.d"
+    if activate_dir.is_dir() and any(activate_dir.iterdir()):
+        logger.warning(
+            f"conda環境のactivateスクリプトは実行されません: {sorted(p.name for p in activate_dir.iterdir())}"
+        )
+
+    environment = MfaEnvironment(
+        name=env_name,
+        prefix=prefix,
+        executable=executable,
+        version=read_conda_package_version(prefix, MFA_PACKAGE_NAME),
+    )
+    logger.debug(f"mfa環境: {environment}")
+    return environment
+
+
+def find_conda_env_prefix(env_name: str) -> Path:
+    """conda環境の一覧から指定した名前の環境パスを探す"""
+    logger.debug("condaコマンドの存在を確認")
+    if shutil.which("conda") is None:
+        raise RuntimeError(
+            "condaコマンドが見つかりません。詳細はdocs/mfa.mdを参照してください。"
+        )
+
+    logger.debug("conda環境の一覧を取得")
+    try:
+        output = subprocess.check_output(["conda", "env", "list", "--json"], text=True)
+    except Exception as e:
+        raise RuntimeError(
+            "conda環境一覧の取得に失敗しました。詳細はdocs/mfa.mdを参照してください。"
+        ) from e
+
+    for env in json.loads(output)["envs"]:
+        if Path(env).name == env_name:
+            return Path(env)
+    raise RuntimeError(
+        f"conda環境「{env_name}」が存在しません。詳細はdocs/mfa.mdを参照してください。"
+    )
+
+
+def read_conda_package_version(prefix: Path, package_name: str) -> str:
+    """conda環境のconda-metaからパッケージのバージョンを読む"""
+    for meta_path in (prefix / "conda-meta").glob(f"{package_name}-*.json"):
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if meta["name"] == package_name:
+            return meta["version"]
+    raise RuntimeError(
+        f"conda環境に{package_name}がインストールされていません: {prefix}。詳細はdocs/mfa.mdを参照してください。"
+    )
+
+
+def build_mfa_environ(
+    environment: MfaEnvironment, base_environ: dict[str, str]
+) -> dict[str, str]:
+    """conda activateと同様にPATHとCONDA_*変数を設定した環境変数を作る"""
+    environ = dict(base_environ)
+    bin_dir = str(environment.prefix / "bin")
+    if "PATH" in environ:
+        environ["PATH"] = os.pathsep.join([bin_dir, environ["PATH"]])
+    else:
+        environ["PATH"] = bin_dir
+    environ["CONDA_PREFIX"] = str(environment.prefix)
+    environ["CONDA_DEFAULT_ENV"] = environment.name
+    return environ
+
+
+def build_prefix_cache_key(env_name: str) -> str:
+    """環境パスを保存するキャッシュのキーを生成する"""
+    return f"prefix\t{env_name}"
+
+
+def build_model_cache_key(
+    environment: MfaEnvironment, model_type: str, model_name: str
+) -> str:
+    """確認済みモデルを保存するキャッシュのキーを生成する"""
+    return f"model\t{environment.prefix}\t{environment.version}\t{model_type}\t{model_name}"
+
+
+def configure_mfa_launcher(setting: MfaLauncherSetting) -> None:
+    """mfaランチャーの設定を変更する。解決済みの環境は破棄し、開いているキャッシュは閉じる"""
+    global mfa_launcher_setting, mfa_environment
+    close_mfa_launcher_cache()
+    with mfa_launcher_lock:
+        mfa_launcher_setting = setting
+        mfa_environment = None
+
+
+def get_mfa_launcher_cache() -> SqliteLruCache:
+    """現在の設定に対応するmfaランチャーのキャッシュを返す。未作成なら作成する"""
+    with mfa_launcher_lock:
+        return get_mfa_launcher_cache_unlocked()
+
+
+def get_mfa_launcher_cache_unlocked() -> SqliteLruCache:
+    """mfa_launcher_lockを取得済みの状態でキャッシュを返す"""
+    global mfa_launcher_cache
+    if mfa_launcher_cache is None:
+        mfa_launcher_cache = SqliteLruCache(
+            mfa_launcher_setting.cache_path, mfa_launcher_setting.cache_max_entries
+        )
+    return mfa_launcher_cache
+
+
+def close_mfa_launcher_cache() -> None:
+    """mfaランチャーのキャッシュを閉じる"""
+    global mfa_launcher_cache
+    with mfa_launcher_lock:
+        if mfa_launcher_cache is not None:
+            mfa_launcher_cache.close()
+        mfa_launcher_cache = None
+
+
+def default_mfa_launcher_setting() -> MfaLauncherSetting:
+    """ユーザーのキャッシュディレクトリにmfa環境の確認結果を保存するデフォルト設定を返す"""
+    return MfaLauncherSetting(
+        env_name="mfa",
+        cache_path=Path.home() / ".cache" / "check_english_analyze" / "mfa.sqlite3",
+        cache_max_entries=1000,
+    )
+
+
+mfa_launcher_setting = default_mfa_launcher_setting()
+mfa_environment: MfaEnvironment | None = None
+mfa_launcher_cache: SqliteLruCache | None = None
+mfa_launcher_lock = threading.Lock()
+atexit.register(close_mfa_launcher_cache)
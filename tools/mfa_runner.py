@@ -3,80 +3,18 @@
 import os
 import shutil
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Literal
 
+from tools.mfa_launcher import run_mfa
 from utility.logger_utility import get_logger
 
 logger = get_logger(Path(__file__))
 
+PROBLEMATIC_CHAR_TABLE = str.maketrans("", "", "[](){}")
 
-def validate_mfa_command() -> None:
-    """condaコマンド・mfa環境・mfaコマンドの存在を事前検証し、なければ例外を投げる"""
-    logger.debug("condaコマンドの存在を確認")
-    if shutil.which("conda") is None:
-        raise RuntimeError(
-            "condaコマンドが見つかりません。詳細はdocs/mfa.mdを参照してください。"
-        )
-
-    logger.debug("conda環境の一覧を取得")
-    try:
-        envs = subprocess.check_output(["conda", "env", "list"], text=True)
-    except Exception as e:
-        raise RuntimeError(
-            "conda環境一覧の取得に失敗しました。詳細はdocs/mfa.mdを参照してください。"
-        ) from e
-
-    logger.debug("mfa環境の存在を確認")
-    if not any(line.split() and line.split()[0] == "mfa" for line in envs.splitlines()):
-        raise RuntimeError(
-            "conda環境「mfa」が存在しません。詳細はdocs/mfa.mdを参照してください。"
-        )
-
-    logger.debug("mfaコマンドの存在を確認")
-    try:
-        result = subprocess.check_output(
-            ["conda", "run", "-n", "mfa", "which", "mfa"], text=True
-        )
-    except Exception as e:
-        raise RuntimeError(
-            "mfa環境の起動に失敗しました。詳細はdocs/mfa.mdを参照してください。"
-        ) from e
-
-    if not result.strip():
-        raise RuntimeError(
-            "mfa環境にmfaコマンドがインストールされていません。詳細はdocs/mfa.mdを参照してください。"
-        )
-
-
-def ensure_model_exists(model_type: str, model_name: str) -> None:
-    """モデル・辞書が存在しなければダウンロードする"""
-    result = subprocess.check_output(
-        ["conda", "run", "-n", "mfa", "mfa", "model", "list", model_type], text=True
-    )
-    logger.debug(f"{model_type}モデル一覧: {result}")
-
-    if model_name not in result:
-        logger.info(f"{model_type}モデル {model_name} をダウンロードします")
-        try:
-            subprocess.check_call(
-                [
-                    "conda",
-                    "run",
-                    "-n",
-                    "mfa",
-                    "mfa",
-                    "model",
-                    "download",
-                    model_type,
-                    model_name,
-                ],
-            )
-        except Exception as e:
-            raise RuntimeError(
-                f"{model_type}モデル {model_name} のダウンロードに失敗"
-            ) from e
-    else:
-        logger.debug(f"{model_type}モデル {model_name} は既に存在します")
+AudioStagingMode = Literal["hardlink", "symlink", "copy"]
 
 
 def run_mfa_align(
@@ -84,8 +22,12 @@ def run_mfa_align(
     dictionary_path_or_name: str,
     model_name: str,
     output_dir: Path,
+    beam: int,
+    retry_beam: int,
+    clean: bool,
+    temporary_directory: Path | None,
 ) -> str:
-    """mfa alignコマンドを実行し、出力を返す"""
+    """mfa alignコマンドを実行し、出力を返す。cleanしなければtemporary_directoryにあるMFAの特徴量などを再利用する"""
     if output_dir.exists():
         logger.debug(f"既存の出力ディレクトリを削除: {output_dir}")
         shutil.rmtree(output_dir)
@@ -95,27 +37,23 @@ def run_mfa_align(
         raise RuntimeError("CPUスレッド数の取得に失敗しました")
     logger.debug(f"CPUスレッド数: {num_jobs}")
 
-    cmd = [
-        "conda",
-        "run",
-        "-n",
-        "mfa",
-        "mfa",
+    args = [
         "align",
-        "--clean",
+        "--clean" if clean else "--no_clean",
         "--overwrite",
         str(corpus_dir),
         dictionary_path_or_name,
         model_name,
         str(output_dir),
-        "--beam=100",
-        "--retry_beams=400",
+        f"--beam={beam}",
+        f"--retry_beams={retry_beam}",
         f"--num_jobs={num_jobs}",
     ]
-    logger.debug(f"実行コマンド: {' '.join(cmd)}")
+    if temporary_directory is not None:
+        args.append(f"--temporary_directory={temporary_directory}")
 
     try:
-        result = subprocess.check_output(cmd, text=True)
+        result = run_mfa(args)
         logger.debug(f"コマンド実行結果: {result}")
         return result.strip()
     except subprocess.CalledProcessError as e:
@@ -133,12 +71,7 @@ def run_mfa_g2p(
         raise RuntimeError("CPUスレッド数の取得に失敗しました")
     logger.debug(f"CPUスレッド数: {num_jobs}")
 
-    cmd = [
-        "conda",
-        "run",
-        "-n",
-        "mfa",
-        "mfa",
+    args = [
         "g2p",
         "--clean",
         "--overwrite",
@@ -147,40 +80,57 @@ def run_mfa_g2p(
         str(output_dictionary_path),
         f"--num_jobs={num_jobs}",
     ]
-    logger.debug(f"実行コマンド: {' '.join(cmd)}")
 
     try:
-        result = subprocess.check_output(cmd, text=True)
+        result = run_mfa(args)
         logger.debug(f"コマンド実行結果: {result}")
         return result.strip()
     except subprocess.CalledProcessError as e:
         raise RuntimeError("mfa g2pコマンドの実行に失敗") from e
 
 
+def run_mfa_find_oovs(corpus_dir: Path, dictionary_path: Path, output_dir: Path) -> str:
+    """mfa find_oovsコマンドを実行し、出力を返す。MFA自身のトークナイザで辞書にない単語をoutput_dirに書き出す"""
+    num_jobs = os.cpu_count()
+    if num_jobs is None:
+        raise RuntimeError("CPUスレッド数の取得に失敗しました")
+    logger.debug(f"CPUスレッド数: {num_jobs}")
+
+    args = [
+        "find_oovs",
+        "--clean",
+        "--overwrite",
+        str(corpus_dir),
+        str(dictionary_path),
+        str(output_dir),
+        f"--num_jobs={num_jobs}",
+    ]
+
+    try:
+        result = run_mfa(args)
+        logger.debug(f"コマンド実行結果: {result}")
+        return result.strip()
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError("mfa find_oovsコマンドの実行に失敗") from e
+
+
 def prepare_corpus_dir(
     text_paths: list[Path],
     wav_paths: list[Path],
     corpus_dir: Path,
     remove_problematic_chars: bool,
+    audio_staging_mode: AudioStagingMode,
 ) -> None:
-    """MFA用コーパスディレクトリを作成し、ファイルをコピーする"""
+    """MFA用コーパスディレクトリを作成し、ファイルを配置する"""
     logger.debug(f"コーパスディレクトリを作成: {corpus_dir}")
     corpus_dir.mkdir(exist_ok=True)
 
+    files: list[tuple[Path, Path, Path]] = []
     for text_path, wav_path in zip(text_paths, wav_paths, strict=False):
-        logger.debug(f"ファイルの存在確認: {text_path}, {wav_path}")
-        if not text_path.exists():
-            raise FileNotFoundError(f"テキストファイルが見つかりません: {text_path}")
-        if not wav_path.exists():
-            raise FileNotFoundError(f"音声ファイルが見つかりません: {wav_path}")
-
-        wav_dst = corpus_dir / wav_path.name
-        txt_dst = corpus_dir / text_path.name
+        validate_corpus_files(text_path, wav_path)
+        files.append((text_path, wav_path, corpus_dir))
 
-        copy_text_file_with_preprocessing(text_path, txt_dst, remove_problematic_chars)
-
-        logger.debug(f"ファイルをコピー: {wav_path} -> {wav_dst}")
-        shutil.copy2(wav_path, wav_dst)
+    stage_corpus_files(files, remove_problematic_chars, audio_staging_mode)
 
 
 def prepare_multi_speaker_corpus_dir(
@@ -188,45 +138,99 @@ def prepare_multi_speaker_corpus_dir(
     wav_paths: list[Path],
     corpus_dir: Path,
     remove_problematic_chars: bool,
+    audio_staging_mode: AudioStagingMode,
 ) -> None:
     """複数話者対応のMFA用コーパスディレクトリを作成する"""
     logger.debug(f"複数話者用コーパスディレクトリを作成: {corpus_dir}")
     corpus_dir.mkdir(exist_ok=True)
 
-    speaker_groups: dict[str, list[tuple[Path, Path]]] = {}
-
+    files: list[tuple[Path, Path, Path]] = []
     for text_path, wav_path in zip(text_paths, wav_paths, strict=False):
-        logger.debug(f"ファイルの存在確認: {text_path}, {wav_path}")
-        if not text_path.exists():
-            raise FileNotFoundError(f"テキストファイルが見つかりません: {text_path}")
-        if not wav_path.exists():
-            raise FileNotFoundError(f"音声ファイルが見つかりません: {wav_path}")
-
-        parent_name = text_path.parent.name
-        if parent_name.startswith("speaker_"):
-            speaker_id = parent_name[8:]
-        else:
-            speaker_id = parent_name
-        if speaker_id not in speaker_groups:
-            speaker_groups[speaker_id] = []
-
-        speaker_groups[speaker_id].append((text_path, wav_path))
-
-    for speaker_id, files in speaker_groups.items():
+        validate_corpus_files(text_path, wav_path)
+
+        speaker_id = get_speaker_id(text_path)
         speaker_dir = corpus_dir / speaker_id
-        speaker_dir.mkdir(exist_ok=True)
-        logger.debug(f"話者 {speaker_id} のディレクトリを作成: {speaker_dir}")
+        if not speaker_dir.exists():
+            speaker_dir.mkdir()
+            logger.debug(f"話者 {speaker_id} のディレクトリを作成: {speaker_dir}")
 
-        for text_path, wav_path in files:
-            wav_dst = speaker_dir / wav_path.name
-            txt_dst = speaker_dir / text_path.name
+        files.append((text_path, wav_path, speaker_dir))
 
-            copy_text_file_with_preprocessing(
-                text_path, txt_dst, remove_problematic_chars
+    stage_corpus_files(files, remove_problematic_chars, audio_staging_mode)
+
+
+def validate_corpus_files(text_path: Path, wav_path: Path) -> None:
+    """テキストファイルと音声ファイルの存在を確認し、なければ例外を投げる"""
+    logger.debug(f"ファイルの存在確認: {text_path}, {wav_path}")
+    if not text_path.exists():
+        raise FileNotFoundError(f"テキストファイルが見つかりません: {text_path}")
+    if not wav_path.exists():
+        raise FileNotFoundError(f"音声ファイルが見つかりません: {wav_path}")
+
+
+def stage_corpus_files(
+    files: list[tuple[Path, Path, Path]],
+    remove_problematic_chars: bool,
+    audio_staging_mode: AudioStagingMode,
+) -> None:
+    """テキストファイル・音声ファイル・配置先ディレクトリの組をスレッドプールで並列に配置する"""
+    with ThreadPoolExecutor() as executor:
+        futures = [
+            executor.submit(
+                stage_corpus_file,
+                text_path,
+                wav_path,
+                destination_dir,
+                remove_problematic_chars,
+                audio_staging_mode,
             )
+            for text_path, wav_path, destination_dir in files
+        ]
+        for future in futures:
+            future.result()
+
+
+def stage_corpus_file(
+    text_path: Path,
+    wav_path: Path,
+    destination_dir: Path,
+    remove_problematic_chars: bool,
+    audio_staging_mode: AudioStagingMode,
+) -> None:
+    """テキストファイルを前処理して書き込み、音声ファイルを配置する"""
+    copy_text_file_with_preprocessing(
+        text_path, destination_dir / text_path.name, remove_problematic_chars
+    )
+    stage_audio_file(wav_path, destination_dir / wav_path.name, audio_staging_mode)
+
+
+def stage_audio_file(
+    source_path: Path, destination_path: Path, audio_staging_mode: AudioStagingMode
+) -> None:
+    """音声ファイルを配置する。hardlinkはハードリンクを作れない場合にコピーする"""
+    logger.debug(
+        f"音声ファイルを配置({audio_staging_mode}): {source_path} -> {destination_path}"
+    )
+    if audio_staging_mode == "hardlink":
+        try:
+            os.link(source_path, destination_path)
+        except OSError as e:
+            logger.debug(f"ハードリンクを作れないためコピー: {source_path}: {e}")
+            shutil.copy2(source_path, destination_path)
+    elif audio_staging_mode == "symlink":
+        destination_path.symlink_to(source_path.resolve())
+    elif audio_staging_mode == "copy":
+        shutil.copy2(source_path, destination_path)
+    else:
+        raise ValueError(f"不明な音声ファイルの配置方法です: {audio_staging_mode}")
+
 
-            logger.debug(f"ファイルをコピー: {wav_path} -> {wav_dst}")
-            shutil.copy2(wav_path, wav_dst)
+def get_speaker_id(text_path: Path) -> str:
+    """親ディレクトリ名から話者IDを得る。speaker_で始まる場合は接頭辞を除く"""
+    parent_name = text_path.parent.name
+    if parent_name.startswith("speaker_"):
+        return parent_name[8:]
+    return parent_name
 
 
 def copy_text_file_with_preprocessing(
@@ -247,7 +251,4 @@ def copy_text_file_with_preprocessing(
 
 def preprocess_text_content(text_content: str) -> str:
     """MFAでspn音素を生成する文字を除去する"""
-    processed_text = text_content
-    for char in ["[", "]", "(", ")", "{", "}"]:
-        processed_text = processed_text.replace(char, "")
-    return processed_text
+    return text_content.translate(PROBLEMATIC_CHAR_TABLE)
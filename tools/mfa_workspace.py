@@ -0,0 +1,213 @@
+"""MFAのコーパス・特徴量・データベースを実行をまたいで再利用する作業ディレクトリ"""
+
+import fcntl
+import hashlib
+import os
+import shutil
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Literal
+
+from pydantic import BaseModel
+
+from tools.alignment_manifest import AlignmentPair
+from tools.pronunciation_dictionary import parse_g2p_dictionary
+from utility.logger_utility import get_logger
+
+logger = get_logger(Path(__file__))
+
+WORKSPACE_STATE_FILE_NAME = "state.json"
+WORKSPACE_LOCK_FILE_NAME = "lock"
+
+WorkspaceCleanPolicy = Literal["always", "on_change"]
+
+
+class MfaWorkspaceState(BaseModel):
+    """作業ディレクトリに配置したファイルごとの配置元・辞書の単語ごとの発音のハッシュと、サイズ・最終使用時刻"""
+
+    corpus_files: dict[str, str]
+    dictionary_entries: dict[str, str]
+    size_bytes: int
+    last_used: float
+
+
+def build_workspace_id(
+    pairs: list[AlignmentPair],
+    multi_speaker: bool,
+    remove_problematic_chars: bool,
+    model_names: list[str],
+) -> str:
+    """テキストファイルのディレクトリ・前処理・話者モード・モデル名から、ファイルの追加や変更では変わらないコーパスのIDを作る"""
+    text_dirs = sorted({str(pair.text_path.resolve().parent) for pair in pairs})
+    source = "\t".join(
+        [*text_dirs, str(multi_speaker), str(remove_problematic_chars), *model_names]
+    )
+    return hashlib.sha256(source.encode()).hexdigest()[:16]
+
+
+def build_corpus_files(
+    pairs: list[AlignmentPair], multi_speaker: bool
+) -> dict[str, str]:
+    """コーパスディレクトリでの相対パスごとに、配置元ファイルのパス・サイズ・更新時刻を返す"""
+    corpus_files: dict[str, str] = {}
+    for pair in pairs:
+        for path in [pair.text_path, pair.wav_path]:
+            stat = path.stat()
+            corpus_files[
+                build_corpus_file_path(path, pair.speaker_id, multi_speaker)
+            ] = f"{path.resolve()}\t{stat.st_size}\t{stat.st_mtime_ns}"
+    return corpus_files
+
+
+def build_corpus_file_path(path: Path, speaker_id: str, multi_speaker: bool) -> str:
+    """ファイルを配置するコーパスディレクトリでの相対パスを返す"""
+    if multi_speaker:
+        return f"{speaker_id}/{path.name}"
+    return path.name
+
+
+def find_changed_corpus_files(
+    previous_files: dict[str, str],
+    corpus_files: dict[str, str],
+    staged_files: dict[str, str],
+) -> list[str]:
+    """前回配置したファイルのうち、コーパスから削除されたものと配置し直すものを返す"""
+    return [
+        path
+        for path in previous_files
+        if path not in corpus_files or path in staged_files
+    ]
+
+
+def build_dictionary_entries(dictionary_path: Path) -> dict[str, str]:
+    """MFAの辞書ファイルから単語ごとの発音のハッシュを作る"""
+    pronunciations = parse_g2p_dictionary(dictionary_path.read_text(encoding="utf-8"))
+    return {
+        word: hashlib.sha256("\n".join(word_pronunciations).encode()).hexdigest()[:16]
+        for word, word_pronunciations in pronunciations.items()
+    }
+
+
+def read_workspace_state(workspace_dir: Path) -> MfaWorkspaceState | None:
+    """作業ディレクトリの状態を読む。まだアライメントしていなければNoneを返す"""
+    state_path = workspace_dir / WORKSPACE_STATE_FILE_NAME
+    if not state_path.exists():
+        return None
+    return MfaWorkspaceState.model_validate_json(state_path.read_text(encoding="utf-8"))
+
+
+def should_clean_workspace(
+    state: MfaWorkspaceState | None,
+    clean_policy: WorkspaceCleanPolicy,
+    changed_files: list[str],
+    dictionary_entries: dict[str, str],
+) -> bool:
+    """MFAに--cleanを渡すか判定する。on_changeでは前回配置したファイルが変更・削除されたか、辞書の既存の単語の発音が変わったときだけcleanし、ファイルや単語の追加だけならcleanしない"""
+    if clean_policy == "always":
+        return True
+    if clean_policy != "on_change":
+        raise ValueError(f"不明なcleanポリシーです: {clean_policy}")
+    if state is None:
+        return True
+
+    changed_words = [
+        word
+        for word, entry in state.dictionary_entries.items()
+        if dictionary_entries.get(word) != entry
+    ]
+    logger.debug(
+        f"作業ディレクトリで変更・削除されたファイル数: {len(changed_files)}, 発音が変わった単語数: {len(changed_words)}"
+    )
+    return len(changed_files) > 0 or len(changed_words) > 0
+
+
+def write_workspace_state(
+    workspace_dir: Path,
+    corpus_files: dict[str, str],
+    dictionary_entries: dict[str, str],
+) -> MfaWorkspaceState:
+    """作業ディレクトリのサイズを測り、配置したファイル・辞書の単語ごとの発音のハッシュと最終使用時刻とともに保存する"""
+    state = MfaWorkspaceState(
+        corpus_files=corpus_files,
+        dictionary_entries=dictionary_entries,
+        size_bytes=measure_workspace_size(workspace_dir),
+        last_used=time.time(),
+    )
+    (workspace_dir / WORKSPACE_STATE_FILE_NAME).write_text(
+        state.model_dump_json(), encoding="utf-8"
+    )
+    logger.debug(f"作業ディレクトリ {workspace_dir}: {state.size_bytes}バイト")
+    return state
+
+
+def measure_workspace_size(workspace_dir: Path) -> int:
+    """作業ディレクトリのサイズを返す。元ファイルとハードリンクで共有している音声ファイルは数えない"""
+    size = 0
+    for root, _, file_names in os.walk(workspace_dir):
+        for file_name in file_names:
+            stat = os.lstat(os.path.join(root, file_name))
+            if stat.st_nlink == 1:
+                size += stat.st_size
+    return size
+
+
+@contextmanager
+def lock_workspace(workspace_dir: Path) -> Iterator[None]:
+    """作業ディレクトリを排他的に使う。他のプロセスが使用中なら解放されるまで待つ"""
+    workspace_dir.mkdir(parents=True, exist_ok=True)
+    with (workspace_dir / WORKSPACE_LOCK_FILE_NAME).open("w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def collect_workspace_garbage(
+    workspace_root: Path, max_bytes: int, max_age_seconds: float
+) -> list[Path]:
+    """最終使用から時間が経った作業ディレクトリを削除し、合計サイズが上限を超える分も古いものから削除する。使用中の作業ディレクトリは削除しない"""
+    workspaces: list[tuple[Path, MfaWorkspaceState]] = []
+    for state_path in workspace_root.glob(f"*/{WORKSPACE_STATE_FILE_NAME}"):
+        workspaces.append(
+            (
+                state_path.parent,
+                MfaWorkspaceState.model_validate_json(
+                    state_path.read_text(encoding="utf-8")
+                ),
+            )
+        )
+    workspaces.sort(key=lambda workspace: workspace[1].last_used, reverse=True)
+
+    now = time.time()
+    total = 0
+    removed: list[Path] = []
+    for workspace_dir, state in workspaces:
+        if (
+            now - state.last_used <= max_age_seconds
+            and total + state.size_bytes <= max_bytes
+        ):
+            total += state.size_bytes
+            continue
+        if remove_unused_workspace(workspace_dir):
+            logger.info(
+                f"作業ディレクトリを削除: {workspace_dir} ({state.size_bytes}バイト)"
+            )
+            removed.append(workspace_dir)
+        else:
+            total += state.size_bytes
+    logger.debug(f"作業ディレクトリの合計サイズ: {total}バイト")
+    return removed
+
+
+def remove_unused_workspace(workspace_dir: Path) -> bool:
+    """他のプロセスが使用中でなければ作業ディレクトリを削除する。使用中ならFalseを返す"""
+    with (workspace_dir / WORKSPACE_LOCK_FILE_NAME).open("w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        shutil.rmtree(workspace_dir)
+        return True
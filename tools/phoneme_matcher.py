@@ -1,115 +1,517 @@
 """音素列のアライメントを行う関数群"""
 
+import threading
 from pathlib import Path
-from typing import Any
 
+import numpy as np
+from numpy.typing import NDArray
+from pydantic import BaseModel
+
+from tools.alignment_cache import AlignmentFailure, AlignmentResult, AlignmentSuccess
+from tools.symbol_loader import CompiledSymbolMapping, encode_phonemes
 from utility.logger_utility import get_logger
 
 logger = get_logger(Path(__file__))
 
+MAX_FESTIVAL_COMPOUND_LENGTH = 3
+MIN_VECTORIZED_GROUP_SIZE = 8
+BANDED_ALIGNMENT_MIN_LENGTH = 24
+BAND_MARGIN = 4
+
+
+class AlignmentPathStats(BaseModel):
+    """貪欲法と動的計画法それぞれでアライメントした回数"""
+
+    greedy: int
+    dp: int
+
+
+class GreedyAlignmentError(Exception):
+    """貪欲法では音素の対応が一意に決まらなかったことを表す例外"""
+
+
+def align_phonemes_batch(
+    pairs: list[tuple[list[str], list[str]]], mapping: CompiledSymbolMapping
+) -> list[AlignmentResult]:
+    """複数の音素列ペアを重複なく長さごとにまとめてアライメントし、ペアごとの結果を返す"""
+    unique_pairs = list(
+        dict.fromkeys(
+            (tuple(festival), tuple(phonemizer)) for festival, phonemizer in pairs
+        )
+    )
+    results: dict[tuple[tuple[str, ...], tuple[str, ...]], AlignmentResult] = {}
+    groups: dict[tuple[int, int], list[tuple[tuple[str, ...], tuple[str, ...]]]] = {}
+    for festival, phonemizer in unique_pairs:
+        try:
+            alignment = greedy_align(
+                encode_phonemes(list(festival), mapping.festival_ids),
+                encode_phonemes(list(phonemizer), mapping.phonemizer_ids),
+                mapping,
+            )
+        except GreedyAlignmentError:
+            groups.setdefault((len(festival), len(phonemizer)), []).append(
+                (festival, phonemizer)
+            )
+            continue
+        results[(festival, phonemizer)] = AlignmentSuccess(pairs=tuple(alignment))
+    record_alignment_paths(len(results), len(unique_pairs) - len(results))
+
+    for group in groups.values():
+        if len(group) < MIN_VECTORIZED_GROUP_SIZE or not group[0][0] or not group[0][1]:
+            for festival, phonemizer in group:
+                results[(festival, phonemizer)] = align_phonemes_dp_result(
+                    list(festival), list(phonemizer), mapping
+                )
+        else:
+            results.update(
+                zip(group, align_phonemes_group(group, mapping), strict=True)
+            )
+    return [
+        results[(tuple(festival), tuple(phonemizer))] for festival, phonemizer in pairs
+    ]
+
+
+def align_phonemes_dp_result(
+    festival_phonemes: list[str],
+    phonemizer_phonemes: list[str],
+    mapping: CompiledSymbolMapping,
+) -> AlignmentResult:
+    """1組の音素列ペアを動的計画法でアライメントし、失敗をエラーメッセージとして返す"""
+    try:
+        alignment = align_phonemes_dp(
+            festival_phonemes,
+            phonemizer_phonemes,
+            encode_phonemes(festival_phonemes, mapping.festival_ids),
+            encode_phonemes(phonemizer_phonemes, mapping.phonemizer_ids),
+            mapping,
+        )
+    except ValueError as e:
+        return AlignmentFailure(message=str(e))
+    return AlignmentSuccess(pairs=tuple(alignment))
+
+
+def align_phonemes_group(
+    group: list[tuple[tuple[str, ...], tuple[str, ...]]],
+    mapping: CompiledSymbolMapping,
+) -> list[AlignmentResult]:
+    """同じ長さの音素列ペアをまとめ、align_phonemesと同じ動的計画法をペア方向にベクトル化して解く"""
+    festival_len = len(group[0][0])
+    phonemizer_len = len(group[0][1])
+    festival_vocab = len(mapping.festival_ids)
+    phonemizer_vocab = len(mapping.phonemizer_ids)
+    festival_ids = np.array(
+        [[mapping.festival_ids.get(ph, festival_vocab) for ph in f] for f, _ in group]
+    )
+    phonemizer_ids = np.array(
+        [
+            [mapping.phonemizer_ids.get(ph, phonemizer_vocab) for ph in p]
+            for _, p in group
+        ]
+    )
+    candidates = build_match_candidates(
+        festival_ids, phonemizer_ids, mapping, festival_vocab, phonemizer_vocab
+    )
+
+    # DPテーブルの初期化（先頭の次元がペア）
+    shape = (len(group), festival_len + 1, phonemizer_len + 1)
+    score_table = np.zeros(shape)
+    prev_i = np.zeros(shape, dtype=np.int64)
+    prev_j = np.zeros(shape, dtype=np.int64)
+    matched = np.zeros(shape, dtype=np.bool_)
+
+    for i in range(festival_len + 1):
+        for j in range(phonemizer_len + 1):
+            if i == 0 and j == 0:
+                continue
+
+            best_score = np.full(len(group), -np.inf)
+            best_prev_i = np.zeros(len(group), dtype=np.int64)
+            best_prev_j = np.zeros(len(group), dtype=np.int64)
+
+            # align_phonemesと同じ順序で候補を評価し、スコアが真に大きいときだけ更新する
+            for ok, festival_step, phonemizer_step in candidates:
+                if i < festival_step or j < phonemizer_step:
+                    continue
+                pi, pj = i - festival_step, j - phonemizer_step
+                score = score_table[:, pi, pj] + max(festival_step, phonemizer_step)
+                better = ok[:, i, j] & (score > best_score)
+                best_score = np.where(better, score, best_score)
+                best_prev_i = np.where(better, pi, best_prev_i)
+                best_prev_j = np.where(better, pj, best_prev_j)
+
+            # 最適な選択がなければスキップ操作（ペナルティあり）
+            is_matched = best_score != -np.inf
+            if i > 0:
+                score = score_table[:, i - 1, j] - 0.5
+                skip = ~is_matched
+                best_score = np.where(skip, score, best_score)
+                best_prev_i = np.where(skip, i - 1, best_prev_i)
+                best_prev_j = np.where(skip, j, best_prev_j)
+            if j > 0:
+                score = score_table[:, i, j - 1] - 0.5
+                skip = ~is_matched & ((i == 0) | (score > best_score))
+                best_score = np.where(skip, score, best_score)
+                best_prev_i = np.where(skip, i, best_prev_i)
+                best_prev_j = np.where(skip, j - 1, best_prev_j)
+
+            score_table[:, i, j] = best_score
+            prev_i[:, i, j] = best_prev_i
+            prev_j[:, i, j] = best_prev_j
+            matched[:, i, j] = is_matched
+
+    results: list[AlignmentResult] = []
+    for b, (festival, phonemizer) in enumerate(group):
+        alignment = traceback_alignment(
+            prev_i[b].tolist(),
+            prev_j[b].tolist(),
+            matched[b].tolist(),
+            [0] * (festival_len + 1),
+            festival_len,
+            phonemizer_len,
+        )
+        if not alignment or score_table[b, festival_len, phonemizer_len] <= 0:
+            results.append(
+                AlignmentFailure(
+                    message=f"アライメント失敗: festival={list(festival)}, phonemizer={list(phonemizer)}"
+                )
+            )
+        else:
+            results.append(AlignmentSuccess(pairs=tuple(alignment)))
+    return results
+
+
+def build_match_candidates(
+    festival_ids: NDArray[np.int64],
+    phonemizer_ids: NDArray[np.int64],
+    mapping: CompiledSymbolMapping,
+    festival_vocab: int,
+    phonemizer_vocab: int,
+) -> list[tuple[NDArray[np.bool_], int, int]]:
+    """各セルで音素の対応が成り立つかを候補ごとに前計算し、(成立表, festival側の長さ, phonemizer側の長さ)の列で返す"""
+    batch_size, festival_len = festival_ids.shape
+    phonemizer_len = phonemizer_ids.shape[1]
+    candidates: list[tuple[NDArray[np.bool_], int, int]] = []
+
+    # 1. 単一音素マッチング (1:1)
+    single_table = np.zeros((festival_vocab + 1, phonemizer_vocab + 1), dtype=np.bool_)
+    for f_id, p_ids in mapping.single.items():
+        single_table[f_id, list(p_ids)] = True
+    ok = np.zeros((batch_size, festival_len + 1, phonemizer_len + 1), dtype=np.bool_)
+    ok[:, 1:, 1:] = single_table[festival_ids[:, :, None], phonemizer_ids[:, None, :]]
+    candidates.append((ok, 1, 1))
+
+    # 2. festival側の複合音素マッチング (n:1)。末尾の音素からトライ木を辿り、辿れなければ行き止まりのノードに移る
+    dead_node = len(mapping.compound_children)
+    transition = np.full((dead_node + 1, festival_vocab + 1), dead_node)
+    for node, children in enumerate(mapping.compound_children):
+        for f_id, child in children.items():
+            transition[node, f_id] = child
+    accept = np.zeros((dead_node + 1, phonemizer_vocab + 1), dtype=np.bool_)
+    for node, p_ids in enumerate(mapping.compound_phonemizer_ids):
+        accept[node, list(p_ids)] = True
+    nodes = np.zeros((batch_size, festival_len + 1), dtype=np.int64)
+    for compound_len in range(1, min(festival_len, MAX_FESTIVAL_COMPOUND_LENGTH) + 1):
+        next_nodes = np.full((batch_size, festival_len + 1), dead_node)
+        next_nodes[:, compound_len:] = transition[
+            nodes[:, compound_len:],
+            festival_ids[:, : festival_len - compound_len + 1],
+        ]
+        nodes = next_nodes
+        if compound_len < 2:
+            continue
+        ok = np.zeros(
+            (batch_size, festival_len + 1, phonemizer_len + 1), dtype=np.bool_
+        )
+        ok[:, :, 1:] = accept[nodes[:, :, None], phonemizer_ids[:, None, :]]
+        candidates.append((ok, compound_len, 1))
+
+    # 3. phonemizer側の複合音素マッチング (1:n)
+    for f_id, p_compounds in mapping.reverse_compound.items():
+        for p_compound in p_compounds:
+            compound_len = len(p_compound)
+            ok = np.zeros(
+                (batch_size, festival_len + 1, phonemizer_len + 1), dtype=np.bool_
+            )
+            if compound_len <= phonemizer_len:
+                p_match = np.ones(
+                    (batch_size, phonemizer_len - compound_len + 1), dtype=np.bool_
+                )
+                for k, p_id in enumerate(p_compound):
+                    p_match &= (
+                        phonemizer_ids[:, k : phonemizer_len - compound_len + 1 + k]
+                        == p_id
+                    )
+                ok[:, 1:, compound_len:] = (festival_ids == f_id)[:, :, None] & p_match[
+                    :, None, :
+                ]
+            candidates.append((ok, 1, compound_len))
+    return candidates
+
 
 def align_phonemes(
     festival_phonemes: list[str],
     phonemizer_phonemes: list[str],
-    mapping_dict: dict[str, Any],
+    mapping: CompiledSymbolMapping,
 ) -> list[tuple[int, int]]:
-    """動的計画法を使用して2つの音素列の最適なアライメントを見つける"""
-    single_mapping = mapping_dict["single"]
-    compound_mapping = mapping_dict["compound"]
-    reverse_compound_mapping = mapping_dict["reverse_compound"]
-
-    # DPテーブルの初期化
-    # dp[i][j] = (festival_phonemes[:i]とphonemizer_phonemes[:j]の最適アライメントスコア, 前のセルへのポインタ, マッチしたインデックスペア)
-    dp = []
-    for _ in range(len(festival_phonemes) + 1):
-        row = []
-        for _ in range(len(phonemizer_phonemes) + 1):
-            row.append((0, None, []))
-        dp.append(row)
-
-    # ベースケース: 空列同士のアライメント
-    dp[0][0] = (0, None, [])
-    for i in range(len(festival_phonemes) + 1):
-        for j in range(len(phonemizer_phonemes) + 1):
+    """2つの音素列の最適なアライメントを見つける。貪欲法で両方の列を覆えればその結果を返し、覆えなければ動的計画法を使う"""
+    festival_ids = encode_phonemes(festival_phonemes, mapping.festival_ids)
+    phonemizer_ids = encode_phonemes(phonemizer_phonemes, mapping.phonemizer_ids)
+    try:
+        alignment = greedy_align(festival_ids, phonemizer_ids, mapping)
+    except GreedyAlignmentError:
+        record_alignment_paths(0, 1)
+        return align_phonemes_dp(
+            festival_phonemes,
+            phonemizer_phonemes,
+            festival_ids,
+            phonemizer_ids,
+            mapping,
+        )
+    record_alignment_paths(1, 0)
+    return alignment
+
+
+def greedy_align(
+    festival_ids: list[int], phonemizer_ids: list[int], mapping: CompiledSymbolMapping
+) -> list[tuple[int, int]]:
+    """先頭から順に、その位置で成り立つ音素の対応がただ1つのときだけ進め、両方の列を覆ったインデックスペアを返す"""
+    if not festival_ids or not phonemizer_ids:
+        raise GreedyAlignmentError("空の音素列")
+    pairs: list[tuple[int, int]] = []
+    i, j = 0, 0
+    while i < len(festival_ids) or j < len(phonemizer_ids):
+        if i == len(festival_ids) or j == len(phonemizer_ids):
+            raise GreedyAlignmentError(f"片方の音素列だけが残りました: {i}, {j}")
+        steps = find_match_steps(festival_ids, phonemizer_ids, i, j, mapping)
+        if len(steps) != 1:
+            raise GreedyAlignmentError(f"対応の候補が{len(steps)}個あります: {i}, {j}")
+        festival_step, phonemizer_step = steps[0]
+        pairs.extend(
+            (a, b)
+            for a in range(i, i + festival_step)
+            for b in range(j, j + phonemizer_step)
+        )
+        i, j = i + festival_step, j + phonemizer_step
+    return pairs
+
+
+def find_match_steps(
+    festival_ids: list[int],
+    phonemizer_ids: list[int],
+    i: int,
+    j: int,
+    mapping: CompiledSymbolMapping,
+) -> list[tuple[int, int]]:
+    """位置(i, j)から始まる音素の対応を探し、(festival側の長さ, phonemizer側の長さ)の列で返す"""
+    steps: list[tuple[int, int]] = []
+    f_id = festival_ids[i]
+    p_id = phonemizer_ids[j]
+
+    # 1. 単一音素マッチング (1:1)
+    if f_id in mapping.single and p_id in mapping.single[f_id]:
+        steps.append((1, 1))
+
+    # 2. festival側の複合音素マッチング (n:1)。トライ木は末尾の音素から辿る
+    for compound_len in range(
+        2, min(len(festival_ids) - i, MAX_FESTIVAL_COMPOUND_LENGTH) + 1
+    ):
+        node = 0
+        for k in range(i + compound_len - 1, i - 1, -1):
+            if festival_ids[k] not in mapping.compound_children[node]:
+                break
+            node = mapping.compound_children[node][festival_ids[k]]
+        else:
+            if p_id in mapping.compound_phonemizer_ids[node]:
+                steps.append((compound_len, 1))
+
+    # 3. phonemizer側の複合音素マッチング (1:n)
+    for p_compound in mapping.reverse_compound.get(f_id, ()):
+        if tuple(phonemizer_ids[j : j + len(p_compound)]) == p_compound:
+            steps.append((1, len(p_compound)))
+    return steps
+
+
+def record_alignment_paths(greedy_count: int, dp_count: int) -> None:
+    """貪欲法と動的計画法それぞれでアライメントした回数を加算する"""
+    global greedy_alignment_count, dp_alignment_count
+    with alignment_path_lock:
+        greedy_alignment_count += greedy_count
+        dp_alignment_count += dp_count
+
+
+def get_alignment_path_stats() -> AlignmentPathStats:
+    """このプロセスで貪欲法と動的計画法それぞれでアライメントした回数を返す"""
+    with alignment_path_lock:
+        return AlignmentPathStats(greedy=greedy_alignment_count, dp=dp_alignment_count)
+
+
+def align_phonemes_dp(
+    festival_phonemes: list[str],
+    phonemizer_phonemes: list[str],
+    festival_ids: list[int],
+    phonemizer_ids: list[int],
+    mapping: CompiledSymbolMapping,
+) -> list[tuple[int, int]]:
+    """動的計画法で2つの音素列の最適なアライメントを見つける。長い音素列は対角線付近の帯だけを計算し、検証に失敗したら帯を広げる"""
+    full_margin = max(len(festival_phonemes), len(phonemizer_phonemes))
+    band_margin = (
+        BAND_MARGIN if full_margin >= BANDED_ALIGNMENT_MIN_LENGTH else full_margin
+    )
+    while band_margin < full_margin:
+        try:
+            alignment = align_phonemes_band(
+                festival_phonemes,
+                phonemizer_phonemes,
+                festival_ids,
+                phonemizer_ids,
+                mapping,
+                band_margin,
+            )
+            verify_complete_alignment(alignment, festival_phonemes, phonemizer_phonemes)
+            return alignment
+        except ValueError as e:
+            logger.debug(
+                f"帯幅{band_margin}のアライメントに失敗したため帯を広げます: {e}"
+            )
+        band_margin *= 2
+    return align_phonemes_band(
+        festival_phonemes,
+        phonemizer_phonemes,
+        festival_ids,
+        phonemizer_ids,
+        mapping,
+        full_margin,
+    )
+
+
+def align_phonemes_band(
+    festival_phonemes: list[str],
+    phonemizer_phonemes: list[str],
+    festival_ids: list[int],
+    phonemizer_ids: list[int],
+    mapping: CompiledSymbolMapping,
+    band_margin: int,
+) -> list[tuple[int, int]]:
+    """長さの差にband_marginを足した幅の対角線付近のセルだけで動的計画法を解く。帯の外のセルには到達できないものとする"""
+    single_mapping = mapping.single
+    compound_children = mapping.compound_children
+    compound_phonemizer_ids = mapping.compound_phonemizer_ids
+    reverse_compound_mapping = mapping.reverse_compound
+
+    # DPテーブルの初期化。i行目はrow_starts[i]列からrow_ends[i]列までを持つ
+    # score[i][j] = festival_phonemes[:i]とphonemizer_phonemes[:j]の最適アライメントスコア
+    # prev_i[i][j], prev_j[i][j] = 前のセルへのポインタ、matched[i][j] = 前のセルからの遷移が音素の対応かどうか
+    festival_len = len(festival_phonemes)
+    phonemizer_len = len(phonemizer_phonemes)
+    below = max(0, festival_len - phonemizer_len) + band_margin
+    above = max(0, phonemizer_len - festival_len) + band_margin
+    row_starts = [max(0, i - below) for i in range(festival_len + 1)]
+    row_ends = [min(phonemizer_len, i + above) for i in range(festival_len + 1)]
+    widths = [end - start + 1 for start, end in zip(row_starts, row_ends, strict=True)]
+    score_table = [[-float("inf")] * width for width in widths]
+    prev_i = [[0] * width for width in widths]
+    prev_j = [[0] * width for width in widths]
+    matched = [[False] * width for width in widths]
+
+    # ベースケース: 空列同士のアライメントはスコア0
+    score_table[0][0] = 0.0
+    for i in range(festival_len + 1):
+        for j in range(row_starts[i], row_ends[i] + 1):
             if i == 0 and j == 0:
                 continue
 
             best_score = -float("inf")
-            best_prev = None
-            best_pairs = []
+            best_prev_i = 0
+            best_prev_j = 0
 
             # 1. 単一音素マッチング (1:1)
             if i > 0 and j > 0:
-                f_ph = festival_phonemes[i - 1]
-                p_ph = phonemizer_phonemes[j - 1]
+                f_id = festival_ids[i - 1]
+                p_id = phonemizer_ids[j - 1]
 
-                if f_ph in single_mapping and p_ph in single_mapping[f_ph]:
-                    score = dp[i - 1][j - 1][0] + 1
+                if f_id in single_mapping and p_id in single_mapping[f_id]:
+                    score = (
+                        band_score(score_table, row_starts, row_ends, i - 1, j - 1) + 1
+                    )
                     if score > best_score:
                         best_score = score
-                        best_prev = (i - 1, j - 1)
-                        best_pairs = dp[i - 1][j - 1][2] + [(i - 1, j - 1)]
+                        best_prev_i, best_prev_j = i - 1, j - 1
 
             # 2. festival側の複合音素マッチング (n:1)
-            for compound_len in range(2, min(i + 1, 4)):  # 最大3音素まで考慮
-                if i >= compound_len:
-                    f_slice = festival_phonemes[i - compound_len : i]
-                    f_key = "_".join(f_slice)
-
-                    if j > 0 and f_key in compound_mapping:
-                        p_ph = phonemizer_phonemes[j - 1]
-                        if p_ph in compound_mapping[f_key]["phonemes"]:
-                            score = dp[i - compound_len][j - 1][0] + compound_len
-                            if score > best_score:
-                                best_score = score
-                                best_prev = (i - compound_len, j - 1)
-                                new_pairs = [
-                                    (i - compound_len + k, j - 1)
-                                    for k in range(compound_len)
-                                ]
-                                best_pairs = dp[i - compound_len][j - 1][2] + new_pairs
+            if j > 0:
+                p_id = phonemizer_ids[j - 1]
+                node = 0  # 末尾の音素からトライ木を辿る
+                for compound_len in range(1, min(i, MAX_FESTIVAL_COMPOUND_LENGTH) + 1):
+                    f_id = festival_ids[i - compound_len]
+                    if f_id not in compound_children[node]:
+                        break
+                    node = compound_children[node][f_id]
+                    if compound_len < 2 or p_id not in compound_phonemizer_ids[node]:
+                        continue
+                    score = (
+                        band_score(
+                            score_table, row_starts, row_ends, i - compound_len, j - 1
+                        )
+                        + compound_len
+                    )
+                    if score > best_score:
+                        best_score = score
+                        best_prev_i, best_prev_j = i - compound_len, j - 1
 
             # 3. phonemizer側の複合音素マッチング (1:n)
             if i > 0:
-                f_ph = festival_phonemes[i - 1]
-                if f_ph in reverse_compound_mapping:
-                    for p_compound in reverse_compound_mapping[f_ph]:
+                f_id = festival_ids[i - 1]
+                if f_id in reverse_compound_mapping:
+                    for p_compound in reverse_compound_mapping[f_id]:
                         compound_len = len(p_compound)
                         if j >= compound_len:
-                            p_slice = phonemizer_phonemes[j - compound_len : j]
+                            p_slice = phonemizer_ids[j - compound_len : j]
                             if tuple(p_slice) == p_compound:
-                                score = dp[i - 1][j - compound_len][0] + compound_len
+                                score = (
+                                    band_score(
+                                        score_table,
+                                        row_starts,
+                                        row_ends,
+                                        i - 1,
+                                        j - compound_len,
+                                    )
+                                    + compound_len
+                                )
                                 if score > best_score:
                                     best_score = score
-                                    best_prev = (i - 1, j - compound_len)
-                                    new_pairs = [
-                                        (i - 1, j - compound_len + k)
-                                        for k in range(compound_len)
-                                    ]
-                                    best_pairs = (
-                                        dp[i - 1][j - compound_len][2] + new_pairs
-                                    )
+                                    best_prev_i, best_prev_j = i - 1, j - compound_len
 
             # 最適な選択がなければスキップ操作（ペナルティあり）
-            if best_score == -float("inf"):
+            is_matched = best_score != -float("inf")
+            if not is_matched:
                 if i > 0:
-                    score = dp[i - 1][j][0] - 0.5  # festival側のスキップ
+                    score = (
+                        band_score(score_table, row_starts, row_ends, i - 1, j) - 0.5
+                    )  # festival側のスキップ
                     if (j == 0) or (score > best_score):
                         best_score = score
-                        best_prev = (i - 1, j)
-                        best_pairs = dp[i - 1][j][2]
+                        best_prev_i, best_prev_j = i - 1, j
 
                 if j > 0:
-                    score = dp[i][j - 1][0] - 0.5  # phonemizer側のスキップ
+                    score = (
+                        band_score(score_table, row_starts, row_ends, i, j - 1) - 0.5
+                    )  # phonemizer側のスキップ
                     if (i == 0) or (score > best_score):
                         best_score = score
-                        best_prev = (i, j - 1)
-                        best_pairs = dp[i][j - 1][2]
+                        best_prev_i, best_prev_j = i, j - 1
 
-            dp[i][j] = (best_score, best_prev, best_pairs)
+            offset = j - row_starts[i]
+            score_table[i][offset] = best_score
+            prev_i[i][offset] = best_prev_i
+            prev_j[i][offset] = best_prev_j
+            matched[i][offset] = is_matched
 
-    alignment = dp[len(festival_phonemes)][len(phonemizer_phonemes)][2]
-    final_score = dp[len(festival_phonemes)][len(phonemizer_phonemes)][0]
+    alignment = traceback_alignment(
+        prev_i, prev_j, matched, row_starts, festival_len, phonemizer_len
+    )
+    final_score = band_score(
+        score_table, row_starts, row_ends, festival_len, phonemizer_len
+    )
 
     # 有効なマッピングが不十分な場合（スコアが0以下）はエラーを発生させる
     if not alignment or final_score <= 0:
@@ -120,6 +522,39 @@ def align_phonemes(
     return alignment
 
 
+def band_score(
+    score_table: list[list[float]],
+    row_starts: list[int],
+    row_ends: list[int],
+    i: int,
+    j: int,
+) -> float:
+    """帯状に持ったDPテーブルのスコアを返す。帯の外のセルには到達できないので-infを返す"""
+    if row_starts[i] <= j <= row_ends[i]:
+        return score_table[i][j - row_starts[i]]
+    return -float("inf")
+
+
+def traceback_alignment(
+    prev_i: list[list[int]],
+    prev_j: list[list[int]],
+    matched: list[list[bool]],
+    row_starts: list[int],
+    festival_len: int,
+    phonemizer_len: int,
+) -> list[tuple[int, int]]:
+    """終端のセルからポインタを辿り、音素の対応で通ったセルのインデックスペアを先頭から順に返す。i行目の表はrow_starts[i]列から始まる"""
+    segments: list[list[tuple[int, int]]] = []
+    i, j = festival_len, phonemizer_len
+    while i > 0 or j > 0:
+        offset = j - row_starts[i]
+        pi, pj = prev_i[i][offset], prev_j[i][offset]
+        if matched[i][offset]:
+            segments.append([(a, b) for a in range(pi, i) for b in range(pj, j)])
+        i, j = pi, pj
+    return [pair for segment in reversed(segments) for pair in segment]
+
+
 def verify_complete_alignment(
     alignment: list[tuple[int, int]],
     festival_phonemes: list[str],
@@ -137,3 +572,8 @@ def verify_complete_alignment(
             f"Festival: {len(aligned_fest_indices)}/{len(festival_phonemes)}, "
             f"Phonemizer: {len(aligned_phnm_indices)}/{len(phonemizer_phonemes)}"
         )
+
+
+greedy_alignment_count = 0
+dp_alignment_count = 0
+alignment_path_lock = threading.Lock()
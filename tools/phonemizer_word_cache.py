@@ -0,0 +1,55 @@
+"""espeakが単語ごとに出力した音素・ストレスを永続化するキャッシュ"""
+
+import json
+from pathlib import Path
+
+from utility.logger_utility import get_logger
+from utility.sqlite_cache_utility import CacheStats, SqliteLruCache
+
+logger = get_logger(Path(__file__))
+
+
+class PhonemizerWordCache:
+    """単語とespeakの指紋をキーにparse_phonemeの結果を保存するキャッシュ"""
+
+    def __init__(self, path: Path, max_entries: int, fingerprint: str) -> None:
+        self.store = SqliteLruCache(path, max_entries)
+        self.fingerprint = fingerprint
+
+    def get_many(self, words: list[str]) -> dict[str, list[tuple[str, int, str]]]:
+        """キャッシュ済みの単語の音素列を返す。未キャッシュの単語は結果に含めない"""
+        keys = {build_cache_key(self.fingerprint, word): word for word in words}
+        found = self.store.get_many(list(keys))
+        return {keys[key]: decode_phonemes(value) for key, value in found.items()}
+
+    def put_many(self, items: dict[str, list[tuple[str, int, str]]]) -> None:
+        """単語の音素列を保存する"""
+        self.store.put_many(
+            {
+                build_cache_key(self.fingerprint, word): encode_phonemes(phonemes)
+                for word, phonemes in items.items()
+            }
+        )
+
+    def stats(self) -> CacheStats:
+        """ヒット・ミス回数と保存件数を返す"""
+        return self.store.stats()
+
+    def close(self) -> None:
+        """キャッシュを閉じる"""
+        self.store.close()
+
+
+def build_cache_key(fingerprint: str, word: str) -> str:
+    """キャッシュのキーを生成する"""
+    return f"{fingerprint}\t{word}"
+
+
+def encode_phonemes(phonemes: list[tuple[str, int, str]]) -> str:
+    """(phoneme, stress, word)の列をキャッシュの値に変換する"""
+    return json.dumps([list(phoneme) for phoneme in phonemes], ensure_ascii=False)
+
+
+def decode_phonemes(value: str) -> list[tuple[str, int, str]]:
+    """キャッシュの値を(phoneme, stress, word)の列に変換する"""
+    return [(phoneme, stress, word) for phoneme, stress, word in json.loads(value)]
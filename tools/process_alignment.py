@@ -4,33 +4,87 @@
 Usage:
     PYTHONPATH=. uv run python tools/process_alignment.py --text-glob "tools/data/*.txt" --wav-glob "tools/data/*.wav" --output-dir ./hiho_aligned_output
     PYTHONPATH=. uv run python tools/process_alignment.py --text-glob "tools/data/*.txt" --wav-glob "tools/data/*.wav" --output-dir ./hiho_aligned_output --output-textgrid-dir ./hiho_aligned_output --verbose
+    PYTHONPATH=. uv run python tools/process_alignment.py --text-glob "tools/data/*.txt" --wav-glob "tools/data/*.wav" --output-dir ./hiho_aligned_output --manifest-path ./hiho_aligned_output/manifest.sqlite3
 """
 
+import atexit
+import hashlib
+import shutil
 import tempfile
+import threading
 from pathlib import Path
 from typing import Annotated
 
 import typer
+from pydantic import BaseModel
 
-from tools.mfa_runner import (
+from tools.alignment_manifest import AlignmentManifest, AlignmentPair, hash_file
+from tools.mfa_launcher import (
     ensure_model_exists,
+    get_mfa_environment,
+    get_mfa_model_path,
+)
+from tools.mfa_runner import (
+    AudioStagingMode,
+    get_speaker_id,
     prepare_corpus_dir,
     prepare_multi_speaker_corpus_dir,
     run_mfa_align,
+    run_mfa_find_oovs,
     run_mfa_g2p,
-    validate_mfa_command,
+)
+from tools.mfa_workspace import (
+    WorkspaceCleanPolicy,
+    build_corpus_file_path,
+    build_corpus_files,
+    build_dictionary_entries,
+    build_workspace_id,
+    collect_workspace_garbage,
+    find_changed_corpus_files,
+    lock_workspace,
+    read_workspace_state,
+    should_clean_workspace,
+    write_workspace_state,
+)
+from tools.pronunciation_dictionary import (
+    PronunciationDictionary,
+    extract_corpus_vocabulary,
+    format_dictionary,
+    parse_g2p_dictionary,
+    parse_oov_words,
 )
 from tools.textgrid_parser import (
     LabEntry,
-    copy_textgrid_files,
-    parse_textgrid_file,
+    parse_textgrid_text,
     write_lab_file,
+    write_textgrid_files,
 )
 from utility.file_utility import expand_glob_pattern
 from utility.logger_utility import get_logger, logging_setting
 
 logger = get_logger(Path(__file__))
 
+ACOUSTIC_MODEL_NAME = "english_us_arpa"
+DICTIONARY_MODEL_NAME = "english_us_arpa"
+G2P_MODEL_NAME = "english_us_arpa"
+
+
+class ProcessAlignmentSetting(BaseModel):
+    """アライメント処理の設定"""
+
+    manifest_path: Path | None
+    manifest_max_entries: int
+    manifest_hash_max_entries: int
+    pronunciation_dictionary_path: Path | None
+    pronunciation_dictionary_max_entries: int
+    audio_staging_mode: AudioStagingMode
+    beam: int
+    retry_beam: int
+    workspace_root: Path | None
+    workspace_clean_policy: WorkspaceCleanPolicy
+    workspace_max_bytes: int
+    workspace_max_age_seconds: float
+
 
 def main(
     text_glob: Annotated[
@@ -65,12 +119,51 @@ def main(
         bool,
         typer.Option(help="spn音素になる文字`[](){ }`を除去する。"),
     ] = False,
+    manifest_path: Annotated[
+        Path | None,
+        typer.Option(
+            help="アライメント結果を保存するマニフェストのパス。指定すると内容の変わっていないファイルはMFAを実行しない。"
+        ),
+    ] = None,
+    pronunciation_dictionary_path: Annotated[
+        Path | None,
+        typer.Option(
+            help="mfa g2pの結果を保存する発音辞書のパス。指定すると辞書にない単語だけmfa g2pにかける。"
+        ),
+    ] = None,
+    workspace_root: Annotated[
+        Path | None,
+        typer.Option(
+            help="MFAの作業ディレクトリを置くディレクトリ。指定するとコーパスと辞書が前回と同じ場合にMFAの特徴量などを再利用する。"
+        ),
+    ] = None,
+    beam: Annotated[
+        int,
+        typer.Option(help="MFAのビーム幅。作業ディレクトリは変えずに変更できる。"),
+    ] = 100,
+    retry_beam: Annotated[
+        int,
+        typer.Option(
+            help="アライメントに失敗したときに再試行するMFAのビーム幅。作業ディレクトリは変えずに変更できる。"
+        ),
+    ] = 400,
     verbose: Annotated[
         bool, typer.Option(help="詳細なデバッグ出力をstderrに出す")
     ] = False,
 ) -> None:
     """コマンドライン引数から実行するエントリポイント"""
     logging_setting(verbose)
+    configure_process_alignment(
+        default_process_alignment_setting().model_copy(
+            update={
+                "manifest_path": manifest_path,
+                "pronunciation_dictionary_path": pronunciation_dictionary_path,
+                "workspace_root": workspace_root,
+                "beam": beam,
+                "retry_beam": retry_beam,
+            }
+        )
+    )
     lab_dict = alignment(
         text_glob,
         wav_glob,
@@ -95,70 +188,361 @@ def alignment(
     text_paths = expand_glob_pattern(text_glob, "テキストファイル")
     wav_paths = expand_glob_pattern(wav_glob, "音声ファイル")
 
-    validate_mfa_command()
+    mfa_environment = get_mfa_environment()
+    logger.debug(f"MFA {mfa_environment.version}: {mfa_environment.prefix}")
     validate_file_counts(text_paths, wav_paths)
 
-    acoustic_model_name = "english_us_arpa"
-    existing_dictionary_name = "english_us_arpa"
-    g2p_model_name = "english_us_arpa"
+    ensure_model_exists("acoustic", ACOUSTIC_MODEL_NAME)
+    ensure_model_exists("dictionary", DICTIONARY_MODEL_NAME)
+    ensure_model_exists("g2p", G2P_MODEL_NAME)
+
+    pairs = [
+        AlignmentPair(
+            text_path=text_path,
+            wav_path=wav_path,
+            speaker_id=get_speaker_id(text_path),
+        )
+        for text_path, wav_path in zip(text_paths, wav_paths, strict=True)
+    ]
+    if process_alignment_setting.manifest_path is None:
+        textgrids = run_alignment(pairs, multi_speaker, remove_problematic_chars)
+    else:
+        textgrids = run_incremental_alignment(
+            pairs, multi_speaker, remove_problematic_chars, get_alignment_manifest()
+        )
+
+    lab_dict = parse_textgrids(textgrids)
+
+    if output_textgrid_dir is not None:
+        write_textgrid_files(textgrids, output_textgrid_dir)
 
-    ensure_model_exists("acoustic", acoustic_model_name)
-    ensure_model_exists("dictionary", existing_dictionary_name)
-    ensure_model_exists("g2p", g2p_model_name)
+    return lab_dict
+
+
+def parse_textgrids(textgrids: dict[str, str]) -> dict[str, list[LabEntry]]:
+    """ファイル名ごとのTextGridをLabEntryリストに変換する"""
+    lab_dict: dict[str, list[LabEntry]] = {}
+    for stem, textgrid_text in textgrids.items():
+        logger.debug(f"TextGrid変換: {stem}")
+        lab_entries = parse_textgrid_text(textgrid_text)
+        lab_dict[stem] = lab_entries
+        logger.debug(f"phones: {[entry.phoneme for entry in lab_entries]}")
+    return lab_dict
+
+
+def run_incremental_alignment(
+    pairs: list[AlignmentPair],
+    multi_speaker: bool,
+    remove_problematic_chars: bool,
+    manifest: AlignmentManifest,
+) -> dict[str, str]:
+    """マニフェストにないペアだけMFAでアライメントし、保存済みの結果と合わせてファイル名ごとのTextGridを返す"""
+    keys = manifest.build_keys(pairs, multi_speaker, remove_problematic_chars)
+    cached = manifest.get_many(list(keys.values()))
+    pending = [pair for pair in pairs if keys[pair] not in cached]
+    logger.info(
+        f"アライメント済み: {len(pairs) - len(pending)}件, 新規: {len(pending)}件"
+    )
+
+    if pending and process_alignment_setting.workspace_root is not None:
+        aligned = run_workspace_alignment(
+            pairs,
+            pending,
+            multi_speaker,
+            remove_problematic_chars,
+            process_alignment_setting.workspace_root,
+        )
+    else:
+        aligned = run_alignment(pending, multi_speaker, remove_problematic_chars)
+    manifest.put_many(
+        {
+            keys[pair]: aligned[pair.text_path.stem]
+            for pair in pending
+            if pair.text_path.stem in aligned
+        }
+    )
+
+    textgrids: dict[str, str] = {}
+    for pair in pairs:
+        stem = pair.text_path.stem
+        if keys[pair] in cached:
+            textgrids[stem] = cached[keys[pair]]
+        elif stem in aligned:
+            textgrids[stem] = aligned[stem]
+    return textgrids
+
+
+def run_alignment(
+    pairs: list[AlignmentPair],
+    multi_speaker: bool,
+    remove_problematic_chars: bool,
+) -> dict[str, str]:
+    """コーパスを作ってMFAでアライメントし、ファイル名ごとのTextGridを返す。作業ディレクトリが設定されていなければ一時ディレクトリを使う"""
+    if not pairs:
+        return {}
+    if process_alignment_setting.workspace_root is not None:
+        return run_workspace_alignment(
+            pairs,
+            pairs,
+            multi_speaker,
+            remove_problematic_chars,
+            process_alignment_setting.workspace_root,
+        )
 
     logger.debug("一時ディレクトリを作成")
     with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir)
-        corpus_dir = temp_path / "mfa_corpus"
-        g2p_output_dictionary_path = temp_path / "g2p_dictionary.txt"
-        textgrid_dir = temp_path / "textgrid_output"
-
-        logger.debug(f"コーパスディレクトリ: {corpus_dir}")
-        logger.debug(f"G2P辞書出力パス: {g2p_output_dictionary_path}")
-        logger.debug(f"TextGrid出力ディレクトリ: {textgrid_dir}")
-
-        if multi_speaker:
-            prepare_multi_speaker_corpus_dir(
-                text_paths, wav_paths, corpus_dir, remove_problematic_chars
-            )
+        work_dir = Path(temp_dir)
+        dictionary_path = prepare_alignment_inputs(
+            pairs, multi_speaker, remove_problematic_chars, work_dir
+        )
+        return align_prepared_corpus(
+            work_dir, dictionary_path, multi_speaker, True, None
+        )
+
+
+def run_workspace_alignment(
+    pairs: list[AlignmentPair],
+    targets: list[AlignmentPair],
+    multi_speaker: bool,
+    remove_problematic_chars: bool,
+    workspace_root: Path,
+) -> dict[str, str]:
+    """コーパスごとの作業ディレクトリに配置済みのファイルを残し、targetsのうち未配置か変更されたものだけを配置してアライメントし、targetsのTextGridを返す。前回配置したファイルの変更・削除か既存の単語の発音の変更がなければMFAの特徴量などを再利用する"""
+    workspace_dir = workspace_root / build_workspace_id(
+        pairs,
+        multi_speaker,
+        remove_problematic_chars,
+        [ACOUSTIC_MODEL_NAME, DICTIONARY_MODEL_NAME, G2P_MODEL_NAME],
+    )
+    logger.debug(f"作業ディレクトリ: {workspace_dir}")
+    with lock_workspace(workspace_dir):
+        corpus_dir = workspace_dir / "mfa_corpus"
+        state = read_workspace_state(workspace_dir)
+        if state is None:
+            previous_files: dict[str, str] = {}
+            if corpus_dir.exists():
+                logger.debug(f"状態のないコーパスディレクトリを削除: {corpus_dir}")
+                shutil.rmtree(corpus_dir)
         else:
-            prepare_corpus_dir(
-                text_paths, wav_paths, corpus_dir, remove_problematic_chars
+            previous_files = state.corpus_files
+
+        corpus_files = build_corpus_files(pairs, multi_speaker)
+        target_files = build_corpus_files(targets, multi_speaker)
+        stage_pairs = [
+            pair
+            for pair in targets
+            if any(
+                target_files[path] != previous_files.get(path)
+                for path in [
+                    build_corpus_file_path(
+                        pair.text_path, pair.speaker_id, multi_speaker
+                    ),
+                    build_corpus_file_path(
+                        pair.wav_path, pair.speaker_id, multi_speaker
+                    ),
+                ]
             )
+        ]
+        staged_files = build_corpus_files(stage_pairs, multi_speaker)
+        changed_files = find_changed_corpus_files(
+            previous_files, corpus_files, staged_files
+        )
+        logger.info(
+            f"作業ディレクトリに配置するファイル: {len(stage_pairs)}組, 削除・置換するファイル: {len(changed_files)}件"
+        )
+        for path in changed_files:
+            (corpus_dir / path).unlink()
+
+        dictionary_path = prepare_alignment_inputs(
+            stage_pairs, multi_speaker, remove_problematic_chars, workspace_dir
+        )
+        dictionary_entries = build_dictionary_entries(dictionary_path)
+        clean = should_clean_workspace(
+            state,
+            process_alignment_setting.workspace_clean_policy,
+            changed_files,
+            dictionary_entries,
+        )
+        textgrids = align_prepared_corpus(
+            workspace_dir,
+            dictionary_path,
+            multi_speaker,
+            clean,
+            workspace_dir / "mfa",
+        )
+        write_workspace_state(
+            workspace_dir,
+            {
+                **{
+                    path: source
+                    for path, source in previous_files.items()
+                    if path not in changed_files
+                },
+                **staged_files,
+            },
+            dictionary_entries,
+        )
+        collect_workspace_garbage(
+            workspace_root,
+            process_alignment_setting.workspace_max_bytes,
+            process_alignment_setting.workspace_max_age_seconds,
+        )
+    target_stems = {pair.text_path.stem for pair in targets}
+    return {
+        stem: textgrid for stem, textgrid in textgrids.items() if stem in target_stems
+    }
+
+
+def prepare_alignment_inputs(
+    pairs: list[AlignmentPair],
+    multi_speaker: bool,
+    remove_problematic_chars: bool,
+    work_dir: Path,
+) -> Path:
+    """work_dirのコーパスディレクトリにペアを配置してコーパス全体のG2P辞書を作り、辞書のパスを返す。配置済みのファイルは残す"""
+    text_paths = [pair.text_path for pair in pairs]
+    wav_paths = [pair.wav_path for pair in pairs]
+    corpus_dir = work_dir / "mfa_corpus"
+    g2p_output_dictionary_path = work_dir / "g2p_dictionary.txt"
+
+    logger.debug(f"コーパスディレクトリ: {corpus_dir}")
+    logger.debug(f"G2P辞書出力パス: {g2p_output_dictionary_path}")
+
+    if multi_speaker:
+        prepare_multi_speaker_corpus_dir(
+            text_paths,
+            wav_paths,
+            corpus_dir,
+            remove_problematic_chars,
+            process_alignment_setting.audio_staging_mode,
+        )
+    else:
+        prepare_corpus_dir(
+            text_paths,
+            wav_paths,
+            corpus_dir,
+            remove_problematic_chars,
+            process_alignment_setting.audio_staging_mode,
+        )
 
-        logger.info("G2P辞書を生成中...")
+    logger.info("G2P辞書を生成中...")
+    if process_alignment_setting.pronunciation_dictionary_path is None:
         g2p_result = run_mfa_g2p(
             corpus_dir,
-            g2p_model_name,
+            G2P_MODEL_NAME,
             g2p_output_dictionary_path,
         )
         logger.debug(f"G2P処理完了: {g2p_result}")
-
-        align_result = run_mfa_align(
+    else:
+        build_corpus_dictionary(
             corpus_dir,
-            str(g2p_output_dictionary_path),
-            acoustic_model_name,
-            textgrid_dir,
+            g2p_output_dictionary_path,
+            work_dir,
+            get_pronunciation_dictionary(),
         )
-        logger.debug("MFAアライメント完了")
-        logger.debug(f"MFA出力: {align_result}")
+    return g2p_output_dictionary_path
 
-        lab_dict: dict[str, list[LabEntry]] = {}
-        if multi_speaker:
-            textgrid_pattern = "*/*.TextGrid"
-        else:
-            textgrid_pattern = "*.TextGrid"
 
-        for textgrid_file in textgrid_dir.glob(textgrid_pattern):
-            logger.debug(f"TextGridファイル変換: {textgrid_file}")
-            lab_entries = parse_textgrid_file(textgrid_file)
-            lab_dict[textgrid_file.stem] = lab_entries
-            logger.debug(f"phones: {[entry.phoneme for entry in lab_entries]}")
+def align_prepared_corpus(
+    work_dir: Path,
+    dictionary_path: Path,
+    multi_speaker: bool,
+    clean: bool,
+    mfa_temporary_dir: Path | None,
+) -> dict[str, str]:
+    """work_dirのコーパスディレクトリをMFAでアライメントし、ファイル名ごとのTextGridを返す"""
+    corpus_dir = work_dir / "mfa_corpus"
+    textgrid_dir = work_dir / "textgrid_output"
+    logger.debug(f"TextGrid出力ディレクトリ: {textgrid_dir}")
+
+    align_result = run_mfa_align(
+        corpus_dir,
+        str(dictionary_path),
+        ACOUSTIC_MODEL_NAME,
+        textgrid_dir,
+        process_alignment_setting.beam,
+        process_alignment_setting.retry_beam,
+        clean,
+        mfa_temporary_dir,
+    )
+    logger.debug("MFAアライメント完了")
+    logger.debug(f"MFA出力: {align_result}")
+
+    if multi_speaker:
+        textgrid_pattern = "*/*.TextGrid"
+    else:
+        textgrid_pattern = "*.TextGrid"
+
+    return {
+        textgrid_file.stem: textgrid_file.read_text(encoding="utf-8")
+        for textgrid_file in textgrid_dir.glob(textgrid_pattern)
+    }
+
+
+def build_corpus_dictionary(
+    corpus_dir: Path,
+    output_dictionary_path: Path,
+    work_dir: Path,
+    dictionary: PronunciationDictionary,
+) -> None:
+    """コーパスの語彙のうち発音辞書にない単語だけmfa g2pにかけ、語彙全体の辞書を書き出す。手元の分割で漏れた単語はmfa find_oovsで見つけて追加する"""
+    vocabulary = extract_corpus_vocabulary(corpus_dir)
+    pronunciations = resolve_pronunciations(
+        vocabulary, work_dir / "vocabulary", dictionary
+    )
+    output_dictionary_path.write_text(
+        format_dictionary(pronunciations), encoding="utf-8"
+    )
+
+    oov_dir = work_dir / "find_oovs"
+    find_oovs_result = run_mfa_find_oovs(corpus_dir, output_dictionary_path, oov_dir)
+    logger.debug(f"未知語検出完了: {find_oovs_result}")
+    missed_words = [
+        word
+        for word in read_oov_words(oov_dir, output_dictionary_path)
+        if word not in pronunciations
+    ]
+    logger.info(f"MFAの分割で見つかった辞書にない単語数: {len(missed_words)}")
+    if missed_words:
+        pronunciations.update(
+            resolve_pronunciations(missed_words, work_dir / "missed", dictionary)
+        )
+        output_dictionary_path.write_text(
+            format_dictionary(pronunciations), encoding="utf-8"
+        )
+
+
+def resolve_pronunciations(
+    words: list[str], work_dir: Path, dictionary: PronunciationDictionary
+) -> dict[str, list[str]]:
+    """発音辞書から単語の発音を引き、ない単語だけmfa g2pにかけて発音辞書に保存する"""
+    pronunciations = dictionary.get_many(words)
+    g2p_words = [word for word in words if word not in pronunciations]
+    logger.info(f"語彙数: {len(words)}, G2P対象の未知語数: {len(g2p_words)}")
+
+    if g2p_words:
+        work_dir.mkdir(parents=True, exist_ok=True)
+        word_list_path = work_dir / "oov_words.txt"
+        oov_dictionary_path = work_dir / "oov_dictionary.txt"
+        word_list_path.write_text(
+            "".join(f"{word}\n" for word in g2p_words), encoding="utf-8"
+        )
+        g2p_result = run_mfa_g2p(word_list_path, G2P_MODEL_NAME, oov_dictionary_path)
+        logger.debug(f"G2P処理完了: {g2p_result}")
+        generated = parse_g2p_dictionary(
+            oov_dictionary_path.read_text(encoding="utf-8")
+        )
+        dictionary.put_many(generated)
+        pronunciations.update(generated)
+    return {word: pronunciations[word] for word in words if word in pronunciations}
 
-        if output_textgrid_dir is not None:
-            copy_textgrid_files(textgrid_dir, output_textgrid_dir, multi_speaker)
 
-        return lab_dict
+def read_oov_words(oov_dir: Path, dictionary_path: Path) -> list[str]:
+    """mfa find_oovsが書き出した辞書にない単語の一覧を読む"""
+    oov_path = oov_dir / f"oovs_found_{dictionary_path.stem}.txt"
+    if not oov_path.is_file():
+        raise FileNotFoundError(f"mfa find_oovsの出力が見つかりません: {oov_path}")
+    return parse_oov_words(oov_path.read_text(encoding="utf-8"))
 
 
 def write_lab_files(lab_dict: dict[str, list[LabEntry]], output_dir: Path) -> None:
@@ -178,5 +562,115 @@ def validate_file_counts(text_paths: list[Path], wav_paths: list[Path]) -> None:
         )
 
 
+def configure_process_alignment(setting: ProcessAlignmentSetting) -> None:
+    """アライメント処理の設定を変更する。開いているマニフェストと発音辞書は閉じる"""
+    global process_alignment_setting
+    close_alignment_manifest()
+    close_pronunciation_dictionary()
+    with alignment_manifest_lock:
+        process_alignment_setting = setting
+
+
+def get_alignment_manifest() -> AlignmentManifest:
+    """現在の設定に対応するアライメントマニフェストを返す。未作成なら作成する"""
+    global alignment_manifest
+    with alignment_manifest_lock:
+        if alignment_manifest is None:
+            if process_alignment_setting.manifest_path is None:
+                raise RuntimeError("アライメントマニフェストのパスが設定されていません")
+            alignment_manifest = AlignmentManifest(
+                process_alignment_setting.manifest_path,
+                process_alignment_setting.manifest_max_entries,
+                process_alignment_setting.manifest_hash_max_entries,
+                get_alignment_fingerprint(),
+            )
+        return alignment_manifest
+
+
+def get_alignment_fingerprint() -> str:
+    """MFAのバージョンとモデル名からマニフェストの指紋を作る"""
+    source = "\t".join(
+        [
+            get_mfa_environment().version,
+            ACOUSTIC_MODEL_NAME,
+            DICTIONARY_MODEL_NAME,
+            G2P_MODEL_NAME,
+        ]
+    )
+    return hashlib.sha256(source.encode()).hexdigest()[:16]
+
+
+def close_alignment_manifest() -> None:
+    """アライメントマニフェストを閉じる"""
+    global alignment_manifest
+    with alignment_manifest_lock:
+        if alignment_manifest is not None:
+            alignment_manifest.close()
+        alignment_manifest = None
+
+
+def get_pronunciation_dictionary() -> PronunciationDictionary:
+    """現在の設定に対応する発音辞書を返す。未作成なら作成する"""
+    global pronunciation_dictionary
+    with pronunciation_dictionary_lock:
+        if pronunciation_dictionary is None:
+            if process_alignment_setting.pronunciation_dictionary_path is None:
+                raise RuntimeError("発音辞書のパスが設定されていません")
+            pronunciation_dictionary = PronunciationDictionary(
+                process_alignment_setting.pronunciation_dictionary_path,
+                process_alignment_setting.pronunciation_dictionary_max_entries,
+                get_pronunciation_dictionary_fingerprint(),
+            )
+        return pronunciation_dictionary
+
+
+def get_pronunciation_dictionary_fingerprint() -> str:
+    """MFAのバージョンとG2Pモデルのファイル内容から発音辞書の指紋を作る"""
+    source = "\t".join(
+        [
+            get_mfa_environment().version,
+            G2P_MODEL_NAME,
+            hash_file(get_mfa_model_path("g2p", G2P_MODEL_NAME)),
+        ]
+    )
+    return hashlib.sha256(source.encode()).hexdigest()[:16]
+
+
+def close_pronunciation_dictionary() -> None:
+    """発音辞書を閉じる"""
+    global pronunciation_dictionary
+    with pronunciation_dictionary_lock:
+        if pronunciation_dictionary is not None:
+            pronunciation_dictionary.close()
+        pronunciation_dictionary = None
+
+
+def default_process_alignment_setting() -> ProcessAlignmentSetting:
+    """マニフェスト・発音辞書・作業ディレクトリを使わず、音声ファイルをハードリンクで配置するデフォルト設定を返す"""
+    return ProcessAlignmentSetting(
+        manifest_path=None,
+        manifest_max_entries=1_000_000,
+        manifest_hash_max_entries=2_000_000,
+        pronunciation_dictionary_path=None,
+        pronunciation_dictionary_max_entries=10_000_000,
+        audio_staging_mode="hardlink",
+        beam=100,
+        retry_beam=400,
+        workspace_root=None,
+        workspace_clean_policy="on_change",
+        workspace_max_bytes=100 * 1024**3,
+        workspace_max_age_seconds=30 * 24 * 60 * 60,
+    )
+
+
+process_alignment_setting = default_process_alignment_setting()
+alignment_manifest: AlignmentManifest | None = None
+alignment_manifest_lock = threading.Lock()
+atexit.register(close_alignment_manifest)
+pronunciation_dictionary: PronunciationDictionary | None = None
+pronunciation_dictionary_lock = threading.Lock()
+atexit.register(close_pronunciation_dictionary)
+
+
 if __name__ == "__main__":
     typer.run(main)
@@ -6,20 +6,44 @@ Usage:
     PYTHONPATH=. uv run python tools/process_festival.py "hello, world!" --verbose
 """
 
-import platform
-import subprocess
+import atexit
+import hashlib
+import os
+import re
+import threading
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Annotated
+from typing import Annotated, Literal
 
-import sexpdata
 import typer
 from pydantic import BaseModel
 
+from tools.festival_word_cache import (
+    CachedSyllable,
+    FestivalWordCache,
+    TaggedWord,
+    is_cacheable_word,
+)
+from tools.festival_worker import FestivalWorker, FestivalWorkerPool
 from utility.json_utility import print_json_list
 from utility.logger_utility import get_logger, logging_setting
 
 logger = get_logger(Path(__file__))
 
+UTTERANCE_BEGIN_MARKER = "__festival_utterance_begin__"
+
+PHONEME_RECORD_PREFIX = "__festival_phoneme__"
+WORD_RECORD_PREFIX = "__festival_word__"
+VERSION_RECORD_PREFIX = "__festival_version__"
+
+SEXP_TREE_START = '((("'
+SEXP_TOKEN_PATTERN = re.compile(r'[()]|"(?:[^"\\]|\\.)*"|[^\s()"]+')
+SEXP_ESCAPE_PATTERN = re.compile(r"\\(.)")
+
+FestivalMode = Literal["synthesis", "analysis"]
+FestivalOutputFormat = Literal["tree", "table"]
+
 
 class PhonemeInfo(BaseModel):
     """単語・シラブル・音素・ストレス・インデックス情報"""
@@ -32,6 +56,72 @@ class PhonemeInfo(BaseModel):
     stress: int
 
 
+class FestivalSetting(BaseModel):
+    """常駐Festivalワーカーの設定"""
+
+    pool_size: int
+    batch_size: int
+    mode: FestivalMode
+    output_format: FestivalOutputFormat
+    word_cache_path: Path | None
+    word_cache_max_entries: int
+    response_timeout: float
+
+
+class SexpTokenReader:
+    """Festival出力のS式をトークン単位で先頭から読み出すリーダー"""
+
+    def __init__(self, text: str, start: int) -> None:
+        self.matches = SEXP_TOKEN_PATTERN.finditer(text, start)
+        self.position = start
+
+    def next(self) -> str:
+        """次のトークンを読む"""
+        match = next(self.matches, None)
+        if match is None:
+            raise RuntimeError("S式の括弧が閉じていません")
+        self.position = match.end()
+        return match.group()
+
+    def next_is_open(self) -> bool:
+        """次のトークンを読み、開き括弧ならTrue、閉じ括弧ならFalseを返す。アトムなら例外を投げる"""
+        token = self.next()
+        if token == "(":
+            return True
+        if token == ")":
+            return False
+        raise RuntimeError(
+            f"S式の構造が不正です: 括弧の位置にアトム {token} があります"
+        )
+
+    def next_atom(self) -> str:
+        """次のトークンを読み、アトムであればそれを返す"""
+        token = self.next()
+        if token in ("(", ")"):
+            raise RuntimeError(
+                f"S式の構造が不正です: アトムの位置に {token} があります"
+            )
+        return token
+
+    def expect(self, expected: str) -> None:
+        """次のトークンが期待したものであることを確認する"""
+        token = self.next()
+        if token != expected:
+            raise RuntimeError(
+                f"S式の構造が不正です: expected={expected}, actual={token}"
+            )
+
+    def skip_list(self) -> None:
+        """現在のリストの閉じ括弧まで読み飛ばす"""
+        depth = 1
+        while depth > 0:
+            token = self.next()
+            if token == "(":
+                depth += 1
+            elif token == ")":
+                depth -= 1
+
+
 def main(
     text: Annotated[str, typer.Argument(help="解析するテキスト")],
     verbose: Annotated[
@@ -46,150 +136,555 @@ def main(
 
 def festival(text: str) -> list[PhonemeInfo]:
     """英語テキストから音素・シラブル・ストレス情報を抽出しPhonemeInfoリストで返す"""
-    script = build_festival_script(text)
-    output = run_festival(script)
-    infos = extract_sexp(output)
-    return infos
+    return festival_batch([text])[0]
+
+
+def festival_batch(texts: list[str]) -> list[list[PhonemeInfo]]:
+    """複数の英語テキストをbatch_size件ずつ常駐Festivalワーカーに送り、テキストごとのPhonemeInfoリストで返す"""
+    batch_size = festival_setting.batch_size
+    chunks = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+    if len(chunks) <= 1:
+        chunk_results = [festival_chunk(chunk) for chunk in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=festival_setting.pool_size) as executor:
+            chunk_results = list(executor.map(festival_chunk, chunks))
+    return [infos for chunk_result in chunk_results for infos in chunk_result]
+
+
+def configure_festival(setting: FestivalSetting) -> None:
+    """Festivalワーカーの設定を変更する。起動済みのワーカーと開いている単語キャッシュは閉じる"""
+    global festival_setting
+    close_festival_pool()
+    with festival_pool_lock:
+        festival_setting = setting
+
+
+def get_festival_word_cache() -> FestivalWordCache:
+    """現在の設定に対応するFestival単語キャッシュを返す。未作成なら作成する"""
+    global festival_word_cache
+    with festival_pool_lock:
+        if festival_word_cache is not None:
+            return festival_word_cache
+    if festival_setting.word_cache_path is None:
+        raise RuntimeError("Festival単語キャッシュのパスが設定されていません")
+    fingerprint = get_festival_fingerprint()
+    with festival_pool_lock:
+        if festival_word_cache is None:
+            festival_word_cache = FestivalWordCache(
+                festival_setting.word_cache_path,
+                festival_setting.word_cache_max_entries,
+                fingerprint,
+            )
+        return festival_word_cache
+
+
+def get_festival_fingerprint() -> str:
+    """Festivalのバージョン・音声・辞書・モードから単語キャッシュの指紋を作る"""
+    output = get_festival_pool().run(
+        f'(format t "%s %s\\n" "{VERSION_RECORD_PREFIX}" festival_version)'
+    )
+    versions = [
+        line.split(" ", 1)[1]
+        for line in output.splitlines()
+        if line.startswith(VERSION_RECORD_PREFIX + " ")
+    ]
+    if len(versions) != 1:
+        raise RuntimeError("festivalのバージョンが取得できません")
+    source = "\t".join(
+        [versions[0], "cmu_us_slt_arctic_clunits", "cmu", festival_setting.mode]
+    )
+    return hashlib.sha256(source.encode()).hexdigest()[:16]
+
+
+def get_festival_pool() -> FestivalWorkerPool:
+    """現在の設定に対応するFestivalワーカープールを返す。未作成なら作成する"""
+    global festival_pool
+    with festival_pool_lock:
+        if festival_pool is None:
+            festival_pool = FestivalWorkerPool(
+                build_festival_setup_script(
+                    festival_setting.mode, festival_setting.output_format
+                ),
+                festival_setting.pool_size,
+                festival_setting.response_timeout,
+            )
+        return festival_pool
+
 
+def close_festival_pool() -> None:
+    """Festivalワーカープールと単語キャッシュを閉じる"""
+    global festival_pool, festival_word_cache
+    with festival_pool_lock:
+        if festival_pool is not None:
+            festival_pool.close()
+        if festival_word_cache is not None:
+            festival_word_cache.close()
+        festival_pool = None
+        festival_word_cache = None
 
-def build_festival_script(text: str) -> str:
-    """Festival用Schemeスクリプトを生成する"""
-    return f"""(voice_cmu_us_slt_arctic_clunits)
+
+def build_festival_setup_script(
+    mode: FestivalMode, output_format: FestivalOutputFormat
+) -> str:
+    """Festivalワーカー起動時に1度だけ評価するSchemeスクリプトを生成する"""
+    return f"""{build_voice_setup_script(mode)}
 (lex.select "cmu")
 
+(define (analyze utterance)
+  (tag_utterance utterance)
+  (finish_analysis utterance))
+
+(define (tag_utterance utterance)
+  (Initialize utterance)
+  (Text utterance)
+  (Token_POS utterance)
+  (Token utterance)
+  (POS utterance))
+
+(define (finish_analysis utterance)
+  (Phrasify utterance)
+  (Word utterance)
+  (Pauses utterance)
+  (Intonation utterance)
+  (PostLex utterance))
+
+(define (print_syl_structure_tree utterance)
+  (print (utt.relation_tree utterance "SylStructure")))
+
+(define (print_syl_structure_table utterance)
+  (let ((word (utt.relation.first utterance 'SylStructure))
+        (word_index 0)
+        (syllable_index 0))
+    (while word
+      (if (item.daughters word)
+          (mapcar
+           (lambda (syllable)
+             (mapcar
+              (lambda (segment)
+                (print_phoneme_record
+                 word word_index syllable_index
+                 (item.feat syllable "stress") (item.name segment)))
+              (item.daughters syllable))
+             (set! syllable_index (+ syllable_index 1)))
+           (item.daughters word))
+          (begin
+            (print_phoneme_record
+             word word_index syllable_index 0 (item.name word))
+            (set! syllable_index (+ syllable_index 1))))
+      (set! word_index (+ word_index 1))
+      (set! word (item.next word)))))
+
+(define (print_phoneme_record word word_index syllable_index stress phoneme)
+  (format t "%s %d %d %d %s %s\\n"
+          "{PHONEME_RECORD_PREFIX}" word_index syllable_index stress phoneme
+          (item.name word)))
+
 (define (phonemize line)
   (set! utterance (eval (list 'Utterance 'Text line)))
-  (utt.synth utterance)
-  (print (utt.relation_tree utterance "SylStructure")))
+  ({build_utterance_process_name(mode)} utterance)
+  ({build_utterance_print_name(output_format)} utterance))
 
-(set! lines (list "{text}"))
-(mapcar (lambda (line) (phonemize line)) lines)
+(define (phonemize_lines lines)
+  (mapcar
+   (lambda (line)
+     (format t "\\n%s\\n" "{UTTERANCE_BEGIN_MARKER}")
+     (phonemize line))
+   lines))
+
+(define (tag line)
+  (set! utterance (eval (list 'Utterance 'Text line)))
+  (tag_utterance utterance)
+  (mapcar
+   (lambda (word)
+     (format t "%s %s %s\\n"
+             "{WORD_RECORD_PREFIX}" (item.feat word "pos") (item.name word)))
+   (utt.relation.items utterance 'Word))
+  utterance)
+
+(define (tag_lines lines)
+  (set! tagged_utterances
+        (mapcar
+         (lambda (line)
+           (format t "\\n%s\\n" "{UTTERANCE_BEGIN_MARKER}")
+           (tag line))
+         lines))
+  nil)
+
+(define (finish_tagged_lines indices)
+  (mapcar
+   (lambda (index)
+     (format t "\\n%s\\n" "{UTTERANCE_BEGIN_MARKER}")
+     (set! utterance (nth index tagged_utterances))
+     (finish_analysis utterance)
+     ({build_utterance_print_name(output_format)} utterance))
+   indices))
 """
 
 
-def run_festival(script: str) -> str:
-    """Festivalを実行し出力を得る"""
-    system = platform.system()
-    if system == "Darwin":
-        cmd = ["./festival/bin/festival", "-i", "--pipe"]
-    elif system == "Linux":
-        cmd = ["festival", "-i", "--pipe"]
+def build_voice_setup_script(mode: FestivalMode) -> str:
+    """音声を選択するSchemeスクリプトを生成する。analysisでは波形合成用のデータベースを読み込まずフロントエンドのみ選択する"""
+    if mode == "synthesis":
+        return "(voice_cmu_us_slt_arctic_clunits)"
+    elif mode == "analysis":
+        return """(load
+ (path-append
+  (cdr (assoc 'cmu_us_slt_arctic_clunits voice-locations))
+  "festvox/cmu_us_slt_arctic_clunits.scm"))
+(voice_reset)
+(cmu_us_slt_arctic::select_phoneset)
+(cmu_us_slt_arctic::select_tokenizer)
+(cmu_us_slt_arctic::select_tagger)
+(cmu_us_slt_arctic::select_lexicon)
+(cmu_us_slt_arctic::select_phrasing)
+(cmu_us_slt_arctic::select_intonation)"""
     else:
-        raise RuntimeError(f"未対応OS: {system}")
-    logger.debug(f"script: {script}")
-    try:
-        output = subprocess.check_output(
-            cmd,
-            input=script.encode(),
-            stderr=subprocess.STDOUT,
-        ).decode()
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError("festival実行エラー") from e
-    logger.debug("=== festival出力 ===\n" + output)
-    return output
+        raise ValueError(f"未対応のFestivalモード: {mode}")
 
 
-def extract_sexp(output: str) -> list[PhonemeInfo]:
-    """Festival出力からS式部分を抽出し、PhonemeInfoリストに変換する"""
-    logger.debug("=== S式抽出 ===")
-    start = output.find('((("')
-    if start == -1:
-        raise RuntimeError("S式部分が見つかりません")
-    paren = 0
-    end = None
-    for i, c in enumerate(output[start:], start=start):
-        if c == "(":
-            paren += 1
-        elif c == ")":
-            paren -= 1
-            if paren == 0:
-                end = i + 1
-                break
-    if end is None:
-        raise RuntimeError("S式の括弧が閉じていません")
-    sexp_text = output[start:end]
-    logger.debug("S式: " + sexp_text)
-    logger.debug("=== S式パース ===")
-    try:
-        sexp = sexpdata.loads(sexp_text)
-    except Exception as e:
-        raise RuntimeError("sexpdata.loads失敗") from e
+def build_utterance_process_name(mode: FestivalMode) -> str:
+    """発話に適用するSchemeの関数名を返す。analysisではSylStructureを作るフロントエンドまでで止める"""
+    if mode == "synthesis":
+        return "utt.synth"
+    elif mode == "analysis":
+        return "analyze"
+    else:
+        raise ValueError(f"未対応のFestivalモード: {mode}")
+
+
+def build_utterance_print_name(output_format: FestivalOutputFormat) -> str:
+    """発話のSylStructureを出力するSchemeの関数名を返す"""
+    if output_format == "tree":
+        return "print_syl_structure_tree"
+    elif output_format == "table":
+        return "print_syl_structure_table"
+    else:
+        raise ValueError(f"未対応のFestival出力形式: {output_format}")
+
+
+def festival_chunk(texts: list[str]) -> list[list[PhonemeInfo]]:
+    """複数テキストを解析し、テキストごとのPhonemeInfoリストで返す。単語キャッシュが設定されていれば利用する"""
+    if festival_setting.word_cache_path is None:
+        return festival_chunk_uncached(texts)
+    return festival_chunk_cached(texts, get_festival_word_cache())
+
+
+def festival_chunk_cached(
+    texts: list[str], word_cache: FestivalWordCache
+) -> list[list[PhonemeInfo]]:
+    """品詞付けまでをFestivalで行い、全単語がキャッシュ済みのテキストはキャッシュから組み立てる。残りのテキストは同じワーカーに残した品詞付け済みの発話から解析を続ける"""
+    with get_festival_pool().session() as worker:
+        restart_count = worker.restart_count
+        tagged_texts = tag_texts(worker, texts)
+        cached = word_cache.get_many(
+            [
+                word
+                for words in tagged_texts
+                for word in words
+                if is_cacheable_word(word)
+            ]
+        )
+        miss_indices = [
+            i
+            for i, words in enumerate(tagged_texts)
+            if not words or not all(word in cached for word in words)
+        ]
+        logger.debug(
+            f"festival単語キャッシュ: 全{len(texts)}件中{len(miss_indices)}件を解析"
+        )
+        if miss_indices:
+            miss_output = run_festival(worker, build_finish_tagged_script(miss_indices))
+            if worker.restart_count != restart_count:
+                raise RuntimeError(
+                    "festivalプロセスが再起動したため品詞付け済みの発話が失われました"
+                )
+            miss_results = [
+                extract_phoneme_infos(utterance_output, festival_setting.output_format)
+                for utterance_output in split_utterance_outputs(
+                    miss_output, len(miss_indices)
+                )
+            ]
+
+    results: dict[int, list[PhonemeInfo]] = {}
+    new_items: dict[TaggedWord, list[CachedSyllable]] = {}
+    if miss_indices:
+        for i, infos in zip(miss_indices, miss_results, strict=True):
+            results[i] = infos
+            new_items.update(collect_cacheable_syllables(tagged_texts[i], infos))
+    word_cache.put_many(new_items)
+
+    for i, words in enumerate(tagged_texts):
+        if i not in results:
+            results[i] = assemble_phoneme_infos(words, cached)
+    return [results[i] for i in range(len(texts))]
+
+
+def tag_texts(worker: FestivalWorker, texts: list[str]) -> list[list[TaggedWord]]:
+    """Festivalで品詞付けまでを行い、テキストごとの単語と品詞のリストを返す。品詞付け済みの発話はワーカーに残す"""
+    lines = " ".join(f'"{escape_scheme_string(text)}"' for text in texts)
+    output = run_festival(worker, f"(tag_lines (list {lines}))\n")
+    utterance_outputs = split_utterance_outputs(output, len(texts))
+    return [
+        extract_tagged_words(utterance_output) for utterance_output in utterance_outputs
+    ]
+
+
+def build_finish_tagged_script(indices: list[int]) -> str:
+    """品詞付け済みの発話のうち指定した番号のものの解析を続けるSchemeスクリプトを生成する"""
+    return f"(finish_tagged_lines (list {' '.join(str(i) for i in indices)}))\n"
 
+
+def collect_cacheable_syllables(
+    words: list[TaggedWord], infos: list[PhonemeInfo]
+) -> dict[TaggedWord, list[CachedSyllable]]:
+    """Festivalの解析結果を単語ごとのシラブル列にまとめ、キャッシュできる単語のものを返す"""
+    syllables_by_word: list[list[CachedSyllable]] = [[] for _ in words]
+    syllable_keys: list[tuple[int, int]] = []
+    for info in infos:
+        if info.word_index >= len(words) or words[info.word_index].word != info.word:
+            raise RuntimeError(
+                f"品詞付け結果とSylStructureの単語が一致しません: word_index={info.word_index}, word={info.word}"
+            )
+        key = (info.word_index, info.syllable_index)
+        if not syllable_keys or syllable_keys[-1] != key:
+            syllable_keys.append(key)
+            syllables_by_word[info.word_index].append(
+                CachedSyllable(stress=info.stress, phonemes=[])
+            )
+        syllables_by_word[info.word_index][-1].phonemes.append(info.phoneme)
+    if any(not syllables for syllables in syllables_by_word):
+        raise RuntimeError("品詞付け結果にSylStructureにない単語があります")
+    return {
+        word: syllables
+        for word, syllables in zip(words, syllables_by_word, strict=True)
+        if is_cacheable_word(word)
+    }
+
+
+def assemble_phoneme_infos(
+    words: list[TaggedWord], cached: dict[TaggedWord, list[CachedSyllable]]
+) -> list[PhonemeInfo]:
+    """キャッシュ済みの単語ごとのシラブル列からインデックスを振り直してPhonemeInfoリストを組み立てる"""
     infos: list[PhonemeInfo] = []
-    phoneme_index = 0
     syllable_index = 0
-    for word_index, word_entry in enumerate(sexp):
-        witem = word_entry[0][0]
-        word = witem.value() if isinstance(witem, sexpdata.Symbol) else str(witem)
-        has_syl = False
-        for syl_entry in word_entry[1:]:
-            if not (
-                isinstance(syl_entry, list)
-                and syl_entry
-                and isinstance(syl_entry[0], list)
-            ):
-                continue
-            key = syl_entry[0][0]
-            if not (
-                (isinstance(key, str) and key == "syl")
-                or (isinstance(key, sexpdata.Symbol) and key.value() == "syl")
-            ):
-                continue
-            has_syl = True
-            syl_props = syl_entry[0][1]
-            stress = next(
-                (
-                    p[1]
-                    for p in syl_props
-                    if isinstance(p, list)
-                    and (
-                        (isinstance(p[0], str) and p[0] == "stress")
-                        or (
-                            isinstance(p[0], sexpdata.Symbol)
-                            and p[0].value() == "stress"
-                        )
-                    )
-                ),
-                None,
-            )
-            for ph_container in syl_entry[1:]:
-                if not (
-                    isinstance(ph_container, list)
-                    and ph_container
-                    and isinstance(ph_container[0], list)
-                ):
-                    continue
-                psym = ph_container[0][0]
-                phoneme = (
-                    psym.value() if isinstance(psym, sexpdata.Symbol) else str(psym)
-                )
+    for word_index, word in enumerate(words):
+        for syllable in cached[word]:
+            for phoneme in syllable.phonemes:
                 infos.append(
                     PhonemeInfo(
-                        word=word,
+                        word=word.word,
                         word_index=word_index,
                         syllable_index=syllable_index,
                         phoneme=phoneme,
-                        phoneme_index=phoneme_index,
-                        stress=int(stress) if stress is not None else 0,
+                        phoneme_index=len(infos),
+                        stress=syllable.stress,
                     )
                 )
-                phoneme_index += 1
             syllable_index += 1
-        if not has_syl:
-            infos.append(
-                PhonemeInfo(
+    return infos
+
+
+def festival_chunk_uncached(texts: list[str]) -> list[list[PhonemeInfo]]:
+    """1つのFestivalワーカーで複数テキストを解析し、テキストごとのPhonemeInfoリストで返す"""
+    script = build_festival_script(texts)
+    with get_festival_pool().session() as worker:
+        output = run_festival(worker, script)
+    utterance_outputs = split_utterance_outputs(output, len(texts))
+    return [
+        extract_phoneme_infos(utterance_output, festival_setting.output_format)
+        for utterance_output in utterance_outputs
+    ]
+
+
+def build_festival_script(texts: list[str]) -> str:
+    """Festivalワーカーに送るSchemeスクリプトを生成する"""
+    lines = " ".join(f'"{escape_scheme_string(text)}"' for text in texts)
+    return f"""(phonemize_lines (list {lines}))
+"""
+
+
+def run_festival(worker: FestivalWorker, script: str) -> str:
+    """常駐Festivalワーカーでスクリプトを実行し出力を得る"""
+    logger.debug(f"script: {script}")
+    output = worker.run(script)
+    logger.debug("=== festival出力 ===\n" + output)
+    return output
+
+
+def default_festival_setting() -> FestivalSetting:
+    """CPUスレッド数をワーカー数の上限とするデフォルト設定を返す"""
+    pool_size = os.cpu_count()
+    if pool_size is None:
+        raise RuntimeError("CPUスレッド数の取得に失敗しました")
+    return FestivalSetting(
+        pool_size=pool_size,
+        batch_size=200,
+        mode="synthesis",
+        output_format="tree",
+        word_cache_path=None,
+        word_cache_max_entries=1_000_000,
+        response_timeout=300,
+    )
+
+
+def split_utterance_outputs(output: str, utterance_count: int) -> list[str]:
+    """Festival出力を発話開始マーカーで発話ごとに分割する"""
+    utterance_outputs = output.split(UTTERANCE_BEGIN_MARKER)[1:]
+    if len(utterance_outputs) != utterance_count:
+        raise RuntimeError(
+            f"festival出力の発話数が一致しません: expected={utterance_count}, actual={len(utterance_outputs)}"
+        )
+    return utterance_outputs
+
+
+def extract_phoneme_infos(
+    output: str, output_format: FestivalOutputFormat
+) -> list[PhonemeInfo]:
+    """1発話分のFestival出力を出力形式に応じてPhonemeInfoリストに変換する"""
+    if output_format == "tree":
+        return extract_sexp(output)
+    elif output_format == "table":
+        return extract_table(output)
+    else:
+        raise ValueError(f"未対応のFestival出力形式: {output_format}")
+
+
+def extract_tagged_words(output: str) -> list[TaggedWord]:
+    """1発話分のFestival出力の単語レコード行を分割し、単語と品詞のリストに変換する"""
+    words: list[TaggedWord] = []
+    for line in output.splitlines():
+        if not line.startswith(WORD_RECORD_PREFIX + " "):
+            continue
+        _, pos, word = line.split(" ", 2)
+        words.append(TaggedWord(word=word, pos=pos))
+    return words
+
+
+def escape_scheme_string(text: str) -> str:
+    """Schemeの文字列リテラルに埋め込めるようにエスケープする"""
+    return text.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def extract_sexp(output: str) -> list[PhonemeInfo]:
+    """Festival出力の最初のS式を読み取り、PhonemeInfoリストに変換する"""
+    logger.debug("=== S式読み取り ===")
+    for infos in iter_sexp_trees(output):
+        return infos
+    raise RuntimeError("S式部分が見つかりません")
+
+
+def iter_sexp_trees(output: str) -> Iterator[list[PhonemeInfo]]:
+    """Festival出力に含まれるSylStructureのS式を先頭から順に読み取り、S式ごとのPhonemeInfoリストを返す"""
+    start = output.find(SEXP_TREE_START)
+    while start != -1:
+        tokens = SexpTokenReader(output, start)
+        yield list(read_syl_structure_tree(tokens))
+        start = output.find(SEXP_TREE_START, tokens.position)
+
+
+def read_syl_structure_tree(tokens: SexpTokenReader) -> Iterator[PhonemeInfo]:
+    """SylStructureのS式をトークン単位で読み進め、音素ごとにPhonemeInfoを返す"""
+    tokens.expect("(")
+    phoneme_index = 0
+    syllable_index = 0
+    word_index = 0
+    while tokens.next_is_open():
+        word = read_item_name(tokens)
+        tokens.skip_list()
+        has_syl = False
+        while tokens.next_is_open():
+            if read_item_name(tokens) != "syl":
+                tokens.skip_list()
+                tokens.skip_list()
+                continue
+            has_syl = True
+            stress = read_stress(tokens)
+            while tokens.next_is_open():
+                phoneme = read_item_name(tokens)
+                tokens.skip_list()
+                tokens.skip_list()
+                yield PhonemeInfo(
                     word=word,
                     word_index=word_index,
                     syllable_index=syllable_index,
-                    phoneme=word,
+                    phoneme=phoneme,
                     phoneme_index=phoneme_index,
-                    stress=0,
+                    stress=stress,
                 )
+                phoneme_index += 1
+            syllable_index += 1
+        if not has_syl:
+            yield PhonemeInfo(
+                word=word,
+                word_index=word_index,
+                syllable_index=syllable_index,
+                phoneme=word,
+                phoneme_index=phoneme_index,
+                stress=0,
             )
             phoneme_index += 1
             syllable_index += 1
+        word_index += 1
+
+
+def read_item_name(tokens: SexpTokenReader) -> str:
+    """アイテムの記述部`(名前 (素性...))`の開き括弧と名前を読み、名前を返す"""
+    tokens.expect("(")
+    return unquote_sexp_atom(tokens.next_atom())
+
+
+def read_stress(tokens: SexpTokenReader) -> int:
+    """アイテムの記述部の残りを読み、最初のstress素性の値を返す。stress素性がなければ0を返す"""
+    stresses: list[int] = []
+    if tokens.next_is_open():
+        while tokens.next_is_open():
+            key = unquote_sexp_atom(tokens.next_atom())
+            value = tokens.next()
+            if value == ")":
+                continue
+            if value == "(":
+                tokens.skip_list()
+            elif key == "stress":
+                stresses.append(int(unquote_sexp_atom(value)))
+            tokens.skip_list()
+        tokens.skip_list()
+    return stresses[0] if stresses else 0
+
+
+def unquote_sexp_atom(token: str) -> str:
+    """S式のアトムを文字列に変換する。文字列リテラルなら引用符とエスケープを外す"""
+    if token.startswith('"'):
+        return SEXP_ESCAPE_PATTERN.sub(r"\1", token[1:-1])
+    return token
+
+
+def extract_table(output: str) -> list[PhonemeInfo]:
+    """Festival出力の音素レコード行を分割し、PhonemeInfoリストに変換する"""
+    infos: list[PhonemeInfo] = []
+    for line in output.splitlines():
+        if not line.startswith(PHONEME_RECORD_PREFIX + " "):
+            continue
+        _, word_index, syllable_index, stress, phoneme, word = line.split(" ", 5)
+        infos.append(
+            PhonemeInfo(
+                word=word,
+                word_index=int(word_index),
+                syllable_index=int(syllable_index),
+                phoneme=phoneme,
+                phoneme_index=len(infos),
+                stress=int(stress),
+            )
+        )
+    if not infos:
+        raise RuntimeError("音素レコードが見つかりません")
     return infos
 
 
+festival_setting = default_festival_setting()
+festival_pool: FestivalWorkerPool | None = None
+festival_word_cache: FestivalWordCache | None = None
+festival_pool_lock = threading.Lock()
+atexit.register(close_festival_pool)
+
+
 if __name__ == "__main__":
     typer.run(main)
@@ -6,23 +6,31 @@ Usage:
     PYTHONPATH=. uv run python tools/process_phonemizer.py "hello, world!" --verbose
 """
 
+import atexit
 import glob
+import hashlib
 import os
 import platform
 import re
+import threading
 from pathlib import Path
 from typing import Annotated
 
 import typer
-from phonemizer import phonemize
+from phonemizer.backend import EspeakBackend
 from phonemizer.separator import Separator
 from pydantic import BaseModel
 
+from tools.phonemizer_word_cache import PhonemizerWordCache
 from utility.json_utility import print_json_list
 from utility.logger_utility import get_logger, logging_setting
 
 logger = get_logger(Path(__file__))
 
+ESPEAK_LANGUAGE = "en-us"
+ESPEAK_WITH_STRESS = True
+ESPEAK_SEPARATOR = Separator(phone=" ", word="")
+
 
 class PhonemeInfo(BaseModel):
     """単語・音素・ストレス・インデックス情報"""
@@ -34,6 +42,13 @@ class PhonemeInfo(BaseModel):
     stress: int
 
 
+class PhonemizerSetting(BaseModel):
+    """espeakによる音素化の設定"""
+
+    word_cache_path: Path | None
+    word_cache_max_entries: int
+
+
 def main(
     text: Annotated[str, typer.Argument(help="解析するテキスト")],
     verbose: Annotated[
@@ -48,31 +63,59 @@ def main(
 
 def phonemizer_espeak(text: str) -> list[PhonemeInfo]:
     """英語テキストから音素・ストレス情報を抽出しPhonemeInfoリストで返す"""
-    logger.debug(f"text: {text}")
+    return phonemizer_espeak_batch([text], 1)[0]
 
-    words = split_words(text)
-    logger.debug(f"words: {words}")
 
-    set_espeak_library_for_macos()
+def phonemizer_espeak_batch(texts: list[str], njobs: int) -> list[list[PhonemeInfo]]:
+    """複数テキストの単語を重複なくまとめて1度だけespeakにかけ、テキストごとのPhonemeInfoリストで返す"""
+    text_words = [split_words(text) for text in texts]
+    unique_words = list(dict.fromkeys(word for words in text_words for word in words))
+    logger.debug(f"texts: {len(texts)}, unique words: {len(unique_words)}")
+
+    word_phonemes = get_word_phonemes(unique_words, njobs)
+    return [build_phoneme_infos(words, word_phonemes) for words in text_words]
+
 
-    phones = phonemize(
-        words,
-        language="en-us",
-        backend="espeak",
-        separator=Separator(phone=" ", word=""),
-        strip=True,
-        with_stress=True,
-        njobs=1,
-        preserve_punctuation=True,
+def get_word_phonemes(
+    words: list[str], njobs: int
+) -> dict[str, list[tuple[str, int, str]]]:
+    """単語ごとの音素列を返す。単語キャッシュが設定されていればキャッシュ済みの単語はespeakにかけない"""
+    if phonemizer_setting.word_cache_path is None:
+        return parse_words(words, njobs)
+    word_cache = get_phonemizer_word_cache()
+    word_phonemes = word_cache.get_many(words)
+    miss_words = [word for word in words if word not in word_phonemes]
+    logger.debug(
+        f"phonemizer単語キャッシュ: 全{len(words)}単語中{len(miss_words)}単語を音素化"
     )
+    new_items = parse_words(miss_words, njobs)
+    word_cache.put_many(new_items)
+    word_phonemes.update(new_items)
+    return word_phonemes
+
+
+def parse_words(words: list[str], njobs: int) -> dict[str, list[tuple[str, int, str]]]:
+    """単語をespeakで音素化し、単語ごとの(phoneme, stress, word)の列を返す"""
+    phones = phonemize_words(words, njobs)
     logger.debug(f"phones: {phones}")
 
-    infos: list[PhonemeInfo] = []
-    phoneme_index = 0
-    for word_index, (word, phone_str) in enumerate(zip(words, phones, strict=False)):
+    word_phonemes: dict[str, list[tuple[str, int, str]]] = {}
+    for word, phone_str in zip(words, phones, strict=True):
         if not isinstance(phone_str, str):
             raise RuntimeError("phonemize()の戻り値がstr型でない")
-        for ph, st, w in parse_phoneme(phone_str, word):
+        word_phonemes[word] = parse_phoneme(phone_str, word)
+    return word_phonemes
+
+
+def build_phoneme_infos(
+    words: list[str], word_phonemes: dict[str, list[tuple[str, int, str]]]
+) -> list[PhonemeInfo]:
+    """単語列と単語ごとの音素列からインデックスを振ったPhonemeInfoリストを作る"""
+    logger.debug(f"words: {words}")
+    infos: list[PhonemeInfo] = []
+    phoneme_index = 0
+    for word_index, word in enumerate(words):
+        for ph, st, w in word_phonemes[word]:
             if not ph or not w:
                 continue
             infos.append(
@@ -88,6 +131,77 @@ def phonemizer_espeak(text: str) -> list[PhonemeInfo]:
     return infos
 
 
+def phonemize_words(words: list[str], njobs: int) -> list[str]:
+    """プロセス内で使い回すespeakバックエンドで単語ごとの音素列を得る"""
+    if not words:
+        return []
+    backend = get_espeak_backend()
+    with espeak_backend_lock:
+        return backend.phonemize(
+            words, separator=ESPEAK_SEPARATOR, strip=True, njobs=njobs
+        )
+
+
+def configure_phonemizer(setting: PhonemizerSetting) -> None:
+    """espeakによる音素化の設定を変更する。開いている単語キャッシュは閉じる"""
+    global phonemizer_setting
+    close_phonemizer_word_cache()
+    with phonemizer_word_cache_lock:
+        phonemizer_setting = setting
+
+
+def get_phonemizer_word_cache() -> PhonemizerWordCache:
+    """現在の設定に対応するphonemizer単語キャッシュを返す。未作成なら作成する"""
+    global phonemizer_word_cache
+    with phonemizer_word_cache_lock:
+        if phonemizer_word_cache is None:
+            if phonemizer_setting.word_cache_path is None:
+                raise RuntimeError("phonemizer単語キャッシュのパスが設定されていません")
+            phonemizer_word_cache = PhonemizerWordCache(
+                phonemizer_setting.word_cache_path,
+                phonemizer_setting.word_cache_max_entries,
+                get_phonemizer_fingerprint(),
+            )
+        return phonemizer_word_cache
+
+
+def get_phonemizer_fingerprint() -> str:
+    """espeakのバージョン・言語・ストレス有無から単語キャッシュの指紋を作る"""
+    set_espeak_library_for_macos()
+    version = ".".join(str(v) for v in EspeakBackend.version())
+    source = "\t".join([version, ESPEAK_LANGUAGE, str(ESPEAK_WITH_STRESS)])
+    return hashlib.sha256(source.encode()).hexdigest()[:16]
+
+
+def close_phonemizer_word_cache() -> None:
+    """phonemizer単語キャッシュを閉じる"""
+    global phonemizer_word_cache
+    with phonemizer_word_cache_lock:
+        if phonemizer_word_cache is not None:
+            phonemizer_word_cache.close()
+        phonemizer_word_cache = None
+
+
+def default_phonemizer_setting() -> PhonemizerSetting:
+    """単語キャッシュを使わないデフォルト設定を返す"""
+    return PhonemizerSetting(word_cache_path=None, word_cache_max_entries=1_000_000)
+
+
+def get_espeak_backend() -> EspeakBackend:
+    """プロセスごとに1度だけespeakバックエンドを作成して返す"""
+    global espeak_backend, espeak_backend_pid
+    with espeak_backend_lock:
+        if espeak_backend is None or espeak_backend_pid != os.getpid():
+            set_espeak_library_for_macos()
+            espeak_backend = EspeakBackend(
+                ESPEAK_LANGUAGE,
+                preserve_punctuation=True,
+                with_stress=ESPEAK_WITH_STRESS,
+            )
+            espeak_backend_pid = os.getpid()
+        return espeak_backend
+
+
 def split_words(text: str) -> list[str]:
     """テキストを単語・句読点ごとに分割する"""
     return re.findall(r"[A-Za-z0-9]+|[.,!?]", text)
@@ -129,5 +243,14 @@ def set_espeak_library_for_macos() -> None:
         )
 
 
+espeak_backend: EspeakBackend | None = None
+espeak_backend_pid = os.getpid()
+espeak_backend_lock = threading.Lock()
+phonemizer_setting = default_phonemizer_setting()
+phonemizer_word_cache: PhonemizerWordCache | None = None
+phonemizer_word_cache_lock = threading.Lock()
+atexit.register(close_phonemizer_word_cache)
+
+
 if __name__ == "__main__":
     typer.run(main)
@@ -8,23 +8,38 @@ Usage:
     PYTHONPATH=. uv run python tools/process_syllable.py "hello, world!" --verbose
 """
 
-from collections import defaultdict
+import atexit
+import itertools
+import os
+import re
+import sys
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Annotated
+from typing import Annotated, TypeVar
 
+import numpy as np
 import typer
+from numpy.typing import NDArray
 from pydantic import BaseModel
 
-from tools.match_phonemes import match_phonemes
+from tools.alignment_cache import AlignmentFailure, AlignmentResult
+from tools.festival_worker import FestivalCrashError, FestivalStartupError
+from tools.match_phonemes import match_phonemes_batch
 from tools.process_festival import PhonemeInfo as FestivalInfo
 from tools.process_festival import festival as run_festival
+from tools.process_festival import festival_batch
 from tools.process_phonemizer import PhonemeInfo as PhonemizerInfo
-from tools.process_phonemizer import phonemizer_espeak
+from tools.process_phonemizer import phonemizer_espeak, phonemizer_espeak_batch
 from utility.json_utility import print_json_list
 from utility.logger_utility import get_logger, logging_setting
 
 logger = get_logger(Path(__file__))
 
+EngineInfo = TypeVar("EngineInfo")
+WordInfo = TypeVar("WordInfo", FestivalInfo, PhonemizerInfo)
+
 
 class UnifiedPhonemeInfo(BaseModel):
     """単語・シラブル・音素・ストレス・インデックス情報"""
@@ -37,6 +52,83 @@ class UnifiedPhonemeInfo(BaseModel):
     stress: int
 
 
+class UnifiedPhonemeTable:
+    """音素ごとの単語・音素文字列とインデックス・ストレスの配列を列ごとに持つ音素情報。文字列はインターンして持つ"""
+
+    def __init__(
+        self,
+        words: list[str],
+        phonemes: list[str],
+        word_indexes: NDArray[np.int64],
+        syllable_indexes: NDArray[np.int64],
+        phoneme_indexes: NDArray[np.int64],
+        stresses: NDArray[np.int64],
+    ) -> None:
+        lengths = {
+            len(words),
+            len(phonemes),
+            len(word_indexes),
+            len(syllable_indexes),
+            len(phoneme_indexes),
+            len(stresses),
+        }
+        if len(lengths) != 1:
+            raise ValueError(f"列の長さが一致しません: {lengths}")
+        self.words = words
+        self.phonemes = phonemes
+        self.word_indexes = word_indexes
+        self.syllable_indexes = syllable_indexes
+        self.phoneme_indexes = phoneme_indexes
+        self.stresses = stresses
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def to_infos(self) -> list[UnifiedPhonemeInfo]:
+        """UnifiedPhonemeInfoのリストに変換する"""
+        return [
+            UnifiedPhonemeInfo(
+                word=word,
+                word_index=word_index,
+                syllable_index=syllable_index,
+                phoneme=phoneme,
+                phoneme_index=phoneme_index,
+                stress=stress,
+            )
+            for word, phoneme, word_index, syllable_index, phoneme_index, stress in zip(
+                self.words,
+                self.phonemes,
+                self.word_indexes.tolist(),
+                self.syllable_indexes.tolist(),
+                self.phoneme_indexes.tolist(),
+                self.stresses.tolist(),
+                strict=True,
+            )
+        ]
+
+
+class ProcessSyllableSuccess(BaseModel, arbitrary_types_allowed=True):
+    """解析に成功したテキストの音素情報"""
+
+    table: UnifiedPhonemeTable
+
+
+class ProcessSyllableFailure(BaseModel):
+    """解析に失敗したテキストのエラーメッセージ"""
+
+    message: str
+
+
+ProcessSyllableResult = ProcessSyllableSuccess | ProcessSyllableFailure
+
+
+class ProcessSyllableSetting(BaseModel):
+    """FestivalとespeakをI/O待ちの間に並行実行するスレッドと、一括解析の分割の設定"""
+
+    max_workers: int
+    chunk_size: int
+
+
 def main(
     text: Annotated[str, typer.Argument(help="解析するテキスト")],
     verbose: Annotated[
@@ -51,88 +143,263 @@ def main(
 
 def process_syllables(text: str) -> list[UnifiedPhonemeInfo]:
     """英語テキストから音素・シラブル・ストレス情報を抽出しUnifiedPhonemeInfoリストで返す"""
-    fest = run_festival(text)
-    phnm = phonemizer_espeak(text)
-
-    fest_by_word = group_by_word(fest)
-    phnm_by_word = group_by_word(phnm)
-
-    result: list[UnifiedPhonemeInfo] = []
-    for word in fest_by_word.keys():
-        if word not in phnm_by_word:
-            raise ValueError(f"単語 '{word}' がphonemizer出力に見つかりません")
-
-        fest_phonemes = [f.phoneme for f in fest_by_word[word]]
-        phnm_phonemes = [p.phoneme for p in phnm_by_word[word]]
-
+    executor = get_engine_executor()
+    fest_future = executor.submit(run_festival, text)
+    phnm_future = executor.submit(phonemizer_espeak, text)
+    fest = fest_future.result()
+    phnm = phnm_future.result()
+
+    word_pairs = join_word_streams(fest, phnm)
+    alignment_results = match_phonemes_batch(build_alignment_pairs(word_pairs))
+    return build_unified_table(word_pairs, alignment_results).to_infos()
+
+
+def process_syllables_batch(texts: list[str]) -> list[ProcessSyllableResult]:
+    """複数の英語テキストをchunk_size件ずつまとめて解析し、テキストごとの結果かエラーを返す"""
+    chunk_size = process_syllable_setting.chunk_size
+    results: list[ProcessSyllableResult] = []
+    for start in range(0, len(texts), chunk_size):
+        results.extend(process_syllables_chunk(texts[start : start + chunk_size]))
+    return results
+
+
+def process_syllables_chunk(texts: list[str]) -> list[ProcessSyllableResult]:
+    """Festivalとespeakをそれぞれまとめて1度ずつ実行し、全単語をまとめてアライメントする"""
+    executor = get_engine_executor()
+    fest_future = executor.submit(run_engine_batch, festival_batch, texts)
+    phnm_future = executor.submit(
+        run_engine_batch, lambda chunk: phonemizer_espeak_batch(chunk, 1), texts
+    )
+    fest_results = fest_future.result()
+    phnm_results = phnm_future.result()
+
+    results: dict[int, ProcessSyllableResult] = {}
+    groups: dict[int, list[tuple[list[FestivalInfo], list[PhonemizerInfo]]]] = {}
+    for i, (fest, phnm) in enumerate(zip(fest_results, phnm_results, strict=True)):
+        if isinstance(fest, ProcessSyllableFailure):
+            results[i] = fest
+        elif isinstance(phnm, ProcessSyllableFailure):
+            results[i] = phnm
+        else:
+            try:
+                groups[i] = join_word_streams(fest, phnm)
+            except ValueError as e:
+                results[i] = ProcessSyllableFailure(message=str(e))
+
+    pairs = {i: build_alignment_pairs(word_pairs) for i, word_pairs in groups.items()}
+    alignment_results = match_phonemes_batch(
+        [pair for text_pairs in pairs.values() for pair in text_pairs]
+    )
+    offset = 0
+    for i, word_pairs in groups.items():
+        text_alignment_results = alignment_results[offset : offset + len(pairs[i])]
+        offset += len(pairs[i])
         try:
-            alignments = match_phonemes(fest_phonemes, phnm_phonemes)
+            results[i] = ProcessSyllableSuccess(
+                table=build_unified_table(word_pairs, text_alignment_results)
+            )
         except ValueError as e:
+            results[i] = ProcessSyllableFailure(message=str(e))
+    return [results[i] for i in range(len(texts))]
+
+
+def run_engine_batch(
+    engine: Callable[[list[str]], list[list[EngineInfo]]], texts: list[str]
+) -> list[list[EngineInfo] | ProcessSyllableFailure]:
+    """エンジンで複数テキストを一括解析する。Festivalを落とすテキストを含め、失敗したらバッチを二分して解析し直し、失敗したテキストだけをエラーにする。Festivalを起動できない場合はテキストによらないため再試行せずに投げる"""
+    try:
+        return list(engine(texts))
+    except FestivalStartupError:
+        raise
+    except (FestivalCrashError, RuntimeError, ValueError) as e:
+        if len(texts) == 1:
+            return [ProcessSyllableFailure(message=str(e))]
+        logger.warning(f"一括解析に失敗したためバッチを二分して解析します: {e}")
+    middle = len(texts) // 2
+    return run_engine_batch(engine, texts[:middle]) + run_engine_batch(
+        engine, texts[middle:]
+    )
+
+
+def join_word_streams(
+    fest: list[FestivalInfo], phnm: list[PhonemizerInfo]
+) -> list[tuple[list[FestivalInfo], list[PhonemizerInfo]]]:
+    """両エンジンの単語列を先頭から1度だけ走査して対応付ける。espeakにだけある句読点は読み飛ばす"""
+    fest_words = split_word_stream(fest)
+    phnm_words = split_word_stream(phnm)
+
+    word_pairs: list[tuple[list[FestivalInfo], list[PhonemizerInfo]]] = []
+    j = 0
+    for fest_word in fest_words:
+        word = fest_word[0].word
+        while (
+            j < len(phnm_words)
+            and phnm_words[j][0].word != word
+            and is_punctuation(phnm_words[j][0].word)
+        ):
+            logger.debug(
+                f"Festival出力にない句読点を読み飛ばします: {phnm_words[j][0].word}"
+            )
+            j += 1
+        if j == len(phnm_words) or phnm_words[j][0].word != word:
+            raise ValueError(f"単語 '{word}' がphonemizer出力に見つかりません")
+        word_pairs.append((fest_word, phnm_words[j]))
+        j += 1
+    return word_pairs
+
+
+def split_word_stream(infos: list[WordInfo]) -> list[list[WordInfo]]:
+    """word_index順に並んだ音素情報を、word_indexと単語が同じ連続部分ごとに分ける"""
+    return [
+        list(group)
+        for _, group in itertools.groupby(
+            infos, key=lambda info: (info.word_index, info.word)
+        )
+    ]
+
+
+def is_punctuation(word: str) -> bool:
+    """句読点だけからなる単語か判定する"""
+    return re.fullmatch(r"[.,!?]+", word) is not None
+
+
+def build_alignment_pairs(
+    word_pairs: list[tuple[list[FestivalInfo], list[PhonemizerInfo]]],
+) -> list[tuple[list[str], list[str]]]:
+    """単語ごとにFestivalとphonemizerの音素列のペアを作る"""
+    return [
+        ([f.phoneme for f in fest_word], [p.phoneme for p in phnm_word])
+        for fest_word, phnm_word in word_pairs
+    ]
+
+
+def build_unified_table(
+    word_pairs: list[tuple[list[FestivalInfo], list[PhonemizerInfo]]],
+    alignment_results: list[AlignmentResult],
+) -> UnifiedPhonemeTable:
+    """単語ごとのアライメント結果から音素情報をphoneme_index順に列として統合し、シラブルごとにストレスを統一する"""
+    words: list[str] = []
+    phonemes: list[str] = []
+    word_indexes: list[int] = []
+    syllable_indexes: list[int] = []
+    phoneme_indexes: list[int] = []
+    stresses: list[int] = []
+    for (fest_word, phnm_word), alignment_result in zip(
+        word_pairs, alignment_results, strict=True
+    ):
+        if isinstance(alignment_result, AlignmentFailure):
             raise ValueError(
-                f"単語 '{word}' の音素アライメントに失敗しました。symbol_mapping.jsonを確認してください。"
-            ) from e
-
-        for fest_idx, phnm_idx in alignments:
-            f = fest_by_word[word][fest_idx]
-            p = phnm_by_word[word][phnm_idx]
-            result.append(
-                UnifiedPhonemeInfo(
-                    word=f.word,
-                    word_index=f.word_index,
-                    syllable_index=f.syllable_index,
-                    phoneme=p.phoneme,
-                    phoneme_index=f.phoneme_index,
-                    stress=p.stress,
-                )
+                f"単語 '{fest_word[0].word}' の音素アライメントに失敗しました。symbol_mapping.jsonを確認してください。"
+            ) from ValueError(alignment_result.message)
+
+        for fest_idx, phnm_idx in alignment_result.pairs:
+            f = fest_word[fest_idx]
+            p = phnm_word[phnm_idx]
+            words.append(sys.intern(f.word))
+            phonemes.append(sys.intern(p.phoneme))
+            word_indexes.append(f.word_index)
+            syllable_indexes.append(f.syllable_index)
+            phoneme_indexes.append(f.phoneme_index)
+            stresses.append(p.stress)
+    return unify_stress_by_syllable(
+        UnifiedPhonemeTable(
+            words=words,
+            phonemes=phonemes,
+            word_indexes=np.array(word_indexes, dtype=np.int64),
+            syllable_indexes=np.array(syllable_indexes, dtype=np.int64),
+            phoneme_indexes=np.array(phoneme_indexes, dtype=np.int64),
+            stresses=np.array(stresses, dtype=np.int64),
+        )
+    )
+
+
+def configure_process_syllables(setting: ProcessSyllableSetting) -> None:
+    """Festivalとespeakを並行実行するスレッドの設定を変更する。作成済みのスレッドプールは閉じる"""
+    global process_syllable_setting
+    close_engine_executor()
+    with engine_executor_lock:
+        process_syllable_setting = setting
+
+
+def get_engine_executor() -> ThreadPoolExecutor:
+    """FestivalとespeakをI/O待ちの間に並行実行するスレッドプールを返す。並列に呼ばれたprocess_syllables全体でmax_workersまでしか同時に動かない"""
+    global engine_executor
+    with engine_executor_lock:
+        if engine_executor is None:
+            engine_executor = ThreadPoolExecutor(
+                max_workers=process_syllable_setting.max_workers
             )
-
-    result.sort(key=lambda x: x.phoneme_index)
-    return unify_stress_by_syllable(result)
-
-
-def group_by_word(
-    phoneme_infos: list[FestivalInfo] | list[PhonemizerInfo],
-) -> dict[str, list]:
-    """音素情報を単語ごとにグループ化する"""
-    result: dict[str, list] = {}
-    for info in phoneme_infos:
-        if info.word not in result:
-            result[info.word] = []
-        result[info.word].append(info)
-    return result
-
-
-def unify_stress_by_syllable(
-    infos: list[UnifiedPhonemeInfo],
-) -> list[UnifiedPhonemeInfo]:
-    """syllable_indexごとにstressを統一する"""
-    grouped: defaultdict[tuple[int, int], list[UnifiedPhonemeInfo]] = defaultdict(list)
-    for info in infos:
-        grouped[(info.word_index, info.syllable_index)].append(info)
-
-    unified_result: list[UnifiedPhonemeInfo] = []
-    for group in grouped.values():
-        stresses = [info.stress for info in group]
+        return engine_executor
+
+
+def close_engine_executor() -> None:
+    """スレッドプールを閉じる"""
+    global engine_executor
+    with engine_executor_lock:
+        if engine_executor is not None:
+            engine_executor.shutdown()
+        engine_executor = None
+
+
+def default_process_syllable_setting() -> ProcessSyllableSetting:
+    """CPUスレッド数を同時実行数の上限とし、1000件ずつ一括解析するデフォルト設定を返す"""
+    max_workers = os.cpu_count()
+    if max_workers is None:
+        raise RuntimeError("CPUスレッド数の取得に失敗しました")
+    return ProcessSyllableSetting(max_workers=max_workers, chunk_size=1000)
+
+
+def unify_stress_by_syllable(table: UnifiedPhonemeTable) -> UnifiedPhonemeTable:
+    """phoneme_index順に並んだ音素情報について、syllable_indexごとにstressを統一する"""
+    if len(table) == 0:
+        return table
+    positions = np.arange(len(table))
+    stresses = table.stresses
+    is_group_start = np.ones(len(table), dtype=np.bool_)
+    is_group_start[1:] = (np.diff(table.word_indexes) != 0) | (
+        np.diff(table.syllable_indexes) != 0
+    )
+    starts = np.flatnonzero(is_group_start)
+    group_lengths = np.diff(np.append(starts, len(table)))
+
+    non_zero = stresses != 0
+    non_zero_counts = np.add.reduceat(non_zero.astype(np.int64), starts)
+    max_stresses = np.maximum.reduceat(stresses, starts)
+    min_non_zero = np.minimum.reduceat(
+        np.where(non_zero, stresses, np.iinfo(np.int64).max), starts
+    )
+    first_non_zero = np.minimum.reduceat(
+        np.where(non_zero, positions, len(table)), starts
+    )
+    last_non_zero = np.maximum.reduceat(np.where(non_zero, positions, -1), starts)
+
+    # 全0か、0以外が1か2の単一の値で連続しているシラブルだけが有効
+    valid = (non_zero_counts == 0) | (
+        (min_non_zero == max_stresses)
+        & np.isin(max_stresses, [1, 2])
+        & (last_non_zero - first_non_zero + 1 == non_zero_counts)
+    )
+    if not valid.all():
+        group = int(np.flatnonzero(~valid)[0])
+        start = int(starts[group])
+        group_stresses = stresses[start : start + group_lengths[group]].tolist()
         try:
-            unified_stress_val = get_unified_stress(stresses)
+            get_unified_stress(group_stresses)
         except ValueError as e:
             raise ValueError(
-                f"syllable_index={group[0].syllable_index} (word_index={group[0].word_index}, word='{group[0].word}') のストレス値が不正: {stresses}（許容パターン: 全0, または連続する単一の1か2のみ）"
+                f"syllable_index={table.syllable_indexes[start]} (word_index={table.word_indexes[start]}, word='{table.words[start]}') のストレス値が不正: {group_stresses}（許容パターン: 全0, または連続する単一の1か2のみ）"
             ) from e
+        raise RuntimeError(f"ストレス値の検証結果が一致しません: {group_stresses}")
 
-        for info in group:
-            unified_result.append(
-                UnifiedPhonemeInfo(
-                    word=info.word,
-                    word_index=info.word_index,
-                    syllable_index=info.syllable_index,
-                    phoneme=info.phoneme,
-                    phoneme_index=info.phoneme_index,
-                    stress=unified_stress_val,
-                )
-            )
-    unified_result.sort(key=lambda x: x.phoneme_index)
-    return unified_result
+    unified_stresses = np.where(non_zero_counts == 0, 0, max_stresses)
+    return UnifiedPhonemeTable(
+        words=table.words,
+        phonemes=table.phonemes,
+        word_indexes=table.word_indexes,
+        syllable_indexes=table.syllable_indexes,
+        phoneme_indexes=table.phoneme_indexes,
+        stresses=np.repeat(unified_stresses, group_lengths),
+    )
 
 
 def get_unified_stress(stresses: list[int]) -> int:
@@ -177,5 +444,11 @@ def get_unified_stress(stresses: list[int]) -> int:
     return first_non_zero
 
 
+process_syllable_setting = default_process_syllable_setting()
+engine_executor: ThreadPoolExecutor | None = None
+engine_executor_lock = threading.Lock()
+atexit.register(close_engine_executor)
+
+
 if __name__ == "__main__":
     typer.run(main)
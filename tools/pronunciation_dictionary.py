@@ -0,0 +1,103 @@
+"""mfa g2pで生成した単語ごとの発音を永続化する発音辞書"""
+
+import json
+import re
+from pathlib import Path
+
+from utility.logger_utility import get_logger
+from utility.sqlite_cache_utility import CacheStats, SqliteLruCache
+
+logger = get_logger(Path(__file__))
+
+WORD_SEPARATOR_PATTERN = re.compile(
+    r"[\s、。।，@<>\"(),.:;¿?¡!\\&%#*~【】…‥「」『』〝〟″⟨⟩♪・‹›«»～′$+=\[\]{}“”„—–？！：；（）＜＞［］｛｝]+"
+)
+CLITIC_MARKERS = "'’"
+WORD_EDGE_CHARS = CLITIC_MARKERS + "-"
+COMPOUND_MARKER = "-"
+
+
+class PronunciationDictionary:
+    """単語とG2Pモデルの指紋をキーに、mfa g2pが出力した発音を保存する辞書"""
+
+    def __init__(self, path: Path, max_entries: int, fingerprint: str) -> None:
+        self.store = SqliteLruCache(path, max_entries)
+        self.fingerprint = fingerprint
+
+    def get_many(self, words: list[str]) -> dict[str, list[str]]:
+        """保存済みの単語の発音を返す。未保存の単語は結果に含めない"""
+        keys = {build_cache_key(self.fingerprint, word): word for word in words}
+        found = self.store.get_many(list(keys))
+        return {keys[key]: json.loads(value) for key, value in found.items()}
+
+    def put_many(self, items: dict[str, list[str]]) -> None:
+        """単語の発音を保存する"""
+        self.store.put_many(
+            {
+                build_cache_key(self.fingerprint, word): json.dumps(
+                    pronunciations, ensure_ascii=False
+                )
+                for word, pronunciations in items.items()
+            }
+        )
+
+    def stats(self) -> CacheStats:
+        """ヒット・ミス回数と保存件数を返す"""
+        return self.store.stats()
+
+    def close(self) -> None:
+        """発音辞書を閉じる"""
+        self.store.close()
+
+
+def extract_corpus_vocabulary(corpus_dir: Path) -> list[str]:
+    """コーパスディレクトリ内の全テキストファイルから単語の一覧を作る。MFAの分割との差はmfa find_oovsで補う"""
+    words: set[str] = set()
+    for text_path in corpus_dir.rglob("*.txt"):
+        words.update(extract_words(text_path.read_text(encoding="utf-8")))
+    return sorted(words)
+
+
+def extract_words(text: str) -> set[str]:
+    """MFAの既定の区切り文字で分割して単語を取り出す。アポストロフィはMFAと同じく'にそろえ、ハイフンを含む単語は分割した各部分も加える"""
+    words: set[str] = set()
+    for token in WORD_SEPARATOR_PATTERN.split(text.lower()):
+        word = token.strip(WORD_EDGE_CHARS)
+        for clitic_marker in CLITIC_MARKERS[1:]:
+            word = word.replace(clitic_marker, CLITIC_MARKERS[0])
+        if not word:
+            continue
+        words.add(word)
+        if COMPOUND_MARKER in word:
+            words.update(part for part in word.split(COMPOUND_MARKER) if part)
+    return words
+
+
+def parse_g2p_dictionary(dictionary_text: str) -> dict[str, list[str]]:
+    """mfa g2pが出力した辞書を単語ごとの発音のリストに変換する。発音は単語以降の列をそのまま保持する"""
+    pronunciations: dict[str, list[str]] = {}
+    for line in dictionary_text.splitlines():
+        if not line.strip():
+            continue
+        word, pronunciation = line.split("\t", 1)
+        pronunciations.setdefault(word, []).append(pronunciation)
+    return pronunciations
+
+
+def parse_oov_words(oov_text: str) -> list[str]:
+    """mfa find_oovsが出力した未知語の一覧を単語のリストに変換する"""
+    return [line.strip() for line in oov_text.splitlines() if line.strip()]
+
+
+def format_dictionary(pronunciations: dict[str, list[str]]) -> str:
+    """単語ごとの発音のリストをMFAの辞書形式に変換する"""
+    return "".join(
+        f"{word}\t{pronunciation}\n"
+        for word, word_pronunciations in pronunciations.items()
+        for pronunciation in word_pronunciations
+    )
+
+
+def build_cache_key(fingerprint: str, word: str) -> str:
+    """発音辞書のキーを生成する"""
+    return f"{fingerprint}\t{word}"
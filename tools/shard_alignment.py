@@ -0,0 +1,453 @@
+"""
+コーパスを音声の長さと話者で均等なシャードに分け、複数のワーカーで並列にMFAアライメントするツール。
+共有ディレクトリのマニフェストとロックファイルでシャードを取り合うので、同じディレクトリを見られるマシンならいくつでもworkを起動できる。
+処理中のワーカーはロックファイルの更新時刻を定期的に更新し、一定時間更新されていないロックファイルは異常終了したワーカーのものとして他のワーカーが取得し直す。
+
+Usage:
+    PYTHONPATH=. uv run python tools/shard_alignment.py plan --text-glob "tools/data/*.txt" --wav-glob "tools/data/*.wav" --shard-dir ./hiho_shards --num-shards 4
+    PYTHONPATH=. uv run python tools/shard_alignment.py work --shard-dir ./hiho_shards
+    PYTHONPATH=. uv run python tools/shard_alignment.py merge --shard-dir ./hiho_shards --output-dir ./hiho_aligned_output
+"""
+
+import heapq
+import os
+import shutil
+import socket
+import threading
+import time
+import wave
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Annotated
+
+import typer
+from pydantic import BaseModel
+
+from tools.alignment_manifest import AlignmentPair
+from tools.mfa_launcher import ensure_model_exists, get_mfa_environment
+from tools.mfa_runner import get_speaker_id
+from tools.process_alignment import (
+    ACOUSTIC_MODEL_NAME,
+    DICTIONARY_MODEL_NAME,
+    G2P_MODEL_NAME,
+    parse_textgrids,
+    run_alignment,
+    validate_file_counts,
+    write_lab_files,
+)
+from tools.textgrid_parser import write_textgrid_files
+from utility.file_utility import expand_glob_pattern
+from utility.logger_utility import get_logger, logging_setting
+
+logger = get_logger(Path(__file__))
+
+SHARD_MANIFEST_FILE_NAME = "manifest.json"
+SHARD_CLAIM_DIR_NAME = "claims"
+SHARD_RESULT_DIR_NAME = "results"
+SHARD_CLAIM_HEARTBEATS_PER_TIMEOUT = 4
+
+app = typer.Typer()
+
+
+class AlignmentShard(BaseModel):
+    """1つのワーカーがまとめてアライメントするファイルの組"""
+
+    index: int
+    duration: float
+    pairs: list[AlignmentPair]
+
+
+class ShardManifest(BaseModel):
+    """シャードの一覧とアライメントの設定"""
+
+    multi_speaker: bool
+    remove_problematic_chars: bool
+    shards: list[AlignmentShard]
+
+
+@app.command()
+def plan(
+    text_glob: Annotated[
+        str,
+        typer.Option(
+            ..., help="テキストファイルのglobパターン（例: tools/data/*.txt）"
+        ),
+    ],
+    wav_glob: Annotated[
+        str,
+        typer.Option(..., help="音声ファイルのglobパターン（例: tools/data/*.wav）"),
+    ],
+    shard_dir: Annotated[
+        Path,
+        typer.Option(..., help="マニフェスト・ロック・結果を置く共有ディレクトリ"),
+    ],
+    num_shards: Annotated[int, typer.Option(..., help="シャード数")],
+    multi_speaker: Annotated[
+        bool,
+        typer.Option(help="複数話者モード。親ディレクトリ名を話者IDとして認識する"),
+    ] = False,
+    remove_problematic_chars: Annotated[
+        bool,
+        typer.Option(help="spn音素になる文字`[](){ }`を除去する。"),
+    ] = False,
+    verbose: Annotated[
+        bool, typer.Option(help="詳細なデバッグ出力をstderrに出す")
+    ] = False,
+) -> None:
+    """コーパスをシャードに分けてマニフェストを書き出す"""
+    logging_setting(verbose)
+    manifest = plan_shards(
+        text_glob,
+        wav_glob,
+        shard_dir,
+        num_shards,
+        multi_speaker,
+        remove_problematic_chars,
+    )
+    for shard in manifest.shards:
+        logger.info(
+            f"シャード{shard.index}: {len(shard.pairs)}ファイル, {shard.duration:.1f}秒"
+        )
+
+
+@app.command()
+def work(
+    shard_dir: Annotated[
+        Path,
+        typer.Option(..., help="マニフェスト・ロック・結果を置く共有ディレクトリ"),
+    ],
+    stale_claim_seconds: Annotated[
+        float,
+        typer.Option(
+            help="この秒数だけ更新されていないロックファイルは異常終了したワーカーのものとして取得し直す"
+        ),
+    ] = 600,
+    verbose: Annotated[
+        bool, typer.Option(help="詳細なデバッグ出力をstderrに出す")
+    ] = False,
+) -> None:
+    """未処理のシャードを取得してアライメントする"""
+    logging_setting(verbose)
+    aligned = run_shard_worker(shard_dir, stale_claim_seconds)
+    logger.info(f"アライメントしたシャード: {aligned}")
+
+
+@app.command()
+def merge(
+    shard_dir: Annotated[
+        Path,
+        typer.Option(..., help="マニフェスト・ロック・結果を置く共有ディレクトリ"),
+    ],
+    output_dir: Annotated[
+        Path,
+        typer.Option(..., help="出力先ディレクトリ"),
+    ],
+    output_textgrid_dir: Annotated[
+        Path | None,
+        typer.Option(
+            help="TextGridファイルの出力先ディレクトリ。指定しない場合は出力しない。"
+        ),
+    ] = None,
+    verbose: Annotated[
+        bool, typer.Option(help="詳細なデバッグ出力をstderrに出す")
+    ] = False,
+) -> None:
+    """全シャードのTextGridを集めてlabファイルとして出力する"""
+    logging_setting(verbose)
+    textgrids = collect_shard_textgrids(shard_dir)
+    write_lab_files(parse_textgrids(textgrids), output_dir)
+    if output_textgrid_dir is not None:
+        write_textgrid_files(textgrids, output_textgrid_dir)
+
+
+def plan_shards(
+    text_glob: str,
+    wav_glob: str,
+    shard_dir: Path,
+    num_shards: int,
+    multi_speaker: bool,
+    remove_problematic_chars: bool,
+) -> ShardManifest:
+    """コーパスを音声の長さと話者で均等なシャードに分け、マニフェストを書き出す"""
+    if num_shards < 1:
+        raise ValueError(f"num_shardsは1以上である必要があります: {num_shards}")
+    manifest_path = shard_dir / SHARD_MANIFEST_FILE_NAME
+    if manifest_path.exists():
+        raise FileExistsError(f"マニフェストが既に存在します: {manifest_path}")
+
+    text_paths = expand_glob_pattern(text_glob, "テキストファイル")
+    wav_paths = expand_glob_pattern(wav_glob, "音声ファイル")
+    validate_file_counts(text_paths, wav_paths)
+
+    pairs = [
+        AlignmentPair(
+            text_path=text_path.resolve(),
+            wav_path=wav_path.resolve(),
+            speaker_id=get_speaker_id(text_path),
+        )
+        for text_path, wav_path in zip(text_paths, wav_paths, strict=True)
+    ]
+    durations = {pair: read_wav_duration(pair.wav_path) for pair in pairs}
+    units = build_shard_units(pairs, durations, num_shards, multi_speaker)
+    manifest = ShardManifest(
+        multi_speaker=multi_speaker,
+        remove_problematic_chars=remove_problematic_chars,
+        shards=assign_shards(units, durations, num_shards),
+    )
+
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path.write_text(manifest.model_dump_json(indent=2), encoding="utf-8")
+    logger.debug(f"マニフェスト出力: {manifest_path}")
+    return manifest
+
+
+def build_shard_units(
+    pairs: list[AlignmentPair],
+    durations: dict[AlignmentPair, float],
+    num_shards: int,
+    multi_speaker: bool,
+) -> list[list[AlignmentPair]]:
+    """シャードに割り当てる単位を作る。複数話者モードでは話者ごとにまとめ、1シャード分を超える話者だけ分割する"""
+    if not multi_speaker:
+        return [[pair] for pair in pairs]
+
+    target = sum(durations.values()) / num_shards
+    speaker_groups: dict[str, list[AlignmentPair]] = {}
+    for pair in pairs:
+        speaker_groups.setdefault(pair.speaker_id, []).append(pair)
+
+    units: list[list[AlignmentPair]] = []
+    for speaker_pairs in speaker_groups.values():
+        unit: list[AlignmentPair] = []
+        unit_duration = 0.0
+        for pair in speaker_pairs:
+            if unit and unit_duration + durations[pair] > target:
+                units.append(unit)
+                unit = []
+                unit_duration = 0.0
+            unit.append(pair)
+            unit_duration += durations[pair]
+        units.append(unit)
+    return units
+
+
+def assign_shards(
+    units: list[list[AlignmentPair]],
+    durations: dict[AlignmentPair, float],
+    num_shards: int,
+) -> list[AlignmentShard]:
+    """長い単位から順に、合計の長さが最も短いシャードへ割り当てる。空のシャードは作らない"""
+    unit_durations = [sum(durations[pair] for pair in unit) for unit in units]
+    order = sorted(range(len(units)), key=lambda i: unit_durations[i], reverse=True)
+
+    heap = [(0.0, shard_index) for shard_index in range(num_shards)]
+    shard_pairs: list[list[AlignmentPair]] = [[] for _ in range(num_shards)]
+    for unit_index in order:
+        total, shard_index = heapq.heappop(heap)
+        shard_pairs[shard_index].extend(units[unit_index])
+        heapq.heappush(heap, (total + unit_durations[unit_index], shard_index))
+
+    non_empty_shard_pairs = [pairs for pairs in shard_pairs if pairs]
+    return [
+        AlignmentShard(
+            index=index,
+            duration=sum(durations[pair] for pair in pairs),
+            pairs=pairs,
+        )
+        for index, pairs in enumerate(non_empty_shard_pairs)
+    ]
+
+
+def read_wav_duration(wav_path: Path) -> float:
+    """wavファイルのヘッダから音声の長さを秒で返す"""
+    try:
+        with wave.open(str(wav_path), "rb") as f:
+            return f.getnframes() / f.getframerate()
+    except (wave.Error, EOFError) as e:
+        raise ValueError(f"wavファイルの長さを取得できません: {wav_path}") from e
+
+
+def run_shard_worker(shard_dir: Path, stale_claim_seconds: float) -> list[int]:
+    """未処理のシャードがなくなるまで取得してアライメントし、処理したシャード番号を返す。処理中はロックファイルの更新時刻を更新し続ける"""
+    if stale_claim_seconds <= 0:
+        raise ValueError(
+            f"stale_claim_secondsは正である必要があります: {stale_claim_seconds}"
+        )
+    manifest = read_shard_manifest(shard_dir)
+
+    mfa_environment = get_mfa_environment()
+    logger.debug(f"MFA {mfa_environment.version}: {mfa_environment.prefix}")
+    ensure_model_exists("acoustic", ACOUSTIC_MODEL_NAME)
+    ensure_model_exists("dictionary", DICTIONARY_MODEL_NAME)
+    ensure_model_exists("g2p", G2P_MODEL_NAME)
+
+    aligned: list[int] = []
+    for shard in manifest.shards:
+        if is_shard_done(shard_dir, shard.index) or not claim_shard(
+            shard_dir, shard.index, stale_claim_seconds
+        ):
+            continue
+        logger.info(
+            f"シャード{shard.index}をアライメント中: {len(shard.pairs)}ファイル, {shard.duration:.1f}秒"
+        )
+        try:
+            with heartbeat_shard_claim(
+                shard_dir,
+                shard.index,
+                stale_claim_seconds / SHARD_CLAIM_HEARTBEATS_PER_TIMEOUT,
+            ):
+                textgrids = run_alignment(
+                    shard.pairs,
+                    manifest.multi_speaker,
+                    manifest.remove_problematic_chars,
+                )
+                write_shard_result(shard_dir, shard.index, textgrids)
+        except Exception:
+            release_shard_claim(shard_dir, shard.index)
+            raise
+        aligned.append(shard.index)
+    return aligned
+
+
+def collect_shard_textgrids(shard_dir: Path) -> dict[str, str]:
+    """全シャードのTextGridをファイル名ごとに集める。未完了のシャードがあれば例外を投げる"""
+    manifest = read_shard_manifest(shard_dir)
+    pending = [
+        shard.index
+        for shard in manifest.shards
+        if not is_shard_done(shard_dir, shard.index)
+    ]
+    if pending:
+        raise RuntimeError(f"未完了のシャードがあります: {pending}")
+
+    textgrids: dict[str, str] = {}
+    for shard in manifest.shards:
+        result_dir = get_shard_result_dir(shard_dir, shard.index)
+        for textgrid_path in sorted(result_dir.glob("*.TextGrid")):
+            if textgrid_path.stem in textgrids:
+                raise ValueError(f"ファイル名が重複しています: {textgrid_path.stem}")
+            textgrids[textgrid_path.stem] = textgrid_path.read_text(encoding="utf-8")
+    return textgrids
+
+
+def read_shard_manifest(shard_dir: Path) -> ShardManifest:
+    """共有ディレクトリのマニフェストを読む"""
+    manifest_path = shard_dir / SHARD_MANIFEST_FILE_NAME
+    return ShardManifest.model_validate_json(manifest_path.read_text(encoding="utf-8"))
+
+
+def claim_shard(shard_dir: Path, shard_index: int, stale_claim_seconds: float) -> bool:
+    """ロックファイルを排他的に作成してシャードを取得する。他のワーカーが取得済みならFalseを返すが、stale_claim_seconds秒以上更新されていなければ取得し直す"""
+    claim_path = get_shard_claim_path(shard_dir, shard_index)
+    claim_path.parent.mkdir(parents=True, exist_ok=True)
+    if create_shard_claim(claim_path):
+        return True
+    if not remove_stale_shard_claim(claim_path, stale_claim_seconds):
+        return False
+    return create_shard_claim(claim_path)
+
+
+def create_shard_claim(claim_path: Path) -> bool:
+    """ロックファイルを排他的に作成する。既に存在すればFalseを返す"""
+    try:
+        fd = os.open(claim_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(f"{socket.gethostname()}\t{os.getpid()}\n")
+    return True
+
+
+def remove_stale_shard_claim(claim_path: Path, stale_claim_seconds: float) -> bool:
+    """更新の途絶えたロックファイルを削除する。複数のワーカーが同時に削除しようとしても、リネームに成功した1つだけがTrueを返す"""
+    try:
+        age = time.time() - claim_path.stat().st_mtime
+    except FileNotFoundError:
+        return False
+    if age < stale_claim_seconds:
+        return False
+
+    stale_path = claim_path.with_name(
+        f"{claim_path.name}.{socket.gethostname()}.{os.getpid()}.stale"
+    )
+    try:
+        claim_path.rename(stale_path)
+    except FileNotFoundError:
+        return False
+    owner = stale_path.read_text(encoding="utf-8").strip()
+    stale_path.unlink()
+    logger.warning(
+        f"{age:.0f}秒更新されていないロックファイルを削除: {claim_path} ({owner})"
+    )
+    return True
+
+
+@contextmanager
+def heartbeat_shard_claim(
+    shard_dir: Path, shard_index: int, interval: float
+) -> Iterator[None]:
+    """処理中のシャードのロックファイルの更新時刻をinterval秒ごとに更新する"""
+    claim_path = get_shard_claim_path(shard_dir, shard_index)
+    stopped = threading.Event()
+
+    def beat() -> None:
+        while not stopped.wait(interval):
+            try:
+                os.utime(claim_path)
+            except FileNotFoundError:
+                logger.warning(
+                    f"ロックファイルが他のワーカーに削除されました: {claim_path}"
+                )
+                return
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def release_shard_claim(shard_dir: Path, shard_index: int) -> None:
+    """シャードのロックファイルを削除する。他のワーカーに取得し直されて既にない場合は何もしない"""
+    get_shard_claim_path(shard_dir, shard_index).unlink(missing_ok=True)
+
+
+def write_shard_result(
+    shard_dir: Path, shard_index: int, textgrids: dict[str, str]
+) -> None:
+    """一時ディレクトリにTextGridを書き込んでから結果ディレクトリに移動する。ロックを取得し直した別のワーカーが先に完了していれば自分の結果は捨てる"""
+    result_dir = get_shard_result_dir(shard_dir, shard_index)
+    temp_dir = result_dir.with_name(
+        f"{result_dir.name}.{socket.gethostname()}.{os.getpid()}.tmp"
+    )
+    result_dir.parent.mkdir(parents=True, exist_ok=True)
+    write_textgrid_files(textgrids, temp_dir)
+    try:
+        temp_dir.rename(result_dir)
+    except OSError:
+        if not is_shard_done(shard_dir, shard_index):
+            raise
+        logger.warning(f"シャード{shard_index}は他のワーカーが先に完了しました")
+        shutil.rmtree(temp_dir)
+
+
+def is_shard_done(shard_dir: Path, shard_index: int) -> bool:
+    """シャードの結果ディレクトリがあるか判定する"""
+    return get_shard_result_dir(shard_dir, shard_index).is_dir()
+
+
+def get_shard_claim_path(shard_dir: Path, shard_index: int) -> Path:
+    """シャードのロックファイルのパスを返す"""
+    return shard_dir / SHARD_CLAIM_DIR_NAME / f"{shard_index}.lock"
+
+
+def get_shard_result_dir(shard_dir: Path, shard_index: int) -> Path:
+    """シャードの結果ディレクトリのパスを返す"""
+    return shard_dir / SHARD_RESULT_DIR_NAME / str(shard_index)
+
+
+if __name__ == "__main__":
+    app()
@@ -1,58 +1,168 @@
-"""symbol_mapping.jsonの読み込みと解釈を行う関数群"""
+"""
+symbol_mapping.jsonを読み込み、音素IDを使ったマッピングにコンパイルする関数群。
 
+Usage:
+    PYTHONPATH=. uv run python tools/symbol_loader.py
+"""
+
+import hashlib
 import json
+import pickle
+import threading
 from pathlib import Path
-from typing import Any
+from typing import Annotated, Any
+
+import typer
+from pydantic import BaseModel
 
-from utility.logger_utility import get_logger
+from utility.logger_utility import get_logger, logging_setting
 
 logger = get_logger(Path(__file__))
 
+SYMBOL_MAPPING_PATH = Path(__file__).parent / "symbol_mapping.json"
+COMPILED_SYMBOL_MAPPING_PATH = Path(__file__).parent / "symbol_mapping.pickle"
+
+
+class CompiledSymbolMapping(BaseModel, frozen=True):
+    """音素を整数IDに置き換えたsymbol_mapping.jsonのマッピング。festival側の複合音素は末尾から辿るトライ木、phonemizer側の複合音素はタプルで持つ"""
+
+    source_hash: str
+    festival_ids: dict[str, int]
+    phonemizer_ids: dict[str, int]
+    single: dict[int, frozenset[int]]
+    compound_children: tuple[dict[int, int], ...]
+    compound_phonemizer_ids: tuple[frozenset[int], ...]
+    reverse_compound: dict[int, tuple[tuple[int, ...], ...]]
+
+
+def main(
+    verbose: Annotated[
+        bool, typer.Option(help="詳細なデバッグ出力をstderrに出す")
+    ] = False,
+) -> None:
+    """symbol_mapping.jsonをコンパイルしてバイナリファイルに保存する"""
+    logging_setting(verbose)
+    mapping = compile_symbol_mapping_file(SYMBOL_MAPPING_PATH)
+    save_compiled_symbol_mapping(mapping, COMPILED_SYMBOL_MAPPING_PATH)
+    logger.info(f"コンパイル済みマッピングを保存: {COMPILED_SYMBOL_MAPPING_PATH}")
+
 
-def load_symbol_mapping() -> dict[str, Any]:
-    """symbol_mapping.jsonを読み込み、マッピング辞書を構築する"""
-    mapping_path = Path(__file__).parent / "symbol_mapping.json"
-    with mapping_path.open("r", encoding="utf-8") as f:
+def get_compiled_symbol_mapping() -> CompiledSymbolMapping:
+    """プロセスごとに1度だけマッピングを用意して返す。最新のコンパイル済みファイルがあればそれを読み込む"""
+    global compiled_symbol_mapping
+    with compiled_symbol_mapping_lock:
+        if compiled_symbol_mapping is None:
+            compiled_symbol_mapping = load_or_compile_symbol_mapping(
+                SYMBOL_MAPPING_PATH, COMPILED_SYMBOL_MAPPING_PATH
+            )
+        return compiled_symbol_mapping
+
+
+def load_or_compile_symbol_mapping(
+    source_path: Path, compiled_path: Path
+) -> CompiledSymbolMapping:
+    """コンパイル済みファイルが元のjsonと一致すれば読み込み、そうでなければjsonからコンパイルする"""
+    if compiled_path.exists():
+        mapping = load_compiled_symbol_mapping(compiled_path)
+        if mapping.source_hash == hash_file(source_path):
+            return mapping
+        logger.warning(
+            f"コンパイル済みマッピングが古いためjsonからコンパイルします: {compiled_path}"
+        )
+    return compile_symbol_mapping_file(source_path)
+
+
+def compile_symbol_mapping_file(source_path: Path) -> CompiledSymbolMapping:
+    """symbol_mapping.jsonを読み込んでコンパイルする"""
+    with source_path.open("r", encoding="utf-8") as f:
         mapping_data = json.load(f)
+    return compile_symbol_mapping(mapping_data, hash_file(source_path))
 
-    single_mapping: dict[str, set[str]] = {}
-    compound_mapping: dict[str, dict[str, Any]] = {}
-    reverse_compound_mapping: dict[str, set[tuple[str, ...]]] = {}
+
+def compile_symbol_mapping(
+    mapping_data: list[dict[str, Any]], source_hash: str
+) -> CompiledSymbolMapping:
+    """マッピングのエントリ列を音素IDを使ったマッピングにコンパイルする"""
+    festival_ids: dict[str, int] = {}
+    phonemizer_ids: dict[str, int] = {}
+    single: dict[int, set[int]] = {}
+    compound_children: list[dict[int, int]] = [{}]
+    compound_phonemizer_ids: list[set[int]] = [set()]
+    reverse_compound: dict[int, dict[tuple[int, ...], None]] = {}
 
     for entry in mapping_data:
-        festival_phonemes = entry["festival"]
-        phonemizer_phonemes = entry["phonemizer"]
-
-        if len(festival_phonemes) == 1 and len(phonemizer_phonemes) == 1:
-            f_ph = festival_phonemes[0]
-            p_ph = phonemizer_phonemes[0]
-            if f_ph not in single_mapping:
-                single_mapping[f_ph] = set()
-            single_mapping[f_ph].add(p_ph)
-
-        elif len(festival_phonemes) > 1:
-            f_key = "_".join(festival_phonemes)
-            if f_key not in compound_mapping:
-                compound_mapping[f_key] = {
-                    "phonemes": set(),
-                    "original": festival_phonemes,
-                }
-
-            if len(phonemizer_phonemes) == 1:
-                compound_mapping[f_key]["phonemes"].add(phonemizer_phonemes[0])
-            else:
-                compound_mapping[f_key]["phonemes"].add("_".join(phonemizer_phonemes))
-
-        elif len(phonemizer_phonemes) > 1:
-            p_phs = tuple(phonemizer_phonemes)
-            f_ph = festival_phonemes[0]
-
-            if f_ph not in reverse_compound_mapping:
-                reverse_compound_mapping[f_ph] = set()
-            reverse_compound_mapping[f_ph].add(p_phs)
-
-    return {
-        "single": single_mapping,
-        "compound": compound_mapping,
-        "reverse_compound": reverse_compound_mapping,
-    }
+        f_ids = [get_or_add_id(festival_ids, ph) for ph in entry["festival"]]
+        p_ids = [get_or_add_id(phonemizer_ids, ph) for ph in entry["phonemizer"]]
+
+        if len(f_ids) == 1 and len(p_ids) == 1:
+            single.setdefault(f_ids[0], set()).add(p_ids[0])
+
+        elif len(f_ids) > 1 and len(p_ids) == 1:
+            node = 0
+            for f_id in reversed(f_ids):
+                if f_id not in compound_children[node]:
+                    compound_children[node][f_id] = len(compound_children)
+                    compound_children.append({})
+                    compound_phonemizer_ids.append(set())
+                node = compound_children[node][f_id]
+            compound_phonemizer_ids[node].add(p_ids[0])
+
+        elif len(f_ids) == 1 and len(p_ids) > 1:
+            reverse_compound.setdefault(f_ids[0], {})[tuple(p_ids)] = None
+
+        else:
+            raise ValueError(f"未対応のマッピングです: {entry}")
+
+    return CompiledSymbolMapping(
+        source_hash=source_hash,
+        festival_ids=festival_ids,
+        phonemizer_ids=phonemizer_ids,
+        single={f_id: frozenset(p_ids) for f_id, p_ids in single.items()},
+        compound_children=tuple(compound_children),
+        compound_phonemizer_ids=tuple(
+            frozenset(p_ids) for p_ids in compound_phonemizer_ids
+        ),
+        reverse_compound={
+            f_id: tuple(compounds) for f_id, compounds in reverse_compound.items()
+        },
+    )
+
+
+def get_or_add_id(ids: dict[str, int], phoneme: str) -> int:
+    """音素のIDを返す。未登録なら新しいIDを割り当てる"""
+    if phoneme not in ids:
+        ids[phoneme] = len(ids)
+    return ids[phoneme]
+
+
+def encode_phonemes(phonemes: list[str], ids: dict[str, int]) -> list[int]:
+    """音素列をID列に変換する。マッピングにない音素はどの音素とも対応しない個別のIDにする"""
+    return [ids.get(ph, len(ids) + i) for i, ph in enumerate(phonemes)]
+
+
+def save_compiled_symbol_mapping(mapping: CompiledSymbolMapping, path: Path) -> None:
+    """コンパイル済みマッピングをバイナリファイルに保存する"""
+    with path.open("wb") as f:
+        pickle.dump(mapping, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_compiled_symbol_mapping(path: Path) -> CompiledSymbolMapping:
+    """コンパイル済みマッピングをバイナリファイルから読み込む"""
+    with path.open("rb") as f:
+        mapping = pickle.load(f)
+    if not isinstance(mapping, CompiledSymbolMapping):
+        raise ValueError(f"コンパイル済みマッピングではありません: {path}")
+    return mapping
+
+
+def hash_file(path: Path) -> str:
+    """ファイル内容のSHA-256を返す"""
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+compiled_symbol_mapping: CompiledSymbolMapping | None = None
+compiled_symbol_mapping_lock = threading.Lock()
+
+
+if __name__ == "__main__":
+    typer.run(main)
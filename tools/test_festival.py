@@ -1,6 +1,25 @@
+import subprocess
+import time
+
 import pytest
 
-from tools.process_festival import PhonemeInfo, festival
+from tools.festival_word_cache import TaggedWord
+from tools.festival_worker import (
+    FestivalCrashError,
+    FestivalOutputReader,
+    send_script,
+)
+from tools.process_festival import (
+    PhonemeInfo,
+    assemble_phoneme_infos,
+    collect_cacheable_syllables,
+    configure_festival,
+    default_festival_setting,
+    extract_table,
+    festival,
+    festival_batch,
+    iter_sexp_trees,
+)
 
 
 @pytest.mark.parametrize(
@@ -89,3 +108,154 @@ def test_festival_param(
 
     syllable_indexes = [x.syllable_index for x in result]
     assert syllable_indexes == expected_syllable_indexes
+
+
+def test_festival_batch_matches_festival():
+    """festival_batchの結果がテキストごとのfestivalの結果と一致することを確認"""
+    texts = ["internationalization", "hello, world!", 'He said "yes".']
+    assert festival_batch(texts) == [festival(text) for text in texts]
+
+
+def test_festival_analysis_mode_matches_synthesis_mode():
+    """波形合成を省いたanalysisモードの結果がsynthesisモードと一致することを確認"""
+    texts = ["internationalization", "hello, world!", "I read the book you read."]
+    setting = default_festival_setting()
+    try:
+        configure_festival(setting.model_copy(update={"mode": "synthesis"}))
+        expected = festival_batch(texts)
+        configure_festival(setting.model_copy(update={"mode": "analysis"}))
+        assert festival_batch(texts) == expected
+    finally:
+        configure_festival(setting)
+
+
+@pytest.mark.parametrize("mode", ["synthesis", "analysis"])
+def test_festival_table_format_matches_tree_format(mode):
+    """table形式の出力から得た結果がtree形式の結果と一致することを確認"""
+    texts = ["internationalization", "hello, world!", "I read the book you read."]
+    setting = default_festival_setting().model_copy(update={"mode": mode})
+    try:
+        configure_festival(setting.model_copy(update={"output_format": "tree"}))
+        expected = festival_batch(texts)
+        configure_festival(setting.model_copy(update={"output_format": "table"}))
+        assert festival_batch(texts) == expected
+    finally:
+        configure_festival(default_festival_setting())
+
+
+def test_extract_table():
+    """音素レコード行以外を無視してPhonemeInfoリストに変換することを確認"""
+    output = "\n".join(
+        [
+            "nil",
+            "__festival_phoneme__ 0 0 0 hh hello",
+            "__festival_phoneme__ 0 0 0 ax hello",
+            "__festival_phoneme__ 0 1 1 l hello",
+            "__festival_phoneme__ 0 1 1 ow hello",
+            "__festival_phoneme__ 1 2 0 , ,",
+        ]
+    )
+    result = extract_table(output)
+    assert [x.phoneme for x in result] == ["hh", "ax", "l", "ow", ","]
+    assert [x.word for x in result] == ["hello"] * 4 + [","]
+    assert [x.word_index for x in result] == [0, 0, 0, 0, 1]
+    assert [x.syllable_index for x in result] == [0, 0, 1, 1, 2]
+    assert [x.stress for x in result] == [0, 0, 1, 1, 0]
+    assert [x.phoneme_index for x in result] == list(range(5))
+
+
+def test_iter_sexp_trees():
+    """複数のS式を含むFestival出力をS式ごとのPhonemeInfoリストに変換することを確認"""
+    tree = """((("hello" ((id "_1") (name "hello") (pos "uh")))
+  (("syl" ((id "_3") (name "syl") (stress 0)))
+   (("hh" ((id "_4") (name "hh"))))
+   (("ax" ((id "_5") (name "ax")))))
+  (("syl" ((id "_6") (name "syl") (stress 1)))
+   (("l" ((id "_7") (name "l"))))
+   (("ow" ((id "_8") (name "ow"))))))
+ (("," ((id "_2") (name ",")))))"""
+    result = list(iter_sexp_trees(f"nil\n{tree}\n(nil)\n{tree}\n"))
+    assert len(result) == 2
+    assert result[0] == result[1]
+    assert [x.phoneme for x in result[0]] == ["hh", "ax", "l", "ow", ","]
+    assert [x.word for x in result[0]] == ["hello"] * 4 + [","]
+    assert [x.word_index for x in result[0]] == [0, 0, 0, 0, 1]
+    assert [x.syllable_index for x in result[0]] == [0, 0, 1, 1, 2]
+    assert [x.stress for x in result[0]] == [0, 0, 1, 1, 0]
+    assert [x.phoneme_index for x in result[0]] == list(range(5))
+
+
+def test_word_cache_roundtrip():
+    """単語ごとのシラブル列にまとめた結果から元のPhonemeInfoリストを組み立て直せることを確認"""
+    infos = extract_table(
+        "\n".join(
+            [
+                "__festival_phoneme__ 0 0 0 hh hello",
+                "__festival_phoneme__ 0 0 0 ax hello",
+                "__festival_phoneme__ 0 1 1 l hello",
+                "__festival_phoneme__ 0 1 1 ow hello",
+                "__festival_phoneme__ 1 2 0 , ,",
+                "__festival_phoneme__ 2 3 1 w world",
+                "__festival_phoneme__ 2 3 1 er world",
+            ]
+        )
+    )
+    words = [
+        TaggedWord(word="hello", pos="uh"),
+        TaggedWord(word=",", pos="punc"),
+        TaggedWord(word="world", pos="nn"),
+    ]
+    cached = collect_cacheable_syllables(words, infos)
+    assert assemble_phoneme_infos(words, cached) == infos
+
+
+def test_festival_word_cache_matches_uncached(tmp_path):
+    """単語キャッシュを使った結果がキャッシュなしの結果と一致することを確認"""
+    texts = ["hello, world!", "hello world.", "I read the book you read."]
+    setting = default_festival_setting()
+    try:
+        configure_festival(setting)
+        expected = festival_batch(texts)
+        configure_festival(
+            setting.model_copy(update={"word_cache_path": tmp_path / "cache.sqlite3"})
+        )
+        assert festival_batch(texts) == expected
+        assert festival_batch(texts) == expected
+    finally:
+        configure_festival(setting)
+
+
+def test_send_script_times_out_without_response():
+    """応答しないプロセスへの送信が期限でFestivalCrashErrorになることを確認"""
+    process = subprocess.Popen(
+        ["sleep", "10"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+        encoding="utf-8",
+    )
+    reader = FestivalOutputReader(process)
+    try:
+        with pytest.raises(FestivalCrashError):
+            send_script(process, reader, "(print 1)", 0.2)
+    finally:
+        reader.close()
+        process.kill()
+        process.wait()
+
+
+def test_festival_output_reader_reads_lines_until_eof():
+    """改行ごとに1行ずつ返し、終了後は残りと空文字列を返すことを確認"""
+    process = subprocess.Popen(
+        ["printf", "a\\nbc\\nd"],
+        stdout=subprocess.PIPE,
+        text=True,
+        encoding="utf-8",
+    )
+    reader = FestivalOutputReader(process)
+    try:
+        deadline = time.monotonic() + 10
+        assert [reader.readline(deadline) for _ in range(4)] == ["a\n", "bc\n", "d", ""]
+    finally:
+        reader.close()
+        process.wait()
@@ -1,6 +1,28 @@
 import pytest
 
-from tools.match_phonemes import match_phonemes
+from tools.alignment_cache import AlignmentFailure, AlignmentSuccess
+from tools.match_phonemes import (
+    configure_match_phonemes,
+    default_match_phonemes_setting,
+    get_alignment_cache,
+    match_phonemes,
+)
+from tools.phoneme_matcher import (
+    align_phonemes,
+    align_phonemes_band,
+    align_phonemes_batch,
+    align_phonemes_dp,
+    align_phonemes_dp_result,
+    get_alignment_path_stats,
+)
+from tools.symbol_loader import (
+    SYMBOL_MAPPING_PATH,
+    compile_symbol_mapping_file,
+    encode_phonemes,
+    get_compiled_symbol_mapping,
+    load_or_compile_symbol_mapping,
+    save_compiled_symbol_mapping,
+)
 
 
 @pytest.mark.parametrize(
@@ -52,3 +74,109 @@ def test_match_phonemes_empty_input():
     """空の入力の場合は空のリストを返すことを確認"""
     result = match_phonemes([], [])
     assert result == []
+
+
+def test_compiled_symbol_mapping_roundtrip(tmp_path):
+    """コンパイル済みマッピングを保存・読み込みしても同じマッピングになることを確認"""
+    mapping = compile_symbol_mapping_file(SYMBOL_MAPPING_PATH)
+    compiled_path = tmp_path / "symbol_mapping.pickle"
+    save_compiled_symbol_mapping(mapping, compiled_path)
+    loaded = load_or_compile_symbol_mapping(SYMBOL_MAPPING_PATH, compiled_path)
+    assert loaded == mapping
+
+
+@pytest.mark.parametrize("persisted", [False, True])
+def test_match_phonemes_cache(tmp_path, persisted):
+    """キャッシュ済みの成功・失敗結果が再計算した結果と一致し、ヒットとして数えられることを確認"""
+    setting = default_match_phonemes_setting()
+    cache_path = tmp_path / "alignment.sqlite3" if persisted else None
+    try:
+        configure_match_phonemes(setting.model_copy(update={"cache_path": cache_path}))
+        expected = match_phonemes(["b", "er", "t"], ["b", "ʌ", "ɹ", "t"])
+        with pytest.raises(ValueError):
+            match_phonemes(["k", "ae", "t"], ["d", "ɔ", "ɡ"])
+        if persisted:
+            configure_match_phonemes(
+                setting.model_copy(update={"cache_path": cache_path})
+            )
+        assert match_phonemes(["b", "er", "t"], ["b", "ʌ", "ɹ", "t"]) == expected
+        with pytest.raises(ValueError):
+            match_phonemes(["k", "ae", "t"], ["d", "ɔ", "ɡ"])
+        stats = get_alignment_cache().stats()
+        assert stats.hits == 2
+    finally:
+        configure_match_phonemes(setting)
+
+
+def test_align_phonemes_batch_matches_align_phonemes():
+    """ベクトル化されるほど同じ長さのペアを含むバッチの結果が1ペアずつの結果と一致することを確認"""
+    pairs = [
+        (["b", "aa", "t"], ["b", "ɑː", "t"]),
+        (["b", "er", "t"], ["b", "ʌ", "ɹ", "t"]),
+        (["b", "aa", "r", "t"], ["b", "ɑːɹ", "t"]),
+        (["b", "aa", "r", "er", "t"], ["b", "ɑːɹ", "ʌ", "ɹ", "t"]),
+        (["a", "b", "c"], ["a", "b", "c"]),
+    ] * 2
+    pairs += [
+        ([festival, "aa", "t"], [phonemizer, "ɑː", "t"])
+        for festival in ["b", "t", "d", "x"]
+        for phonemizer in ["b", "t", "d", "q"]
+    ]
+    mapping = get_compiled_symbol_mapping()
+    expected = [
+        align_phonemes_dp_result(festival, phonemizer, mapping)
+        for festival, phonemizer in pairs
+    ]
+    assert align_phonemes_batch(pairs, mapping) == expected
+
+
+@pytest.mark.parametrize(
+    "festival_phonemes, phonemizer_phonemes, expected_path",
+    [
+        pytest.param(["b", "aa", "t"], ["b", "ɑː", "t"], "greedy", id="greedy"),
+        pytest.param(["iy", "ax", "uw"], ["iə", "ʊ"], "dp", id="ambiguous"),
+        pytest.param(["a", "b", "c"], ["a", "b", "c"], "dp", id="unmatched"),
+    ],
+)
+def test_align_phonemes_path(festival_phonemes, phonemizer_phonemes, expected_path):
+    """貪欲法で覆えるペアは貪欲法で、それ以外は動的計画法で解かれ、結果が動的計画法と一致することを確認"""
+    mapping = get_compiled_symbol_mapping()
+    before = get_alignment_path_stats()
+    try:
+        result = AlignmentSuccess(
+            pairs=tuple(align_phonemes(festival_phonemes, phonemizer_phonemes, mapping))
+        )
+    except ValueError as e:
+        result = AlignmentFailure(message=str(e))
+    after = get_alignment_path_stats()
+    assert result == align_phonemes_dp_result(
+        festival_phonemes, phonemizer_phonemes, mapping
+    )
+    assert getattr(after, expected_path) == getattr(before, expected_path) + 1
+
+
+def test_align_phonemes_dp_banded_matches_full():
+    """帯状に計算した長い音素列のアライメントが全セルを計算した結果と一致することを確認"""
+    festival_phonemes = ["b", "aa", "r", "er", "t", "ax", "l", "iy"] * 6
+    phonemizer_phonemes = ["b", "ɑːɹ", "ʌ", "ɹ", "t", "əl", "iː"] * 6
+    mapping = get_compiled_symbol_mapping()
+    festival_ids = encode_phonemes(festival_phonemes, mapping.festival_ids)
+    phonemizer_ids = encode_phonemes(phonemizer_phonemes, mapping.phonemizer_ids)
+    expected = align_phonemes_band(
+        festival_phonemes,
+        phonemizer_phonemes,
+        festival_ids,
+        phonemizer_ids,
+        mapping,
+        len(festival_phonemes),
+    )
+    assert (
+        align_phonemes_dp(
+            festival_phonemes,
+            phonemizer_phonemes,
+            festival_ids,
+            phonemizer_ids,
+            mapping,
+        )
+        == expected
+    )
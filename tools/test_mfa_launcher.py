@@ -0,0 +1,29 @@
+import json
+
+from tools.mfa_launcher import build_mfa_environ, resolve_mfa_environment
+from utility.sqlite_cache_utility import SqliteLruCache
+
+
+def test_resolve_mfa_environment_uses_cached_prefix(tmp_path):
+    """キャッシュ済みの環境パスからcondaを呼ばずにmfa環境を解決できることを確認"""
+    prefix = tmp_path / "envs" / "mfa"
+    (prefix / "bin").mkdir(parents=True)
+    (prefix / "bin" / "mfa").write_text("")
+    (prefix / "conda-meta").mkdir()
+    (
+        prefix / "conda-meta" / "montreal-forced-aligner-3.2.1-pyhd8ed1ab_0.json"
+    ).write_text(json.dumps({"name": "montreal-forced-aligner", "version": "3.2.1"}))
+    cache = SqliteLruCache(tmp_path / "cache.sqlite3", 10)
+    try:
+        cache.put_many({"prefix\tmfa": str(prefix)})
+        environment = resolve_mfa_environment("mfa", cache)
+    finally:
+        cache.close()
+    assert environment.prefix == prefix
+    assert environment.executable == prefix / "bin" / "mfa"
+    assert environment.version == "3.2.1"
+
+    environ = build_mfa_environ(environment, {"PATH": "/usr/bin", "HOME": "/home"})
+    assert environ["PATH"].split(":")[0] == str(prefix / "bin")
+    assert environ["CONDA_PREFIX"] == str(prefix)
+    assert environ["HOME"] == "/home"
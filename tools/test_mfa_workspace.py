@@ -0,0 +1,86 @@
+import os
+import time
+
+from tools.mfa_workspace import (
+    MfaWorkspaceState,
+    build_dictionary_entries,
+    collect_workspace_garbage,
+    find_changed_corpus_files,
+    lock_workspace,
+    read_workspace_state,
+    should_clean_workspace,
+    write_workspace_state,
+)
+
+
+def test_should_clean_workspace(tmp_path):
+    """on_changeでは前回配置したファイルが変更・削除されたか既存の単語の発音が変わったときだけcleanし、ファイルや単語の追加だけならcleanしないことを確認"""
+    workspace_dir = tmp_path / "workspace"
+    workspace_dir.mkdir()
+    dictionary_entries = {"hello": "1", "world": "2"}
+    assert read_workspace_state(workspace_dir) is None
+    assert should_clean_workspace(None, "on_change", [], dictionary_entries)
+
+    write_workspace_state(workspace_dir, {"a.txt": "a"}, dictionary_entries)
+    state = read_workspace_state(workspace_dir)
+    assert not should_clean_workspace(state, "on_change", [], dictionary_entries)
+    assert not should_clean_workspace(
+        state, "on_change", [], {**dictionary_entries, "again": "3"}
+    )
+    assert should_clean_workspace(state, "on_change", ["a.txt"], dictionary_entries)
+    assert should_clean_workspace(
+        state, "on_change", [], {**dictionary_entries, "world": "3"}
+    )
+    assert should_clean_workspace(state, "on_change", [], {"hello": "1"})
+    assert should_clean_workspace(state, "always", [], dictionary_entries)
+
+
+def test_find_changed_corpus_files():
+    """前回配置したファイルのうちコーパスから削除されたものと配置し直すものだけを返すことを確認"""
+    previous_files = {"a.txt": "a", "b.txt": "b", "c.txt": "c"}
+    corpus_files = {"a.txt": "a", "b.txt": "b2", "d.txt": "d"}
+    staged_files = {"b.txt": "b2", "d.txt": "d"}
+    assert find_changed_corpus_files(previous_files, corpus_files, staged_files) == [
+        "b.txt",
+        "c.txt",
+    ]
+
+
+def test_build_dictionary_entries(tmp_path):
+    """単語ごとに全ての発音からハッシュを作ることを確認"""
+    dictionary_path = tmp_path / "dictionary.txt"
+    dictionary_path.write_text("read\tR EH1 D\nread\tR IY1 D\nhello\tHH AH0 L OW1\n")
+    entries = build_dictionary_entries(dictionary_path)
+    dictionary_path.write_text("read\tR EH1 D\nhello\tHH AH0 L OW1\n")
+    changed = build_dictionary_entries(dictionary_path)
+    assert entries["hello"] == changed["hello"]
+    assert entries["read"] != changed["read"]
+
+
+def test_collect_workspace_garbage(tmp_path):
+    """ハードリンクの音声を除いてサイズを数え、古い作業ディレクトリと上限を超えた分を削除し、使用中のものは残すことを確認"""
+    source_wav = tmp_path / "source.wav"
+    source_wav.write_bytes(b"\0" * 1000)
+    workspace_root = tmp_path / "workspaces"
+    for name, size in [("old", 10), ("large", 300), ("recent", 100), ("locked", 10)]:
+        workspace_dir = workspace_root / name
+        workspace_dir.mkdir(parents=True)
+        (workspace_dir / "features.bin").write_bytes(b"\0" * size)
+        os.link(source_wav, workspace_dir / "audio.wav")
+        state = write_workspace_state(workspace_dir, {}, {})
+        assert state.size_bytes == size
+        time.sleep(0.01)
+
+    old_state_path = workspace_root / "old" / "state.json"
+    old_state = MfaWorkspaceState.model_validate_json(old_state_path.read_text())
+    old_state_path.write_text(
+        old_state.model_copy(update={"last_used": time.time() - 100}).model_dump_json()
+    )
+
+    with lock_workspace(workspace_root / "locked"):
+        removed = collect_workspace_garbage(workspace_root, 250, 50)
+    assert sorted(path.name for path in removed) == ["large", "old"]
+    assert sorted(path.name for path in workspace_root.iterdir()) == [
+        "locked",
+        "recent",
+    ]
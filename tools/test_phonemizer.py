@@ -1,6 +1,13 @@
 import pytest
 
-from tools.process_phonemizer import PhonemeInfo, phonemizer_espeak
+from tools.process_phonemizer import (
+    PhonemeInfo,
+    configure_phonemizer,
+    default_phonemizer_setting,
+    get_phonemizer_word_cache,
+    phonemizer_espeak,
+    phonemizer_espeak_batch,
+)
 
 
 @pytest.mark.parametrize(
@@ -83,3 +90,29 @@ def test_phonemizer_param(
 
     phoneme_indexes = [x.phoneme_index for x in result]
     assert phoneme_indexes == expected_phoneme_indexes
+
+
+def test_phonemizer_espeak_batch_matches_phonemizer_espeak():
+    """重複する単語を含む複数テキストのバッチ結果が1テキストずつの結果と一致することを確認"""
+    texts = ["hello, world!", "world hello", "internationalization", "", "hello"]
+    result = phonemizer_espeak_batch(texts, 1)
+    assert result == [phonemizer_espeak(text) for text in texts]
+
+
+def test_phonemizer_word_cache_matches_uncached(tmp_path):
+    """単語キャッシュを使った結果がキャッシュなしの結果と一致し、2回目はespeakを使わないことを確認"""
+    texts = ["hello, world!", "world hello", "internationalization"]
+    setting = default_phonemizer_setting()
+    try:
+        configure_phonemizer(setting)
+        expected = phonemizer_espeak_batch(texts, 1)
+        configure_phonemizer(
+            setting.model_copy(update={"word_cache_path": tmp_path / "cache.sqlite3"})
+        )
+        assert phonemizer_espeak_batch(texts, 1) == expected
+        assert phonemizer_espeak_batch(texts, 1) == expected
+        stats = get_phonemizer_word_cache().stats()
+        assert stats.entries == 5
+        assert stats.hits == 5
+    finally:
+        configure_phonemizer(setting)
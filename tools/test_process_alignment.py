@@ -1,9 +1,21 @@
+import errno
+import os
 import tempfile
 from pathlib import Path
 
+import pytest
 from syrupy.assertion import SnapshotAssertion
 
-from tools.process_alignment import alignment
+from tools import process_alignment
+from tools.alignment_manifest import AlignmentManifest, AlignmentPair
+from tools.mfa_runner import prepare_corpus_dir, stage_audio_file
+from tools.process_alignment import (
+    alignment,
+    configure_process_alignment,
+    default_process_alignment_setting,
+    get_alignment_manifest,
+    run_incremental_alignment,
+)
 
 
 # TODO: multi_speaker=Trueのテストを追加する
@@ -13,6 +25,217 @@ def test_alignment_with_real_data(snapshot: SnapshotAssertion):
     wav_glob = "tools/data/*.wav"
     with tempfile.TemporaryDirectory() as temp_dir:
         result = alignment(
-            text_glob, wav_glob, multi_speaker=False, output_textgrid_dir=Path(temp_dir)
+            text_glob,
+            wav_glob,
+            multi_speaker=False,
+            output_textgrid_dir=Path(temp_dir),
+            remove_problematic_chars=False,
         )
         assert result == snapshot
+
+
+def test_alignment_with_manifest_matches_full_alignment(tmp_path):
+    """マニフェストを使った2回目のアライメントがMFAを実行せず同じ結果を返すことを確認"""
+    text_glob = "tools/data/*.txt"
+    wav_glob = "tools/data/*.wav"
+    setting = default_process_alignment_setting()
+    try:
+        configure_process_alignment(setting)
+        expected = alignment(text_glob, wav_glob, False, None, False)
+        configure_process_alignment(
+            setting.model_copy(update={"manifest_path": tmp_path / "manifest.sqlite3"})
+        )
+        assert alignment(text_glob, wav_glob, False, None, False) == expected
+        assert alignment(text_glob, wav_glob, False, None, False) == expected
+        assert get_alignment_manifest().stats().hits > 0
+    finally:
+        configure_process_alignment(setting)
+
+
+def test_alignment_manifest_keys(tmp_path):
+    """内容が同じファイルは同じキーになり、内容を変えるとキーが変わることを確認"""
+    for name in ["a", "b"]:
+        (tmp_path / f"{name}.txt").write_text("hello world", encoding="utf-8")
+        (tmp_path / f"{name}.wav").write_bytes(b"RIFF")
+    pairs = [
+        AlignmentPair(
+            text_path=tmp_path / f"{name}.txt",
+            wav_path=tmp_path / f"{name}.wav",
+            speaker_id="speaker",
+        )
+        for name in ["a", "b"]
+    ]
+    manifest = AlignmentManifest(tmp_path / "manifest.sqlite3", 100, 100, "fingerprint")
+    try:
+        keys = manifest.build_keys(pairs, False, False)
+        assert keys[pairs[0]] == keys[pairs[1]]
+        assert manifest.build_keys(pairs, False, True)[pairs[0]] != keys[pairs[0]]
+
+        (tmp_path / "b.wav").write_bytes(b"RIFF0")
+        changed = manifest.build_keys(pairs, False, False)
+        assert changed[pairs[0]] == keys[pairs[0]]
+        assert changed[pairs[1]] != keys[pairs[1]]
+    finally:
+        manifest.close()
+
+
+def test_alignment_manifest_hashes_do_not_evict_textgrids(tmp_path):
+    """ファイルのハッシュをいくら保存してもTextGridが上限件数まで残ることを確認"""
+    pairs = []
+    for i in range(5):
+        (tmp_path / f"{i}.txt").write_text(f"hello {i}", encoding="utf-8")
+        (tmp_path / f"{i}.wav").write_bytes(b"RIFF")
+        pairs.append(
+            AlignmentPair(
+                text_path=tmp_path / f"{i}.txt",
+                wav_path=tmp_path / f"{i}.wav",
+                speaker_id="speaker",
+            )
+        )
+    manifest = AlignmentManifest(tmp_path / "manifest.sqlite3", 2, 3, "fingerprint")
+    try:
+        keys = manifest.build_keys(pairs[:2], False, False)
+        manifest.put_many({keys[pair]: "textgrid" for pair in pairs[:2]})
+        manifest.build_keys(pairs, False, False)
+        assert len(manifest.get_many(list(keys.values()))) == 2
+        assert manifest.hash_store.stats().entries == 3
+    finally:
+        manifest.close()
+
+
+@pytest.mark.parametrize("audio_staging_mode", ["hardlink", "symlink", "copy"])
+def test_prepare_corpus_dir(tmp_path, audio_staging_mode):
+    """テキストは前処理して書き込み、音声は指定した方法で配置することを確認"""
+    source_dir = tmp_path / "source"
+    source_dir.mkdir()
+    text_path = source_dir / "a.txt"
+    wav_path = source_dir / "a.wav"
+    text_path.write_text("hello [world] (a) {b}", encoding="utf-8")
+    wav_path.write_bytes(b"RIFF")
+
+    corpus_dir = tmp_path / "corpus"
+    prepare_corpus_dir([text_path], [wav_path], corpus_dir, True, audio_staging_mode)
+
+    assert (corpus_dir / "a.txt").read_text(encoding="utf-8") == "hello world a b"
+    assert (corpus_dir / "a.wav").read_bytes() == b"RIFF"
+    assert (corpus_dir / "a.wav").is_symlink() == (audio_staging_mode == "symlink")
+    assert ((corpus_dir / "a.wav").stat().st_ino == wav_path.stat().st_ino) == (
+        audio_staging_mode != "copy"
+    )
+
+
+def test_stage_audio_file_copies_when_hardlink_fails(tmp_path, monkeypatch):
+    """ハードリンクを作れない場合はエラーの種類によらずコピーすることを確認"""
+    source_path = tmp_path / "a.wav"
+    source_path.write_bytes(b"RIFF")
+
+    def deny_link(source: Path, destination: Path) -> None:
+        raise PermissionError(errno.EPERM, "Operation not permitted")
+
+    monkeypatch.setattr(os, "link", deny_link)
+    stage_audio_file(source_path, tmp_path / "b.wav", "hardlink")
+    assert (tmp_path / "b.wav").read_bytes() == b"RIFF"
+    assert (tmp_path / "b.wav").stat().st_ino != source_path.stat().st_ino
+
+
+def test_workspace_alignment_reuses_workspace_on_rerun(tmp_path, monkeypatch):
+    """マニフェストと作業ディレクトリを使うと、新規のペアだけを作業ディレクトリに追加して--no_cleanでアライメントし、変更・削除ではcleanすることを確認"""
+    corpus_dir = tmp_path / "corpus"
+    corpus_dir.mkdir()
+    for name in ["a", "b", "c", "d"]:
+        (corpus_dir / f"{name}.txt").write_text(f"hello {name}", encoding="utf-8")
+        (corpus_dir / f"{name}.wav").write_bytes(b"RIFF")
+    pairs = {
+        name: AlignmentPair(
+            text_path=corpus_dir / f"{name}.txt",
+            wav_path=corpus_dir / f"{name}.wav",
+            speaker_id="corpus",
+        )
+        for name in ["a", "b", "c", "d"]
+    }
+
+    def fake_run_mfa_g2p(
+        corpus_dir_or_word_list_path: Path,
+        g2p_model_name: str,
+        output_dictionary_path: Path,
+    ) -> str:
+        words = sorted(
+            {
+                word
+                for text_path in corpus_dir_or_word_list_path.glob("*.txt")
+                for word in text_path.read_text(encoding="utf-8").split()
+            }
+        )
+        output_dictionary_path.write_text(
+            "".join(f"{word}\t{word.upper()}\n" for word in words), encoding="utf-8"
+        )
+        return ""
+
+    aligned_runs: list[tuple[bool, list[str]]] = []
+
+    def fake_run_mfa_align(
+        corpus_dir: Path,
+        dictionary_path_or_name: str,
+        model_name: str,
+        output_dir: Path,
+        beam: int,
+        retry_beam: int,
+        clean: bool,
+        temporary_directory: Path | None,
+    ) -> str:
+        stems = sorted(path.stem for path in corpus_dir.glob("*.txt"))
+        assert stems == sorted(path.stem for path in corpus_dir.glob("*.wav"))
+        output_dir.mkdir(parents=True, exist_ok=True)
+        for stem in stems:
+            (output_dir / f"{stem}.TextGrid").write_text(
+                f"{stem} {len(aligned_runs)}", encoding="utf-8"
+            )
+        aligned_runs.append((clean, stems))
+        return ""
+
+    monkeypatch.setattr(process_alignment, "run_mfa_g2p", fake_run_mfa_g2p)
+    monkeypatch.setattr(process_alignment, "run_mfa_align", fake_run_mfa_align)
+    workspace_root = tmp_path / "workspaces"
+    setting = default_process_alignment_setting()
+    manifest = AlignmentManifest(tmp_path / "manifest.sqlite3", 100, 100, "fingerprint")
+    try:
+        configure_process_alignment(
+            setting.model_copy(
+                update={"workspace_root": workspace_root, "audio_staging_mode": "copy"}
+            )
+        )
+        targets = [pairs["a"], pairs["b"]]
+        assert run_incremental_alignment(targets, False, False, manifest) == {
+            "a": "a 0",
+            "b": "b 0",
+        }
+        run_incremental_alignment(targets, False, False, manifest)
+        assert aligned_runs == [(True, ["a", "b"])]
+        (workspace_dir,) = workspace_root.iterdir()
+        staged_text_path = workspace_dir / "mfa_corpus" / "a.txt"
+        staged_ino = staged_text_path.stat().st_ino
+
+        targets = [pairs["a"], pairs["b"], pairs["c"]]
+        assert run_incremental_alignment(targets, False, False, manifest) == {
+            "a": "a 0",
+            "b": "b 0",
+            "c": "c 1",
+        }
+        assert aligned_runs[-1] == (False, ["a", "b", "c"])
+
+        (corpus_dir / "c.wav").write_bytes(b"RIFF0")
+        assert run_incremental_alignment(targets, False, False, manifest)["c"] == "c 2"
+        assert aligned_runs[-1] == (True, ["a", "b", "c"])
+
+        targets = [pairs["a"], pairs["b"], pairs["d"]]
+        assert run_incremental_alignment(targets, False, False, manifest) == {
+            "a": "a 0",
+            "b": "b 0",
+            "d": "d 3",
+        }
+        assert aligned_runs[-1] == (True, ["a", "b", "d"])
+        assert list(workspace_root.iterdir()) == [workspace_dir]
+        assert staged_text_path.stat().st_ino == staged_ino
+    finally:
+        manifest.close()
+        configure_process_alignment(setting)
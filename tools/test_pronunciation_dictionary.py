@@ -0,0 +1,60 @@
+from tools.pronunciation_dictionary import (
+    PronunciationDictionary,
+    extract_corpus_vocabulary,
+    extract_words,
+    format_dictionary,
+    parse_g2p_dictionary,
+    parse_oov_words,
+)
+
+
+def test_extract_corpus_vocabulary(tmp_path):
+    """区切り文字で分割して小文字の単語を取り出し、ハイフンを含む単語は各部分も加えることを確認"""
+    speaker_dir = tmp_path / "speaker"
+    speaker_dir.mkdir()
+    (tmp_path / "a.txt").write_text(
+        'Hello, "world"! It\'s well-known.', encoding="utf-8"
+    )
+    (speaker_dir / "b.txt").write_text("hello (again)", encoding="utf-8")
+    assert extract_corpus_vocabulary(tmp_path) == [
+        "again",
+        "hello",
+        "it's",
+        "known",
+        "well",
+        "well-known",
+        "world",
+    ]
+
+
+def test_extract_words_splits_dashes_and_normalizes_apostrophes():
+    """ダッシュと全角の句読点で分割し、曲がったアポストロフィを'にそろえることを確認"""
+    assert extract_words("Well—it’s fine–really？ Don’t（stop）！") == {
+        "well",
+        "it's",
+        "fine",
+        "really",
+        "don't",
+        "stop",
+    }
+
+
+def test_parse_oov_words():
+    """mfa find_oovsの出力から空行を除いて単語を取り出すことを確認"""
+    assert parse_oov_words("it's\nwell—known\n\n") == ["it's", "well—known"]
+
+
+def test_pronunciation_dictionary_roundtrip(tmp_path):
+    """mfa g2pの出力を保存し、MFAの辞書形式に戻せることを確認"""
+    g2p_output = "hello\tHH AH0 L OW1\nworld\tW ER1 L D\nread\tR EH1 D\nread\tR IY1 D\n"
+    pronunciations = parse_g2p_dictionary(g2p_output)
+    assert pronunciations["read"] == ["R EH1 D", "R IY1 D"]
+
+    dictionary = PronunciationDictionary(tmp_path / "dictionary.sqlite3", 100, "g2p")
+    try:
+        dictionary.put_many(pronunciations)
+        found = dictionary.get_many(["hello", "read", "world", "unknown"])
+    finally:
+        dictionary.close()
+    assert "unknown" not in found
+    assert parse_g2p_dictionary(format_dictionary(found)) == pronunciations
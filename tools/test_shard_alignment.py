@@ -0,0 +1,113 @@
+import os
+import time
+import wave
+
+import pytest
+
+from tools.shard_alignment import (
+    claim_shard,
+    collect_shard_textgrids,
+    get_shard_claim_path,
+    heartbeat_shard_claim,
+    plan_shards,
+    release_shard_claim,
+    write_shard_result,
+)
+
+
+def write_silent_wav(path, seconds):
+    """指定した長さの無音wavファイルを書き込む"""
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(1000)
+        f.writeframes(b"\0\0" * int(seconds * 1000))
+
+
+@pytest.mark.parametrize("multi_speaker", [False, True])
+def test_plan_shards_balances_duration(tmp_path, multi_speaker):
+    """全ファイルがどこか1つのシャードに入り、シャードの長さが均等になることを確認"""
+    corpus_dir = tmp_path / "corpus"
+    seconds = [5, 4, 3, 3, 2, 2, 1, 1, 1, 2]
+    for i, second in enumerate(seconds):
+        speaker_dir = corpus_dir / f"speaker_{i % 3}"
+        speaker_dir.mkdir(parents=True, exist_ok=True)
+        (speaker_dir / f"{i}.txt").write_text("hello", encoding="utf-8")
+        write_silent_wav(speaker_dir / f"{i}.wav", second)
+
+    manifest = plan_shards(
+        str(corpus_dir / "*" / "*.txt"),
+        str(corpus_dir / "*" / "*.wav"),
+        tmp_path / "shards",
+        3,
+        multi_speaker,
+        False,
+    )
+    stems = sorted(pair.text_path.stem for s in manifest.shards for pair in s.pairs)
+    assert stems == sorted(str(i) for i in range(len(seconds)))
+    durations = [shard.duration for shard in manifest.shards]
+    assert sum(durations) == pytest.approx(sum(seconds))
+    assert max(durations) - min(durations) <= max(seconds)
+    assert [shard.index for shard in manifest.shards] == list(range(3))
+
+    with pytest.raises(FileExistsError):
+        plan_shards(
+            str(corpus_dir / "*" / "*.txt"),
+            str(corpus_dir / "*" / "*.wav"),
+            tmp_path / "shards",
+            3,
+            multi_speaker,
+            False,
+        )
+
+
+def test_claim_and_collect_shards(tmp_path):
+    """ロックファイルでシャードを1つのワーカーだけが取得でき、全シャード完了後にTextGridを集められることを確認"""
+    corpus_dir = tmp_path / "corpus"
+    corpus_dir.mkdir()
+    for name in ["a", "b"]:
+        (corpus_dir / f"{name}.txt").write_text("hello", encoding="utf-8")
+        write_silent_wav(corpus_dir / f"{name}.wav", 1)
+    shard_dir = tmp_path / "shards"
+    plan_shards(
+        str(corpus_dir / "*.txt"), str(corpus_dir / "*.wav"), shard_dir, 2, False, False
+    )
+
+    assert claim_shard(shard_dir, 0, 600)
+    assert not claim_shard(shard_dir, 0, 600)
+    release_shard_claim(shard_dir, 0)
+    assert claim_shard(shard_dir, 0, 600)
+
+    write_shard_result(shard_dir, 0, {"a": "textgrid a"})
+    with pytest.raises(RuntimeError):
+        collect_shard_textgrids(shard_dir)
+    write_shard_result(shard_dir, 1, {"b": "textgrid b"})
+    assert collect_shard_textgrids(shard_dir) == {"a": "textgrid a", "b": "textgrid b"}
+
+
+def test_reclaim_stale_shard_claim(tmp_path):
+    """更新の途絶えたロックファイルは取得し直せ、ハートビート中のロックファイルは取得し直せないことを確認"""
+    shard_dir = tmp_path / "shards"
+    claim_path = get_shard_claim_path(shard_dir, 0)
+    assert claim_shard(shard_dir, 0, 10)
+    stale_time = time.time() - 60
+    os.utime(claim_path, (stale_time, stale_time))
+
+    with heartbeat_shard_claim(shard_dir, 0, 0.05):
+        time.sleep(0.3)
+    assert not claim_shard(shard_dir, 0, 10)
+
+    os.utime(claim_path, (stale_time, stale_time))
+    assert claim_shard(shard_dir, 0, 10)
+    assert not claim_shard(shard_dir, 0, 10)
+    assert [path.name for path in claim_path.parent.iterdir()] == [claim_path.name]
+
+
+def test_write_shard_result_keeps_first_result(tmp_path):
+    """取得し直した別のワーカーが先に完了したシャードは先の結果を残すことを確認"""
+    shard_dir = tmp_path / "shards"
+    write_shard_result(shard_dir, 0, {"a": "first"})
+    write_shard_result(shard_dir, 0, {"a": "second"})
+    result_dir = shard_dir / "results" / "0"
+    assert (result_dir / "a.TextGrid").read_text(encoding="utf-8") == "first"
+    assert [path.name for path in result_dir.parent.iterdir()] == ["0"]
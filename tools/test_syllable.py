@@ -1,6 +1,19 @@
 import pytest
 
-from tools.process_syllable import UnifiedPhonemeInfo, process_syllables
+from tools.festival_worker import FestivalCrashError, FestivalStartupError
+from tools.process_festival import PhonemeInfo as FestivalInfo
+from tools.process_phonemizer import PhonemeInfo as PhonemizerInfo
+from tools.process_syllable import (
+    ProcessSyllableFailure,
+    ProcessSyllableSuccess,
+    UnifiedPhonemeInfo,
+    configure_process_syllables,
+    default_process_syllable_setting,
+    join_word_streams,
+    process_syllables,
+    process_syllables_batch,
+    run_engine_batch,
+)
 
 
 @pytest.mark.parametrize(
@@ -78,3 +91,114 @@ def test_syllable_param(
 
     syllable_indexes = [x.syllable_index for x in result]
     assert syllable_indexes == expected_syllable_indexes
+
+
+def test_process_syllables_sequential_matches_concurrent():
+    """同時実行数を1にしてFestivalとespeakを順に実行しても結果が変わらないことを確認"""
+    text = "hello, world!"
+    setting = default_process_syllable_setting()
+    try:
+        expected = process_syllables(text)
+        configure_process_syllables(setting.model_copy(update={"max_workers": 1}))
+        assert process_syllables(text) == expected
+    finally:
+        configure_process_syllables(setting)
+
+
+def test_process_syllables_batch_matches_process_syllables():
+    """小さいchunk_sizeで一括解析した結果が1件ずつの結果と一致することを確認"""
+    texts = ["hello, world!", "internationalization", "hello world.", "read"]
+    setting = default_process_syllable_setting()
+    try:
+        configure_process_syllables(setting.model_copy(update={"chunk_size": 3}))
+        results = process_syllables_batch(texts)
+    finally:
+        configure_process_syllables(setting)
+    assert all(isinstance(result, ProcessSyllableSuccess) for result in results)
+    assert [result.table.to_infos() for result in results] == [
+        process_syllables(text) for text in texts
+    ]
+
+
+def test_join_word_streams():
+    """繰り返される単語を出現ごとに対応付け、espeakにだけある句読点を読み飛ばすことを確認"""
+    fest = [
+        FestivalInfo(
+            word=word,
+            word_index=word_index,
+            syllable_index=word_index,
+            phoneme=phoneme,
+            phoneme_index=i,
+            stress=0,
+        )
+        for i, (word, word_index, phoneme) in enumerate(
+            [("the", 0, "dh"), ("the", 0, "ax"), ("cat", 1, "k"), ("the", 2, "dh")]
+        )
+    ]
+    phnm = [
+        PhonemizerInfo(
+            word=word, word_index=word_index, phoneme=phoneme, phoneme_index=i, stress=0
+        )
+        for i, (word, word_index, phoneme) in enumerate(
+            [
+                ("the", 0, "ð"),
+                ("the", 0, "ə"),
+                (",", 1, ","),
+                ("cat", 2, "k"),
+                ("the", 3, "ð"),
+            ]
+        )
+    ]
+    word_pairs = join_word_streams(fest, phnm)
+    assert [(f[0].word_index, p[0].word_index) for f, p in word_pairs] == [
+        (0, 0),
+        (1, 2),
+        (2, 3),
+    ]
+
+
+def test_run_engine_batch_bisects_failed_batch():
+    """失敗したバッチを二分して解析し直し、失敗したテキストだけをエラーにすることを確認"""
+    batches: list[list[str]] = []
+
+    def engine(texts: list[str]) -> list[list[str]]:
+        batches.append(texts)
+        if "bad" in texts:
+            raise ValueError("bad")
+        return [[text] for text in texts]
+
+    texts = ["a", "b", "c", "bad", "d", "e", "f", "g"]
+    results = run_engine_batch(engine, texts)
+    assert [
+        result.message if isinstance(result, ProcessSyllableFailure) else result
+        for result in results
+    ] == [["a"], ["b"], ["c"], "bad", ["d"], ["e"], ["f"], ["g"]]
+    assert len(batches) < len(texts)
+
+
+def test_run_engine_batch_isolates_crashing_text():
+    """Festivalを落とすテキストがあってもバッチを二分して解析し直し、そのテキストだけをエラーにすることを確認"""
+
+    def engine(texts: list[str]) -> list[list[str]]:
+        if "crash" in texts:
+            raise FestivalCrashError("crash")
+        return [[text] for text in texts]
+
+    results = run_engine_batch(engine, ["a", "b", "crash", "c"])
+    assert [
+        result.message if isinstance(result, ProcessSyllableFailure) else result
+        for result in results
+    ] == [["a"], ["b"], "crash", ["c"]]
+
+
+def test_run_engine_batch_raises_startup_error():
+    """Festivalを起動できない場合は再試行せずに投げることを確認"""
+    batches: list[list[str]] = []
+
+    def engine(texts: list[str]) -> list[list[str]]:
+        batches.append(texts)
+        raise FestivalStartupError("startup")
+
+    with pytest.raises(FestivalStartupError):
+        run_engine_batch(engine, ["a", "b", "c"])
+    assert batches == [["a", "b", "c"]]
@@ -1,6 +1,5 @@
 """TextGridファイルのパースおよびlabファイル形式での出力に関連する関数群"""
 
-import shutil
 from pathlib import Path
 
 from pydantic import BaseModel
@@ -18,9 +17,9 @@ class LabEntry(BaseModel):
     phoneme: str
 
 
-def parse_textgrid_file(textgrid_path: Path) -> list[LabEntry]:
-    """TextGridファイルを読み込んでLabEntryのリストに変換する"""
-    lines = textgrid_path.read_text(encoding="utf-8").splitlines()
+def parse_textgrid_text(textgrid_text: str) -> list[LabEntry]:
+    """TextGridの内容をLabEntryのリストに変換する"""
+    lines = textgrid_text.splitlines()
     entries: list[LabEntry] = []
     in_phones = False
     interval_count = 0
@@ -58,22 +57,14 @@ def write_lab_file(entries: list[LabEntry], output_path: Path) -> None:
     output_path.write_text(output, encoding="utf-8")
 
 
-def copy_textgrid_files(
-    textgrid_dir: Path, output_dir: Path, multi_speaker: bool = False
-) -> None:
-    """TextGridファイルをコピーする"""
+def write_textgrid_files(textgrids: dict[str, str], output_dir: Path) -> None:
+    """ファイル名ごとのTextGridの内容をファイルに書き込む"""
     output_dir.mkdir(exist_ok=True)
-
-    if multi_speaker:
-        textgrid_pattern = "*/*.TextGrid"
-    else:
-        textgrid_pattern = "*.TextGrid"
-
-    for textgrid_file in textgrid_dir.glob(textgrid_pattern):
-        dst = output_dir / textgrid_file.name
+    for stem, textgrid_text in textgrids.items():
+        textgrid_path = output_dir / f"{stem}.TextGrid"
         try:
-            shutil.copy2(textgrid_file, dst)
+            textgrid_path.write_text(textgrid_text, encoding="utf-8")
         except Exception as e:
             raise RuntimeError(
-                f"TextGridファイルのコピーに失敗: {textgrid_file}"
+                f"TextGridファイルの書き込みに失敗: {textgrid_path}"
             ) from e
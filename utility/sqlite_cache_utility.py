@@ -0,0 +1,122 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from pydantic import BaseModel
+
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+SQLITE_MAX_VARIABLES = 500
+
+
+class CacheStats(BaseModel):
+    """キャッシュのヒット・ミス回数と保存件数"""
+
+    hits: int
+    misses: int
+    entries: int
+
+
+class SqliteLruCache:
+    """文字列のキーと値をSQLiteファイルに保存し、上限件数を超えたら最終参照の古いものから削除するキャッシュ。複数プロセスで同じファイルを共有しても上限件数を守る"""
+
+    def __init__(self, path: Path, max_entries: int) -> None:
+        if max_entries < 1:
+            raise ValueError(f"max_entriesは1以上である必要があります: {max_entries}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            path, timeout=30, isolation_level="IMMEDIATE", check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, last_access INTEGER NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS cache_last_access ON cache (last_access)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache_count "
+            "(id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER NOT NULL)"
+        )
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO cache_count (id, entries) "
+                "SELECT 0, COUNT(*) FROM cache"
+            )
+
+    def get_many(self, keys: list[str]) -> dict[str, str]:
+        """キーに対応する値を返す。見つからないキーは結果に含めない"""
+        unique_keys = list(dict.fromkeys(keys))
+        found: dict[str, str] = {}
+        with self.lock:
+            for chunk in chunk_list(unique_keys, SQLITE_MAX_VARIABLES):
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.connection.execute(
+                    f"SELECT key, value FROM cache WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time_ns()
+                with self.connection:
+                    self.connection.executemany(
+                        "UPDATE cache SET last_access = ? WHERE key = ?",
+                        [(now, key) for key in found],
+                    )
+            self.hits += len(found)
+            self.misses += len(unique_keys) - len(found)
+        return found
+
+    def put_many(self, items: dict[str, str]) -> None:
+        """キーと値を保存し、上限件数を超えた分を最終参照の古いものから削除する。件数はファイルを共有する全プロセスで1行のテーブルに同じトランザクションで記録する"""
+        if not items:
+            return
+        now = time.time_ns()
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "UPDATE cache SET value = ?, last_access = ? WHERE key = ?",
+                [(value, now, key) for key, value in items.items()],
+            )
+            inserted = self.connection.executemany(
+                "INSERT OR IGNORE INTO cache (key, value, last_access) VALUES (?, ?, ?)",
+                [(key, value, now) for key, value in items.items()],
+            ).rowcount
+            (count,) = self.connection.execute(
+                "UPDATE cache_count SET entries = entries + ? WHERE id = 0 "
+                "RETURNING entries",
+                (inserted,),
+            ).fetchone()
+            if count > self.max_entries:
+                deleted = self.connection.execute(
+                    "DELETE FROM cache WHERE key IN "
+                    "(SELECT key FROM cache ORDER BY last_access LIMIT ?)",
+                    (count - self.max_entries,),
+                ).rowcount
+                self.connection.execute(
+                    "UPDATE cache_count SET entries = entries - ? WHERE id = 0",
+                    (deleted,),
+                )
+
+    def stats(self) -> CacheStats:
+        """このプロセスでのヒット・ミス回数と現在の保存件数を返す"""
+        with self.lock:
+            (count,) = self.connection.execute("SELECT COUNT(*) FROM cache").fetchone()
+            return CacheStats(hits=self.hits, misses=self.misses, entries=count)
+
+    def close(self) -> None:
+        """SQLiteの接続を閉じる"""
+        with self.lock:
+            self.connection.close()
+
+
+def chunk_list(items: list[str], size: int) -> list[list[str]]:
+    """リストをsize件ずつに分割する"""
+    return [items[i : i + size] for i in range(0, len(items), size)]